@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк SkopeoHelper: 1000 inspect с помощником и без него
+
+Сравнивает последовательные вызовы SkopeoWrapper.inspect, пул потоков
+поверх SkopeoWrapper и SkopeoHelper (постоянный пул, объединение
+одинаковых выполняющихся операций). Для каждого сценария выводятся общее
+время, пропускная способность, задержка на операцию (от постановки в
+очередь до результата) и количество запущенных процессов skopeo.
+
+Каждый сценарий выполняется дважды: на рабочей нагрузке с повторами
+(--unique различных образов) и без повторов (все ссылки различны). На
+первой SkopeoHelper выигрывает в основном за счет объединения одинаковых
+выполняющихся операций; вторая показывает выигрыш только от постоянного
+пула, без дедупликации.
+
+По умолчанию используется поддельный skopeo (tests/fake_skopeo.py):
+время запуска процесса - запуск интерпретатора Python, задержка реестра
+задается --registry-delay. Для настоящего реестра: --skopeo-path skopeo
+и --image-template docker://registry.example.com/app:{i}.
+
+    python benchmarks/bench_helper.py --operations 1000 --unique 200
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from skopeo_wrapper import SkopeoHelper, SkopeoMetrics, SkopeoWrapper  # noqa: E402
+
+FAKE_SKOPEO = os.path.join(ROOT, "tests", "fake_skopeo.py")
+
+
+def launched(wrapper: SkopeoWrapper) -> int:
+    """Количество выполненных команд inspect по метрикам обертки"""
+    total = 0
+    for status in ("success", "error"):
+        total += wrapper.metrics.operations_total.labels(operation="inspect", status=status)._value.get()
+    return int(total)
+
+
+def sequential(wrapper: SkopeoWrapper, images, workers: int):
+    latencies = []
+    for image in images:
+        started = time.perf_counter()
+        wrapper.inspect(image)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def thread_pool(wrapper: SkopeoWrapper, images, workers: int):
+    submitted = time.perf_counter()
+
+    def run(image):
+        wrapper.inspect(image)
+        return time.perf_counter() - submitted
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, images))
+
+
+def helper(wrapper: SkopeoWrapper, images, workers: int):
+    latencies = []
+    with SkopeoHelper(wrapper, max_workers=workers) as skopeo_helper:
+        submitted = time.perf_counter()
+        futures = [skopeo_helper.inspect(image) for image in images]
+        for future in futures:
+            future.add_done_callback(lambda _: latencies.append(time.perf_counter() - submitted))
+        for future in futures:
+            future.result()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=1000, help="Количество inspect")
+    parser.add_argument("--unique", type=int, default=200,
+                        help="Количество различных образов среди операций (дополнительно всегда "
+                             "выполняется прогон, где все образы различны)")
+    parser.add_argument("--workers", type=int, default=16, help="Одновременных процессов skopeo")
+    parser.add_argument("--registry-delay", type=float, default=0.05,
+                        help="Задержка ответа поддельного skopeo в секундах")
+    parser.add_argument("--skopeo-path", default=FAKE_SKOPEO, help="Путь к skopeo")
+    parser.add_argument("--image-template", default="docker://registry.example.com/app{i}:latest",
+                        help="Шаблон ссылки на образ, {i} - номер образа")
+    parser.add_argument("--skip-sequential", action="store_true", help="Не запускать последовательный сценарий")
+    args = parser.parse_args()
+
+    os.environ["FAKE_SKOPEO_DELAY"] = str(args.registry_delay)
+
+    scenarios = [("последовательно", sequential), ("пул потоков", thread_pool), ("SkopeoHelper", helper)]
+    if args.skip_sequential:
+        scenarios = scenarios[1:]
+
+    print(f"operations={args.operations} workers={args.workers}")
+    print(f"{'уникальных':>10} {'сценарий':<18} {'всего s':>8} {'ops/sec':>9} {'ms/op':>7} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'процессов':>10}")
+    for unique in dict.fromkeys((args.unique, args.operations)):
+        images = [args.image_template.format(i=i % unique) for i in range(args.operations)]
+        for name, scenario in scenarios:
+            wrapper = SkopeoWrapper(skopeo_path=args.skopeo_path, metrics=SkopeoMetrics())
+            started = time.perf_counter()
+            latencies = scenario(wrapper, images, args.workers)
+            elapsed = time.perf_counter() - started
+            ordered = sorted(latencies)
+            print(f"{unique:>10} {name:<18} {elapsed:>8.2f} {args.operations / elapsed:>9.1f} "
+                  f"{elapsed / args.operations * 1000:>7.2f} {statistics.median(ordered) * 1000:>8.1f} "
+                  f"{ordered[int(0.99 * (len(ordered) - 1))] * 1000:>8.1f} {launched(wrapper):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк способов проверки существования образа (image_exists probe)
+
+Поднимает локальный HTTP-реестр (Docker Registry API v2) и сравнивает
+`probe="full"` (`skopeo inspect`) с `probe="raw"` (`skopeo inspect --raw`):
+задержку на проверку, количество HTTP-запросов и байт, отданных реестром.
+
+Требуется установленный skopeo. Запуск:
+
+    python benchmarks/bench_image_exists.py --probes 50 --tags 2000
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from skopeo_wrapper import SkopeoWrapper  # noqa: E402
+
+MANIFEST_TYPE = "application/vnd.docker.distribution.manifest.v2+json"
+
+
+def _digest(data: bytes) -> str:
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+class FakeRegistry:
+    """Минимальный реестр в памяти с одним образом и множеством тегов"""
+
+    def __init__(self, tags: int, layers: int):
+        self.config = json.dumps({
+            "architecture": "amd64",
+            "os": "linux",
+            "config": {"Env": ["PATH=/usr/bin"], "Labels": {"bench": "true"}},
+            "rootfs": {"type": "layers", "diff_ids": [_digest(b"%d" % i) for i in range(layers)]},
+            "history": [{"created_by": "x" * 200} for _ in range(layers)],
+        }).encode()
+        self.manifest = json.dumps({
+            "schemaVersion": 2,
+            "mediaType": MANIFEST_TYPE,
+            "config": {
+                "mediaType": "application/vnd.docker.container.image.v1+json",
+                "size": len(self.config),
+                "digest": _digest(self.config),
+            },
+            "layers": [
+                {
+                    "mediaType": "application/vnd.docker.image.rootfs.diff.tar.gzip",
+                    "size": 1024 * 1024,
+                    "digest": _digest(b"layer-%d" % i),
+                }
+                for i in range(layers)
+            ],
+        }).encode()
+        self.tags = ["v%d" % i for i in range(tags)]
+        self.requests = Counter()
+        self.bytes_sent = Counter()
+        self.lock = threading.Lock()
+
+    def record(self, kind: str, size: int) -> None:
+        with self.lock:
+            self.requests[kind] += 1
+            self.bytes_sent[kind] += size
+
+    def reset(self) -> None:
+        with self.lock:
+            self.requests.clear()
+            self.bytes_sent.clear()
+
+    def handler(self):
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, kind, body, content_type="application/json", headers=None):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Docker-Distribution-API-Version", "registry/2.0")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+                    registry.record(kind, len(body))
+                else:
+                    registry.record(kind + "_head", 0)
+
+            def _not_found(self):
+                body = json.dumps({"errors": [{"code": "MANIFEST_UNKNOWN", "message": "manifest unknown"}]}).encode()
+                self.send_response(404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/v2/":
+                    self._send("ping", b"{}")
+                elif "/manifests/" in path:
+                    reference = path.rsplit("/", 1)[1]
+                    if reference in registry.tags or reference == _digest(registry.manifest):
+                        self._send("manifest", registry.manifest, MANIFEST_TYPE,
+                                   {"Docker-Content-Digest": _digest(registry.manifest)})
+                    else:
+                        self._not_found()
+                elif "/blobs/" in path:
+                    self._send("config", registry.config, "application/octet-stream")
+                elif path.endswith("/tags/list"):
+                    body = json.dumps({"name": "bench/image", "tags": registry.tags}).encode()
+                    self._send("tags", body)
+                else:
+                    self._not_found()
+
+            do_HEAD = do_GET
+
+        return Handler
+
+
+def run_probes(wrapper: SkopeoWrapper, image: str, probe: str, count: int):
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        success, exists, error = wrapper.image_exists(image, probe=probe)
+        latencies.append(time.perf_counter() - started)
+        if not (success and exists):
+            raise RuntimeError(f"probe {probe} failed: {error}")
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--probes", type=int, default=30, help="Количество проверок на режим")
+    parser.add_argument("--tags", type=int, default=1000, help="Количество тегов в репозитории")
+    parser.add_argument("--layers", type=int, default=10, help="Количество слоев в образе")
+    parser.add_argument("--skopeo-path", default="skopeo")
+    args = parser.parse_args()
+
+    if shutil.which(args.skopeo_path) is None:
+        print(f"skopeo не найден: {args.skopeo_path}", file=sys.stderr)
+        return 1
+
+    registry = FakeRegistry(args.tags, args.layers)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), registry.handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    address = f"127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.NamedTemporaryFile("w", suffix=".conf", delete=False) as conf:
+        conf.write(f'[[registry]]\nlocation = "{address}"\ninsecure = true\n')
+    os.environ["CONTAINERS_REGISTRIES_CONF"] = conf.name
+
+    wrapper = SkopeoWrapper(skopeo_path=args.skopeo_path, enable_metrics=False)
+    image = f"docker://{address}/bench/image:v0"
+
+    try:
+        # Прогрев: кэш файловой системы и разрешение пути skopeo
+        run_probes(wrapper, image, "raw", 2)
+
+        print(f"{'probe':<6} {'p50 ms':>8} {'mean ms':>8} {'req/probe':>10} {'bytes/probe':>12}")
+        for probe in ("full", "raw"):
+            registry.reset()
+            latencies = run_probes(wrapper, image, probe, args.probes)
+            requests = sum(registry.requests.values()) / args.probes
+            sent = sum(registry.bytes_sent.values()) / args.probes
+            print(f"{probe:<6} {statistics.median(latencies) * 1000:>8.1f} "
+                  f"{statistics.mean(latencies) * 1000:>8.1f} {requests:>10.1f} {sent:>12.0f}")
+            details = ", ".join(f"{kind}={registry.bytes_sent[kind] // args.probes}B"
+                                for kind in sorted(registry.requests))
+            print(f"       {details}")
+    finally:
+        server.shutdown()
+        os.unlink(conf.name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк записи размеров blob'ов в гистограмму skopeo_blob_size_bytes
+
+Сравнивает прежний цикл из record_operation_end (labels() и observe()
+среднего размера на каждый blob) с пакетной записью observe_many
+фактических размеров при одновременной записи из нескольких потоков.
+
+    python benchmarks/bench_metrics.py --blobs 300 --threads 8
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from skopeo_wrapper.metrics import SkopeoMetrics, observe_many  # noqa: E402
+
+
+def loop_average(metrics: SkopeoMetrics, sizes) -> None:
+    """Прежняя реализация: средний размер, поиск меток на каждый blob"""
+    avg_blob_size = sum(sizes) / len(sizes)
+    for _ in range(len(sizes)):
+        metrics.blob_size_bytes.labels(operation="copy").observe(avg_blob_size)
+
+
+def bulk_actual(metrics: SkopeoMetrics, sizes) -> None:
+    """Новая реализация: фактические размеры, один поиск меток"""
+    observe_many(metrics.blob_size_bytes.labels(operation="copy"), sizes)
+
+
+def run(record, sizes, threads: int, operations: int) -> float:
+    """Возвращает количество записанных операций в секунду"""
+    metrics = SkopeoMetrics()
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(operations):
+            record(metrics, sizes)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return threads * operations / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blobs", type=int, default=300, help="Количество blob'ов в образе")
+    parser.add_argument("--threads", type=int, default=8, help="Количество одновременно завершающихся копирований")
+    parser.add_argument("--operations", type=int, default=200, help="Операций на поток")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    sizes = [int(rng.lognormvariate(14, 2.5)) + 1 for _ in range(args.blobs)]
+
+    before = run(loop_average, sizes, args.threads, args.operations)
+    after = run(bulk_actual, sizes, args.threads, args.operations)
+    print(f"blobs={args.blobs} threads={args.threads}")
+    print(f"цикл observe(среднее):   {before:>10,.0f} операций/с")
+    print(f"observe_many(размеры):   {after:>10,.0f} операций/с ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк SkopeoMultiplexer: N одновременных копирований потоками и одним циклом
+
+Сравнивает SkopeoWrapper.copy_many (поток на задачу),
+SkopeoMultiplexer.copy_many (один поток на все процессы) и
+SkopeoProcessPool.copy_many (движки в --processes рабочих процессах,
+в родительском только события прогресса). Для каждого
+сценария выводятся общее время, пиковое количество потоков и
+процессорное время родительского процесса.
+
+По умолчанию используется поддельный skopeo (tests/fake_skopeo.py),
+задержка реестра задается --registry-delay.
+
+    python benchmarks/bench_multiplexer.py --jobs 500
+"""
+
+import argparse
+import os
+import resource
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from skopeo_wrapper import SkopeoMetrics, SkopeoMultiplexer, SkopeoProcessPool, SkopeoWrapper  # noqa: E402
+
+FAKE_SKOPEO = os.path.join(ROOT, "tests", "fake_skopeo.py")
+
+
+def threads(wrapper: SkopeoWrapper, pairs, on_progress):
+    return list(wrapper.copy_many(pairs, max_workers=len(pairs), progress_callback=on_progress))
+
+
+def multiplexer(wrapper: SkopeoWrapper, pairs, on_progress):
+    with SkopeoMultiplexer(wrapper, max_processes=len(pairs)) as engine:
+        return list(engine.copy_many(pairs, progress_callback=on_progress))
+
+
+def process_pool(wrapper: SkopeoWrapper, pairs, on_progress, processes: int):
+    with SkopeoProcessPool(processes=processes, skopeo_path=wrapper.skopeo_path) as pool:
+        return list(pool.copy_many(pairs, progress_callback=on_progress))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=500, help="Количество одновременных копирований")
+    parser.add_argument("--registry-delay", type=float, default=1.0,
+                        help="Задержка ответа поддельного skopeo в секундах")
+    parser.add_argument("--skopeo-path", default=FAKE_SKOPEO, help="Путь к skopeo")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="Рабочих процессов SkopeoProcessPool")
+    args = parser.parse_args()
+
+    os.environ["FAKE_SKOPEO_DELAY"] = str(args.registry_delay)
+    pairs = [(f"docker://registry.example.com/app{i}:latest", f"dir:/tmp/bench-multiplexer/{i}")
+             for i in range(args.jobs)]
+
+    print(f"jobs={args.jobs}")
+    print(f"{'сценарий':<18} {'всего s':>8} {'потоков':>8} {'CPU s':>7} {'ошибок':>7}")
+    scenarios = (
+        ("поток на задачу", threads),
+        ("SkopeoMultiplexer", multiplexer),
+        ("SkopeoProcessPool", lambda wrapper, pairs, on_progress: process_pool(
+            wrapper, pairs, on_progress, args.processes)),
+    )
+    for name, scenario in scenarios:
+        wrapper = SkopeoWrapper(skopeo_path=args.skopeo_path, metrics=SkopeoMetrics())
+        peak = [threading.active_count()]
+
+        def on_progress(index, progress):
+            peak[0] = max(peak[0], threading.active_count())
+
+        cpu_before = resource.getrusage(resource.RUSAGE_SELF)
+        started = time.perf_counter()
+        results = scenario(wrapper, pairs, on_progress)
+        elapsed = time.perf_counter() - started
+        cpu_after = resource.getrusage(resource.RUSAGE_SELF)
+        cpu = (cpu_after.ru_utime - cpu_before.ru_utime) + (cpu_after.ru_stime - cpu_before.ru_stime)
+        failed = sum(1 for result in results if not result.success)
+        print(f"{name:<18} {elapsed:>8.2f} {peak[0]:>8} {cpu:>7.2f} {failed:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк собственных накладных расходов SkopeoWrapper
+
+Поддельный skopeo воспроизводит записанный лог stderr, поэтому реестр не
+участвует в измерениях. По умолчанию это сценарий /bin/sh, выводящий лог
+через cat: запуск интерпретатора Python (tests/fake_skopeo.py, около 30 мс)
+скрыл бы накладные расходы обертки меньше миллисекунды. С --line-delay
+используется tests/fake_skopeo.py, воспроизводящий лог с заданной скоростью.
+
+Сценарии выполняются чередующимися раундами (по одному вызову каждого
+сценария в раунде, порядок сдвигается от раунда к раунду), чтобы дрейф
+системы одинаково влиял на все сценарии. Для каждого сценария выводятся
+ops/sec, p50/p99 времени вызова и медиана разности с прямым запуском
+процесса через subprocess.run в том же раунде (поток stderr, парсер,
+OperationTracker, обновление метрик Prometheus), а также память на вызов
+и скорость парсера.
+
+    python benchmarks/bench_overhead.py --calls 200
+    python benchmarks/bench_overhead.py --log benchmarks/data/skopeo_copy_debug.log --line-delay 0.0005
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from skopeo_wrapper import SkopeoMetrics, SkopeoProgressParser, SkopeoWrapper  # noqa: E402
+
+FAKE_SKOPEO = os.path.join(ROOT, "tests", "fake_skopeo.py")
+DEFAULT_LOG = os.path.join(ROOT, "benchmarks", "data", "skopeo_copy.log")
+
+SOURCE = "docker://registry.example.com/library/app:1.4.2"
+DESTINATION = "dir:/tmp/skopeo-wrapper-bench"
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def interleaved(calls, rounds: int):
+    """
+    Выполняет вызовы чередующимися раундами и возвращает длительности по сценариям
+
+    В каждом раунде каждый вызов выполняется один раз; порядок сдвигается
+    на один от раунда к раунду, чтобы ни один сценарий не шел всегда первым.
+    """
+    durations = [[] for _ in calls]
+    for round_index in range(rounds):
+        for offset in range(len(calls)):
+            index = (round_index + offset) % len(calls)
+            started = time.perf_counter()
+            calls[index]()
+            durations[index].append(time.perf_counter() - started)
+    return durations
+
+
+def shell_skopeo(directory: str) -> str:
+    """Создает поддельный skopeo на /bin/sh, выводящий лог FAKE_SKOPEO_LOG в stderr"""
+    path = os.path.join(directory, "skopeo")
+    with open(path, "w", encoding="utf-8") as script:
+        script.write('#!/bin/sh\ncat "$FAKE_SKOPEO_LOG" >&2\n')
+    os.chmod(path, 0o755)
+    return path
+
+
+def memory_per_call(call, calls: int) -> float:
+    """Пиковый объем памяти Python, выделяемой во время вызова (байт)"""
+    tracemalloc.start()
+    try:
+        call()
+        peak = 0
+        for _ in range(calls):
+            before = tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            call()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+        return float(peak)
+    finally:
+        tracemalloc.stop()
+
+
+def parser_lines_per_second(log_path: str, repeat: int = 500) -> float:
+    with open(log_path, encoding="utf-8") as log:
+        lines = log.readlines()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        parse_line = SkopeoProgressParser().parse_line
+        for line in lines:
+            parse_line(line)
+    return len(lines) * repeat / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100, help="Количество раундов (вызовов на сценарий)")
+    parser.add_argument("--log", default=DEFAULT_LOG, help="Лог stderr, который воспроизводит поддельный skopeo")
+    parser.add_argument("--line-delay", type=float, default=0.0, help="Задержка между строками stderr в секундах")
+    args = parser.parse_args()
+
+    os.environ["FAKE_SKOPEO_LOG"] = os.path.abspath(args.log)
+    os.environ["FAKE_SKOPEO_LINE_DELAY"] = str(args.line_delay)
+
+    with tempfile.TemporaryDirectory() as directory:
+        skopeo = FAKE_SKOPEO if args.line_delay else shell_skopeo(directory)
+        run(skopeo, args)
+
+
+def run(skopeo: str, args) -> None:
+    command = [skopeo, "copy", SOURCE, DESTINATION]
+    plain = SkopeoWrapper(skopeo_path=skopeo, enable_metrics=False)
+    tracked = SkopeoWrapper(skopeo_path=skopeo, metrics=SkopeoMetrics())
+    callbacks = []
+
+    scenarios = [
+        ("subprocess.run", lambda: subprocess.run(command, capture_output=True)),
+        ("copy, без метрик", lambda: plain.copy(SOURCE, DESTINATION)),
+        ("copy, метрики", lambda: tracked.copy(SOURCE, DESTINATION)),
+        ("copy, метрики+callback", lambda: tracked.copy(SOURCE, DESTINATION, progress_callback=callbacks.append)),
+    ]
+
+    # Прогрев: кэш файловой системы, импорт модулей в дочернем процессе
+    for _, call in scenarios:
+        call()
+
+    results = interleaved([call for _, call in scenarios], args.calls)
+    callbacks.clear()
+
+    fake = "tests/fake_skopeo.py" if skopeo == FAKE_SKOPEO else "/bin/sh + cat"
+    print(f"поддельный skopeo: {fake}, раундов: {args.calls}")
+    print(f"{'сценарий':<24} {'ops/sec':>8} {'p50 ms':>8} {'p99 ms':>8} {'overhead p50 ms':>16} {'mem/call KiB':>13}")
+    baseline = results[0]
+    for (name, call), durations in zip(scenarios, results):
+        # Разность с subprocess.run внутри одного раунда: дрейф системы сокращается
+        overhead = statistics.median(duration - base for duration, base in zip(durations, baseline))
+        memory = memory_per_call(call, max(5, args.calls // 10))
+        callbacks.clear()
+        print(f"{name:<24} {len(durations) / sum(durations):>8.1f} {statistics.median(durations) * 1000:>8.2f} "
+              f"{percentile(durations, 0.99) * 1000:>8.2f} {overhead * 1000:>16.3f} {memory / 1024:>13.1f}")
+
+    print(f"\nпарсер: {parser_lines_per_second(args.log):,.0f} строк/с ({os.path.basename(args.log)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк SkopeoProgressParser.parse_line
+
+Прогоняет записанные логи stderr skopeo (benchmarks/data/*.log) через
+текущий парсер и через прежнюю реализацию с последовательной проверкой
+регулярных выражений и выводит количество строк в секунду.
+
+    python benchmarks/bench_parser.py --repeat 2000
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from skopeo_wrapper import BlobInfo, ProgressInfo, SkopeoProgressParser  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+class CascadeParser:
+    """Прежняя реализация parse_line: до семи регулярных выражений на строку"""
+
+    def __init__(self):
+        self.progress = ProgressInfo(operation="", current_step="")
+        self.blobs: Dict[str, BlobInfo] = {}
+        self.patterns = {
+            'getting_signatures': re.compile(r'Getting image source signatures'),
+            'copying_blob': re.compile(r'Copying blob sha256:([a-f0-9]{64})'),
+            'copying_config': re.compile(r'Copying config sha256:([a-f0-9]{64})'),
+            'writing_manifest': re.compile(r'Writing manifest to image destination'),
+            'storing_signatures': re.compile(r'Storing signatures'),
+            'error': re.compile(r'Error: (.+)'),
+            'blob_size': re.compile(r'Copying blob sha256:([a-f0-9]{64}) \((\d+) bytes\)'),
+        }
+
+    def parse_line(self, line: str) -> Optional[ProgressInfo]:
+        line = line.strip()
+        if not line:
+            return None
+        if self.patterns['getting_signatures'].match(line):
+            self.progress.operation = "copy"
+            self.progress.current_step = "getting_signatures"
+            return self.progress
+        blob_size_match = self.patterns['blob_size'].match(line)
+        if blob_size_match:
+            sha256 = blob_size_match.group(1)
+            self.blobs[sha256] = BlobInfo(sha256=sha256, size=int(blob_size_match.group(2)), status="copying")
+            self.progress.current_blob = self.blobs[sha256]
+            self.progress.current_step = "copying_blob"
+            return self.progress
+        blob_match = self.patterns['copying_blob'].match(line)
+        if blob_match:
+            sha256 = blob_match.group(1)
+            if sha256 not in self.blobs:
+                self.blobs[sha256] = BlobInfo(sha256=sha256, status="copying")
+            self.progress.current_blob = self.blobs[sha256]
+            self.progress.current_step = "copying_blob"
+            return self.progress
+        config_match = self.patterns['copying_config'].match(line)
+        if config_match:
+            sha256 = config_match.group(1)
+            if sha256 not in self.blobs:
+                self.blobs[sha256] = BlobInfo(sha256=sha256, status="copying")
+            self.progress.current_blob = self.blobs[sha256]
+            self.progress.current_step = "copying_config"
+            return self.progress
+        if self.patterns['writing_manifest'].match(line):
+            self.progress.manifest_written = True
+            self.progress.current_step = "writing_manifest"
+            return self.progress
+        if self.patterns['storing_signatures'].match(line):
+            self.progress.signatures_stored = True
+            self.progress.current_step = "storing_signatures"
+            return self.progress
+        error_match = self.patterns['error'].match(line)
+        if error_match:
+            self.progress.error = error_match.group(1)
+            self.progress.current_step = "error"
+            return self.progress
+        return None
+
+
+def measure(parser_class, lines, repeat: int) -> float:
+    """Возвращает скорость разбора в строках в секунду (новый парсер на каждый проход)"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        parser = parser_class()
+        parse_line = parser.parse_line
+        for line in lines:
+            parse_line(line)
+    elapsed = time.perf_counter() - started
+    return len(lines) * repeat / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=1000, help="Количество проходов по каждому логу")
+    parser.add_argument("logs", nargs="*", help="Файлы логов (по умолчанию benchmarks/data/*.log)")
+    args = parser.parse_args()
+
+    logs = args.logs or sorted(glob.glob(os.path.join(DATA_DIR, "*.log")))
+    print(f"{'log':<28} {'lines':>6} {'cascade l/s':>14} {'single-pass l/s':>16} {'speedup':>8}")
+    for path in logs:
+        with open(path, encoding="utf-8") as log:
+            lines = log.readlines()
+
+        # Оба парсера должны давать одинаковый результат
+        reference, current = CascadeParser(), SkopeoProgressParser()
+        for line in lines:
+            reference.parse_line(line)
+            current.parse_line(line)
+        assert reference.blobs == current.blobs
+        assert reference.progress.current_step == current.progress.current_step
+
+        before = measure(CascadeParser, lines, args.repeat)
+        after = measure(SkopeoProgressParser, lines, args.repeat)
+        print(f"{os.path.basename(path):<28} {len(lines):>6} {before:>14,.0f} {after:>16,.0f} {after / before:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,25 @@ Skopeo Wrapper - Python библиотека-обертка для утилит
 from .skopeo_wrapper import (
     SkopeoWrapper,
     SkopeoProgressParser,
+    SyncProgressParser,
     ProgressInfo,
     BlobInfo,
+    CopyJobResult,
+    CopyResult,
+    SyncResult,
+    SkopeoCommandError,
     SkopeoOperation,
     create_progress_callback,
     get_progress_percentage
 )
+from .async_wrapper import AsyncSkopeoWrapper
+from .callbacks import ThrottledProgressCallback
+from .helper import SkopeoHelper
+from .multiplexer import SkopeoMultiplexer
+from .process_pool import SkopeoProcessPool
+from .results import InspectResult
+from .streaming import iter_json_array
+from .cache import ResultCache, MemoryResultCache, DiskResultCache
 from .metrics import (
     SkopeoMetrics,
     OperationTracker,
@@ -28,12 +41,27 @@ __description__ = "Python библиотека-обертка для утили
 
 __all__ = [
     "SkopeoWrapper",
+    "AsyncSkopeoWrapper",
+    "SkopeoHelper",
+    "SkopeoMultiplexer",
+    "SkopeoProcessPool",
     "SkopeoProgressParser", 
+    "SyncProgressParser",
     "ProgressInfo",
     "BlobInfo",
+    "CopyJobResult",
+    "CopyResult",
+    "SyncResult",
+    "InspectResult",
+    "SkopeoCommandError",
+    "iter_json_array",
     "SkopeoOperation",
     "create_progress_callback",
     "get_progress_percentage",
+    "ThrottledProgressCallback",
+    "ResultCache",
+    "MemoryResultCache",
+    "DiskResultCache",
     "SkopeoMetrics",
     "OperationTracker",
     "get_metrics",
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Асинхронная обертка для skopeo на базе asyncio
+"""
+
+import asyncio
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .cache import ResultCache
+from .metrics import SkopeoMetrics, OperationTracker, get_metrics
+from .results import InspectResult, manifest_blobs
+from .skopeo_wrapper import (
+    CommandResult,
+    ProgressInfo,
+    SkopeoProgressParser,
+    _classify_image_exists,
+    _flush_progress_callback,
+    _manifest_digest_args,
+    _probe_command,
+)
+
+# Максимальная длина строки stderr, которую читает StreamReader
+STREAM_LIMIT = 1024 * 1024
+
+
+class AsyncSkopeoWrapper:
+    """
+    Асинхронный аналог SkopeoWrapper
+
+    Все операции читают stdout/stderr через потоки asyncio без отдельных
+    потоков ОС. Отмена задачи завершает дочерний процесс skopeo.
+    """
+
+    def __init__(self,
+                 skopeo_path: str = "skopeo",
+                 metrics: Optional[SkopeoMetrics] = None,
+                 enable_metrics: bool = True,
+                 cache: Optional[ResultCache] = None):
+        self.skopeo_path = skopeo_path
+        self.enable_metrics = enable_metrics
+        self.metrics = metrics if metrics is not None else (get_metrics() if enable_metrics else None)
+        self.cache = cache
+        if cache is not None and cache.metrics is None:
+            cache.metrics = self.metrics
+
+    @staticmethod
+    def _kill(process: asyncio.subprocess.Process) -> None:
+        """Завершает процесс, если он еще работает"""
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+
+    async def _execute(self,
+                       command: List[str],
+                       progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+                       timeout: Optional[float] = None,
+                       parser: Optional[SkopeoProgressParser] = None) -> CommandResult:
+        """Выполняет команду skopeo и возвращает результат вместе с парсером"""
+
+        # Каждый вызов получает собственный парсер
+        if parser is None:
+            parser = SkopeoProgressParser()
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                limit=STREAM_LIMIT
+            )
+        except Exception as e:
+            return CommandResult(False, "", str(e), parser)
+
+        stderr_lines: List[str] = []
+
+        async def read_stderr():
+            """Построчное чтение stderr с инкрементальным парсингом"""
+            while True:
+                raw_line = await process.stderr.readline()
+                if not raw_line:
+                    break
+                line = raw_line.decode("utf-8", errors="replace")
+                stderr_lines.append(line)
+                if line.strip():
+                    progress_info = parser.parse_line(line)
+                    if progress_info and progress_callback:
+                        progress_info.parser = parser
+                        progress_callback(progress_info)
+
+        async def communicate():
+            stdout_data, _ = await asyncio.gather(process.stdout.read(), read_stderr())
+            await process.wait()
+            return stdout_data
+
+        try:
+            stdout_data = await asyncio.wait_for(communicate(), timeout)
+        except asyncio.TimeoutError:
+            self._kill(process)
+            await process.wait()
+            return CommandResult(False, "", "Operation timed out", parser)
+        except asyncio.CancelledError:
+            # Отмена задачи не должна оставлять осиротевший процесс skopeo
+            self._kill(process)
+            await process.wait()
+            raise
+        except Exception as e:
+            self._kill(process)
+            await process.wait()
+            return CommandResult(False, "", str(e), parser)
+
+        # Отмечаем операцию как завершенную
+        if process.returncode == 0:
+            parser.progress.completed = True
+            parser.progress.current_step = "completed"
+        else:
+            parser.progress.error = f"Process exited with code {process.returncode}"
+
+        if progress_callback:
+            parser.progress.parser = parser
+            progress_callback(parser.progress)
+            if hasattr(progress_callback, "flush"):
+                # Ожидание потока доставки не должно блокировать цикл событий
+                await asyncio.get_running_loop().run_in_executor(None, _flush_progress_callback, progress_callback)
+
+        stdout = stdout_data.decode("utf-8", errors="replace")
+        return CommandResult(process.returncode == 0, stdout, "".join(stderr_lines), parser)
+
+    async def _run_command(self,
+                           command: List[str],
+                           progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+                           timeout: Optional[float] = None) -> Tuple[bool, str, str]:
+        """Выполняет команду skopeo с мониторингом прогресса"""
+        result = await self._execute(command, progress_callback, timeout)
+        return result.as_tuple()
+
+    async def _run_tracked(self,
+                           operation: str,
+                           command: List[str],
+                           progress_callback: Optional[Callable[[ProgressInfo], None]],
+                           timeout: Optional[float],
+                           source: Optional[str] = None) -> Tuple[bool, str, str]:
+        """Выполняет команду с учетом метрик операции"""
+        if self.enable_metrics and self.metrics:
+            with OperationTracker(operation, self.metrics, source=source):
+                return await self._run_command(command, progress_callback, timeout)
+        return await self._run_command(command, progress_callback, timeout)
+
+    async def _run_cached(self,
+                          operation: str,
+                          image: str,
+                          command: List[str],
+                          progress_callback: Optional[Callable[[ProgressInfo], None]],
+                          timeout: Optional[float]) -> Tuple[bool, str, str]:
+        """Выполняет операцию чтения с использованием кэша результатов"""
+        if self.cache is not None:
+            cached = self.cache.get(operation, image)
+            if cached is not None:
+                return True, cached, ""
+
+        success, stdout, stderr = await self._run_tracked(operation, command, progress_callback, timeout, source=image)
+        if success and self.cache is not None:
+            self.cache.set(operation, image, stdout)
+        return success, stdout, stderr
+
+    async def copy(self,
+                   source: str,
+                   destination: str,
+                   progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+                   timeout: Optional[float] = None,
+                   preflight: bool = False) -> Tuple[bool, str, str]:
+        """
+        Копирует образ из source в destination
+
+        preflight=True загружает манифест источника перед копированием.
+        Псевдотерминал здесь не используется, поэтому известен только
+        total_bytes, а процент выполнения остается оценкой по этапам.
+        """
+
+        parser = None
+        if preflight:
+            parser = SkopeoProgressParser()
+            raw_command = [self.skopeo_path, "inspect", "--raw", source]
+            success, stdout, _ = await self._run_cached("inspect_raw", source, raw_command, None, timeout)
+            blobs = manifest_blobs(stdout) if success else None
+            if blobs is not None:
+                parser.expect_blobs(blobs, byte_progress=False)
+
+        command = [self.skopeo_path, "copy", source, destination]
+        try:
+            if self.enable_metrics and self.metrics:
+                with OperationTracker("copy", self.metrics, source, destination) as tracker:
+                    result = await self._execute(command, progress_callback, timeout, parser)
+
+                    # Обновляем статистику blob'ов из парсера этого вызова
+                    for blob in result.parser.blobs.values():
+                        tracker.add_blob(blob.size)
+
+                    return result.as_tuple()
+            else:
+                result = await self._execute(command, progress_callback, timeout, parser)
+                return result.as_tuple()
+        finally:
+            # Даже неудачное копирование могло изменить назначение
+            self._invalidate_cached(destination)
+
+    def _invalidate_cached(self, image: str) -> None:
+        """Удаляет из кэша результаты для образа, измененного copy или delete"""
+        if self.cache is not None:
+            self.cache.invalidate(image)
+
+    async def inspect(self,
+                      image: str,
+                      progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+                      timeout: Optional[float] = None) -> Tuple[bool, str, str]:
+        """Получает информацию об образе"""
+        command = [self.skopeo_path, "inspect", image]
+        return await self._run_cached("inspect", image, command, progress_callback, timeout)
+
+    async def get_inspect_result(self,
+                                 image: str,
+                                 progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+                                 timeout: Optional[float] = None) -> Tuple[bool, Optional[InspectResult], str]:
+        """
+        Получает разобранную информацию об образе
+
+        Returns:
+            Tuple[bool, Optional[InspectResult], str]: (success, result, error_message)
+        """
+        success, stdout, stderr = await self.inspect(image, progress_callback, timeout)
+        if not success:
+            return False, None, stderr
+        try:
+            return True, InspectResult.from_json(stdout), ""
+        except ValueError as e:
+            return False, None, f"Invalid inspect output: {e}"
+
+    async def delete(self,
+                     image: str,
+                     progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+                     timeout: Optional[float] = None) -> Tuple[bool, str, str]:
+        """Удаляет образ"""
+        command = [self.skopeo_path, "delete", image]
+        try:
+            return await self._run_tracked("delete", command, progress_callback, timeout, source=image)
+        finally:
+            self._invalidate_cached(image)
+
+    async def get_manifest_digest(self,
+                                  image: str,
+                                  progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+                                  timeout: Optional[float] = None) -> Tuple[bool, str, str]:
+        """Получает digest манифеста образа (см. SkopeoWrapper.get_manifest_digest)"""
+        command = [self.skopeo_path, *_manifest_digest_args(image)]
+        return await self._run_cached("manifest_digest", image, command, progress_callback, timeout)
+
+    async def image_exists(self,
+                           image: str,
+                           progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+                           timeout: Optional[float] = None,
+                           probe: str = "full") -> Tuple[bool, bool, str]:
+        """
+        Проверяет существование образа в репозитории
+
+        Args:
+            probe: Способ проверки: "full" или "raw" (только манифест)
+
+        Returns:
+            Tuple[bool, bool, str]: (success, exists, error_message)
+        """
+        command = _probe_command(self.skopeo_path, image, probe)
+        success, stdout, stderr = await self._run_tracked("image_exists", command, progress_callback, timeout, source=image)
+        return _classify_image_exists(success, stderr)
+
+    async def images_exist(self,
+                           images: Iterable[str],
+                           concurrency: int = 16,
+                           timeout: Optional[float] = None,
+                           probe: str = "full") -> Dict[str, Tuple[bool, bool, str]]:
+        """
+        Проверяет существование множества образов параллельно
+
+        Повторяющиеся ссылки проверяются один раз.
+
+        Returns:
+            Dict[str, Tuple[bool, bool, str]]: ссылка -> (success, exists, error_message)
+        """
+        unique_images = list(dict.fromkeys(images))
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def check(image: str) -> Tuple[bool, bool, str]:
+            async with semaphore:
+                return await self.image_exists(image, timeout=timeout, probe=probe)
+
+        results = await asyncio.gather(*[check(image) for image in unique_images])
+        return dict(zip(unique_images, results))
+
+    def get_metrics(self) -> Optional[str]:
+        """Возвращает метрики в формате Prometheus"""
+        if self.metrics:
+            return self.metrics.get_metrics()
+        return None
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Кэш результатов inspect и manifest-digest для skopeo-wrapper
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from .metrics import SkopeoMetrics
+
+
+def is_digest_reference(image: str) -> bool:
+    """
+    Проверяет, закреплена ли ссылка на образ по digest
+
+    Такие ссылки неизменяемы, поэтому их результаты можно кэшировать бессрочно.
+    """
+    return "@sha256:" in image
+
+
+class ResultCache(ABC):
+    """
+    Базовый класс кэша результатов операций skopeo
+
+    Кэшируется stdout успешных операций по ключу (operation, image).
+    Подклассы реализуют _get, _set, invalidate и clear.
+    """
+
+    name = "base"
+
+    def __init__(self, ttl: Optional[float] = 300.0, metrics: Optional[SkopeoMetrics] = None):
+        """
+        Args:
+            ttl: Время жизни записей для ссылок по тегу в секундах
+                (None - без ограничения). Записи для ссылок по digest не устаревают.
+            metrics: Метрики для учета попаданий, промахов и вытеснений
+        """
+        self.ttl = ttl
+        self.metrics = metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+
+    def _expires_at(self, image: str) -> Optional[float]:
+        """Возвращает момент устаревания записи или None для бессрочных"""
+        if self.ttl is None or is_digest_reference(image):
+            return None
+        return time.time() + self.ttl
+
+    def get(self, operation: str, image: str) -> Optional[str]:
+        """Возвращает закэшированный stdout или None"""
+        value = self._get(operation, image)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if self.metrics:
+            self.metrics.record_cache_lookup(self.name, value is not None)
+        return value
+
+    def set(self, operation: str, image: str, stdout: str) -> None:
+        """Сохраняет stdout успешной операции"""
+        self._set(operation, image, stdout, self._expires_at(image))
+
+    def _record_eviction(self, reason: str) -> None:
+        with self._stats_lock:
+            self.evictions += 1
+        if self.metrics:
+            self.metrics.record_cache_eviction(self.name, reason)
+
+    @abstractmethod
+    def _get(self, operation: str, image: str) -> Optional[str]:
+        """Возвращает действующую запись или None"""
+
+    @abstractmethod
+    def _set(self, operation: str, image: str, stdout: str, expires_at: Optional[float]) -> None:
+        """Сохраняет запись со сроком действия expires_at"""
+
+    @abstractmethod
+    def invalidate(self, image: str) -> None:
+        """Удаляет записи всех операций для образа (после copy или delete в него)"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Удаляет все записи"""
+
+
+class MemoryResultCache(ResultCache):
+    """Потокобезопасный LRU-кэш в памяти с TTL и ограничением размера"""
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 300.0, metrics: Optional[SkopeoMetrics] = None):
+        """
+        Args:
+            maxsize: Максимальное количество записей
+            ttl: Время жизни записей для ссылок по тегу в секундах
+            metrics: Метрики для учета попаданий, промахов и вытеснений
+        """
+        super().__init__(ttl=ttl, metrics=metrics)
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, operation: str, image: str) -> Optional[str]:
+        key = (operation, image)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stdout, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                expired = True
+            else:
+                self._entries.move_to_end(key)
+                expired = False
+        if expired:
+            self._record_eviction("expired")
+            return None
+        return stdout
+
+    def _set(self, operation: str, image: str, stdout: str, expires_at: Optional[float]) -> None:
+        evicted = 0
+        with self._lock:
+            self._entries[(operation, image)] = (stdout, expires_at)
+            self._entries.move_to_end((operation, image))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                evicted += 1
+        for _ in range(evicted):
+            self._record_eviction("size")
+
+    def invalidate(self, image: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == image]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def default_cache_dir() -> str:
+    """Возвращает каталог кэша skopeo-wrapper по спецификации XDG"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "skopeo-wrapper")
+
+
+class DiskResultCache(ResultCache):
+    """
+    Кэш на диске (SQLite), общий для нескольких процессов
+
+    Конкурентный доступ из разных процессов и потоков обеспечивается
+    блокировками файла базы данных SQLite.
+    """
+
+    name = "disk"
+
+    def __init__(self,
+                 path: Optional[str] = None,
+                 ttl: Optional[float] = 300.0,
+                 maxsize: Optional[int] = None,
+                 metrics: Optional[SkopeoMetrics] = None,
+                 busy_timeout: float = 30.0):
+        """
+        Args:
+            path: Путь к файлу базы (по умолчанию в каталоге кэша XDG)
+            ttl: Время жизни записей для ссылок по тегу в секундах
+            maxsize: Максимальное количество записей (None - без ограничения)
+            metrics: Метрики для учета попаданий, промахов и вытеснений
+            busy_timeout: Время ожидания блокировки базы в секундах
+        """
+        super().__init__(ttl=ttl, metrics=metrics)
+        self.path = path or os.path.join(default_cache_dir(), "results.sqlite3")
+        self.maxsize = maxsize
+        self.busy_timeout = busy_timeout
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " operation TEXT NOT NULL,"
+                " image TEXT NOT NULL,"
+                " stdout TEXT NOT NULL,"
+                " expires_at REAL,"
+                " stored_at REAL NOT NULL,"
+                " PRIMARY KEY (operation, image))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Отдельное соединение на каждую операцию: соединения SQLite
+        # нельзя разделять между потоками, а открытие файла дешево
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def _get(self, operation: str, image: str) -> Optional[str]:
+        connection = self._connect()
+        try:
+            with connection:
+                row = connection.execute(
+                    "SELECT stdout, expires_at FROM results WHERE operation = ? AND image = ?",
+                    (operation, image)
+                ).fetchone()
+                if row is None:
+                    return None
+                stdout, expires_at = row
+                if expires_at is None or expires_at > time.time():
+                    return stdout
+                connection.execute(
+                    "DELETE FROM results WHERE operation = ? AND image = ? AND expires_at = ?",
+                    (operation, image, expires_at)
+                )
+        finally:
+            connection.close()
+        self._record_eviction("expired")
+        return None
+
+    def _set(self, operation: str, image: str, stdout: str, expires_at: Optional[float]) -> None:
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO results (operation, image, stdout, expires_at, stored_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (operation, image, stdout, expires_at, time.time())
+                )
+                evicted = 0
+                if self.maxsize is not None:
+                    evicted = connection.execute(
+                        "DELETE FROM results WHERE rowid IN ("
+                        " SELECT rowid FROM results ORDER BY stored_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                        (self.maxsize,)
+                    ).rowcount
+        finally:
+            connection.close()
+        for _ in range(evicted):
+            self._record_eviction("size")
+
+    def invalidate(self, image: str) -> None:
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("DELETE FROM results WHERE image = ?", (image,))
+        finally:
+            connection.close()
+
+    def clear(self) -> None:
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("DELETE FROM results")
+        finally:
+            connection.close()
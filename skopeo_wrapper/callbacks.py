@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Ограничение частоты вызовов progress_callback
+"""
+
+import dataclasses
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Optional
+
+from .skopeo_wrapper import ProgressInfo
+
+
+def _snapshot(progress: ProgressInfo) -> ProgressInfo:
+    """Копия ProgressInfo, которую парсер больше не изменит (парсер остается общим)"""
+    blob = progress.current_blob
+    return dataclasses.replace(progress, current_blob=dataclasses.replace(blob) if blob else None)
+
+
+class ThrottledProgressCallback:
+    """
+    Обертка progress_callback с ограничением частоты вызовов
+
+    Вызывает callback не чаще одного раза в min_interval секунд. Промежуточные
+    события, пришедшие в течение интервала, не накапливаются: доставляется
+    только последнее из них. События завершения и ошибки доставляются всегда.
+
+    При asynchronous=True callback выполняется в отдельном потоке, и поток
+    чтения вывода skopeo никогда не ждет пользовательский код. Какие события
+    доставляются, решается в момент вызова, как и в синхронном режиме; если
+    callback не успевает, еще не доставленное промежуточное событие
+    заменяется следующим.
+
+        callback = ThrottledProgressCallback(save_to_db, min_interval=1.0, asynchronous=True)
+        skopeo.copy(source, destination, progress_callback=callback)
+
+    SkopeoWrapper вызывает flush() после финального события, поэтому к
+    возврату из copy все события уже доставлены.
+    """
+
+    def __init__(self,
+                 callback: Callable[[ProgressInfo], None],
+                 min_interval: float = 0.1,
+                 asynchronous: bool = False):
+        """
+        Args:
+            callback: Исходный callback прогресса
+            min_interval: Минимальный интервал между вызовами в секундах
+            asynchronous: Вызывать callback в отдельном потоке
+        """
+        self.callback = callback
+        self.min_interval = min_interval
+        self.asynchronous = asynchronous
+        self._condition = threading.Condition()
+        self._pending: Optional[ProgressInfo] = None
+        self._queue: Deque[ProgressInfo] = deque()
+        self._last_delivery = float("-inf")
+        self._delivering = False
+        self._closed = False
+        self._worker: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _is_final(progress: ProgressInfo) -> bool:
+        return progress.completed or progress.error is not None
+
+    def __call__(self, progress: ProgressInfo) -> None:
+        snapshot = _snapshot(progress)
+        if self.asynchronous:
+            self._submit(snapshot)
+            return
+
+        with self._condition:
+            due = self._is_final(snapshot) or time.monotonic() - self._last_delivery >= self.min_interval
+            if not due:
+                # Последнее событие вытесняет предыдущее недоставленное
+                self._pending = snapshot
+                return
+            self._pending = None
+            self._last_delivery = time.monotonic()
+        self.callback(snapshot)
+
+    def _submit(self, snapshot: ProgressInfo) -> None:
+        """Передает событие потоку доставки"""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("ThrottledProgressCallback is closed")
+            now = time.monotonic()
+            if self._is_final(snapshot) or now - self._last_delivery >= self.min_interval:
+                # Решение о доставке принимается здесь, как и в синхронном режиме,
+                # поэтому последовательность событий не зависит от потока доставки
+                self._pending = None
+                self._last_delivery = now
+                queued = self._queue[-1] if self._queue else None
+                if queued is not None and not self._is_final(queued) and not self._is_final(snapshot):
+                    # Callback не успевает: недоставленное промежуточное событие вытесняется
+                    self._queue[-1] = snapshot
+                else:
+                    self._queue.append(snapshot)
+            else:
+                # Последнее событие вытесняет предыдущее недоставленное
+                self._pending = snapshot
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="skopeo-progress-callback", daemon=True)
+                self._worker.start()
+            self._condition.notify_all()
+
+    def _run(self) -> None:
+        """Цикл потока доставки событий"""
+        while True:
+            with self._condition:
+                while not self._queue:
+                    if self._pending is None:
+                        if self._closed:
+                            return
+                        self._condition.wait()
+                        continue
+                    delay = self._last_delivery + self.min_interval - time.monotonic()
+                    if delay <= 0:
+                        # Интервал истек: ожидающее событие доставляется
+                        self._queue.append(self._pending)
+                        self._pending = None
+                        self._last_delivery = time.monotonic()
+                        break
+                    # Ждем конца интервала; новое событие заменит ожидающее
+                    self._condition.wait(delay)
+                progress = self._queue.popleft()
+                self._delivering = True
+            try:
+                self.callback(progress)
+            finally:
+                with self._condition:
+                    self._delivering = False
+                    self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Доставляет ожидающее событие
+
+        В асинхронном режиме ждет, пока поток доставки обработает все
+        события. Возвращает False, если timeout истек раньше.
+        """
+        if not self.asynchronous:
+            with self._condition:
+                progress, self._pending = self._pending, None
+                if progress is not None:
+                    self._last_delivery = time.monotonic()
+            if progress is not None:
+                self.callback(progress)
+            return True
+
+        with self._condition:
+            if self._pending is not None:
+                # Ожидающее событие доставляется без ожидания интервала
+                self._queue.append(self._pending)
+                self._pending = None
+                self._last_delivery = time.monotonic()
+                self._condition.notify_all()
+            return self._condition.wait_for(
+                lambda: not self._queue and self._pending is None and not self._delivering, timeout
+            )
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Доставляет оставшиеся события и останавливает поток доставки"""
+        self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            worker = self._worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join(timeout)
+
+    def __enter__(self) -> "ThrottledProgressCallback":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -3,11 +3,15 @@
 Консольный интерфейс для skopeo-wrapper
 """
 
+import os
 import sys
 import argparse
 import json
 from typing import Optional
-from .skopeo_wrapper import SkopeoWrapper, create_progress_callback
+from .skopeo_wrapper import SkopeoWrapper, SkopeoCommandError, create_progress_callback
+from .callbacks import ThrottledProgressCallback
+from .cache import DiskResultCache
+from .metrics import get_metrics
 from . import __version__
 
 
@@ -21,6 +25,11 @@ def main():
   skopeo-wrapper copy docker://alpine:latest dir:/tmp/alpine
   skopeo-wrapper inspect docker://ubuntu:22.04
   skopeo-wrapper copy docker://nginx:latest dir:/tmp/nginx --progress
+  skopeo-wrapper copy docker://nginx:latest dir:/tmp/nginx --progress --pty
+  skopeo-wrapper --cache inspect docker://ubuntu:22.04
+  skopeo-wrapper list-tags docker://quay.io/app --json-lines
+  skopeo-wrapper sync docker://quay.io/app docker://mirror.local/app --tag-filter 'v.*'
+  skopeo-wrapper serve-metrics --port 8000 --cache-interval 5
         """
     )
     
@@ -32,6 +41,10 @@ def main():
     copy_parser.add_argument('destination', help='Назначение')
     copy_parser.add_argument('--progress', action='store_true', help='Показать прогресс')
     copy_parser.add_argument('--timeout', type=int, help='Таймаут в секундах')
+    copy_parser.add_argument('--pty', action='store_true',
+                             help='Запустить skopeo в псевдотерминале для побайтового прогресса')
+    copy_parser.add_argument('--skip-if-present', action='store_true',
+                             help='Не копировать, если в назначении уже есть манифест с тем же digest')
     
     # Команда inspect
     inspect_parser = subparsers.add_parser('inspect', help='Инспекция образа')
@@ -58,6 +71,32 @@ def main():
     exists_parser.add_argument('--progress', action='store_true', help='Показать прогресс')
     exists_parser.add_argument('--timeout', type=int, help='Таймаут в секундах')
     exists_parser.add_argument('--json', action='store_true', help='Вывести результат в формате JSON')
+    exists_parser.add_argument('--probe', choices=['full', 'raw'], default='full',
+                               help='Способ проверки: full - полный inspect, raw - только манифест')
+    
+    # Команда list-tags
+    tags_parser = subparsers.add_parser('list-tags', help='Список тегов репозитория')
+    tags_parser.add_argument('repository', help='Репозиторий, например docker://quay.io/app')
+    tags_parser.add_argument('--timeout', type=int, help='Таймаут в секундах')
+    tags_parser.add_argument('--json-lines', action='store_true',
+                             help='Выводить по одному JSON-объекту на тег')
+    
+    # Команда sync
+    sync_parser = subparsers.add_parser('sync', help='Синхронизация тегов репозитория')
+    sync_parser.add_argument('source', help='Репозиторий-источник, например docker://quay.io/app')
+    sync_parser.add_argument('destination', help='Репозиторий-назначение')
+    sync_parser.add_argument('--tag-filter', help='Регулярное выражение для отбора тегов')
+    sync_parser.add_argument('--workers', type=int, default=8, help='Количество тегов, обрабатываемых одновременно')
+    sync_parser.add_argument('--copy-workers', type=int, default=4, help='Количество одновременных копирований')
+    sync_parser.add_argument('--timeout', type=int, help='Таймаут каждой команды в секундах')
+    
+    # Команда serve-metrics
+    serve_parser = subparsers.add_parser('serve-metrics', aliases=['metrics-server'],
+                                         help='HTTP-сервер метрик Prometheus')
+    serve_parser.add_argument('--host', default='0.0.0.0', help='Адрес для прослушивания')
+    serve_parser.add_argument('--port', type=int, default=8000, help='Порт')
+    serve_parser.add_argument('--cache-interval', type=float, default=1.0,
+                              help='Время жизни отрисованных метрик в секундах')
     
     
     # Общие аргументы
@@ -65,6 +104,11 @@ def main():
     parser.add_argument('--skopeo-path', default='skopeo', help='Путь к исполняемому файлу skopeo')
     parser.add_argument('--enable-metrics', action='store_true', help='Включить сбор метрик')
     parser.add_argument('--disable-metrics', action='store_true', help='Отключить сбор метрик')
+    parser.add_argument('--cache', action='store_true',
+                        help='Кэшировать результаты inspect и manifest-digest на диске')
+    parser.add_argument('--cache-dir', help='Каталог дискового кэша (по умолчанию $XDG_CACHE_HOME/skopeo-wrapper)')
+    parser.add_argument('--cache-ttl', type=float, default=300.0,
+                        help='Время жизни записей кэша для ссылок по тегу в секундах')
     
     args = parser.parse_args()
     
@@ -79,22 +123,37 @@ def main():
     elif hasattr(args, 'disable_metrics') and getattr(args, 'disable_metrics', False):
         enable_metrics = False
     
+    # Дисковый кэш разделяется между процессами CLI
+    cache = None
+    if args.cache or args.cache_dir:
+        cache_path = os.path.join(args.cache_dir, "results.sqlite3") if args.cache_dir else None
+        cache = DiskResultCache(path=cache_path, ttl=args.cache_ttl)
+    
     # Создаем экземпляр обертки
-    skopeo = SkopeoWrapper(skopeo_path=args.skopeo_path, enable_metrics=enable_metrics)
+    skopeo = SkopeoWrapper(skopeo_path=args.skopeo_path, enable_metrics=enable_metrics, cache=cache)
     
     # Создаем callback для прогресса
     progress_callback = create_progress_callback(show_progress=getattr(args, 'progress', False)) if getattr(args, 'progress', False) else None
+    if progress_callback and getattr(args, 'pty', False):
+        # Индикаторы skopeo обновляются много раз в секунду
+        progress_callback = ThrottledProgressCallback(progress_callback, min_interval=0.5)
     
     try:
         if args.command == 'copy':
-            success, stdout, stderr = skopeo.copy(
+            result = skopeo.copy(
                 source=args.source,
                 destination=args.destination,
                 progress_callback=progress_callback,
-                timeout=getattr(args, 'timeout', None)
+                timeout=getattr(args, 'timeout', None),
+                use_pty=args.pty,
+                skip_if_present=args.skip_if_present
             )
+            success, stdout, stderr = result
             
-            if success:
+            if success and result.skipped:
+                print("⏭️  Образ уже есть в назначении, копирование пропущено")
+                sys.exit(0)
+            elif success:
                 print("✅ Копирование завершено успешно!")
                 sys.exit(0)
             else:
@@ -102,21 +161,22 @@ def main():
                 sys.exit(1)
                 
         elif args.command == 'inspect':
-            success, stdout, stderr = skopeo.inspect(
-                image=args.image,
-                progress_callback=progress_callback,
-                timeout=getattr(args, 'timeout', None)
-            )
+            if args.json:
+                success, result, stderr = skopeo.get_inspect_result(
+                    image=args.image,
+                    progress_callback=progress_callback,
+                    timeout=getattr(args, 'timeout', None)
+                )
+                stdout = json.dumps(result.raw, indent=2, ensure_ascii=False) if success else ""
+            else:
+                success, stdout, stderr = skopeo.inspect(
+                    image=args.image,
+                    progress_callback=progress_callback,
+                    timeout=getattr(args, 'timeout', None)
+                )
             
             if success:
-                if args.json:
-                    try:
-                        data = json.loads(stdout)
-                        print(json.dumps(data, indent=2, ensure_ascii=False))
-                    except json.JSONDecodeError:
-                        print(stdout)
-                else:
-                    print(stdout)
+                print(stdout)
                 sys.exit(0)
             else:
                 print(f"❌ Ошибка инспекции: {stderr}")
@@ -154,7 +214,8 @@ def main():
             success, exists, error_msg = skopeo.image_exists(
                 image=args.image,
                 progress_callback=progress_callback,
-                timeout=getattr(args, 'timeout', None)
+                timeout=getattr(args, 'timeout', None),
+                probe=args.probe
             )
             
             if success:
@@ -184,6 +245,48 @@ def main():
                     print(f"❌ Ошибка проверки образа: {error_msg}")
                 sys.exit(1)
                 
+        elif args.command == 'list-tags':
+            try:
+                # Теги выводятся по мере чтения вывода skopeo
+                for tag in skopeo.list_tags(args.repository, timeout=args.timeout):
+                    if args.json_lines:
+                        print(json.dumps({"repository": args.repository, "tag": tag}, ensure_ascii=False), flush=True)
+                    else:
+                        print(tag, flush=True)
+            except SkopeoCommandError as e:
+                print(f"❌ Ошибка получения тегов: {e.stderr.strip() or e}", file=sys.stderr)
+                sys.exit(1)
+            sys.exit(0)
+                
+        elif args.command == 'sync':
+            try:
+                result = skopeo.sync(
+                    args.source,
+                    args.destination,
+                    tag_filter=args.tag_filter,
+                    max_workers=args.workers,
+                    copy_workers=args.copy_workers,
+                    timeout=args.timeout
+                )
+            except SkopeoCommandError as e:
+                print(f"❌ Ошибка получения тегов: {e.stderr.strip() or e}")
+                sys.exit(1)
+            
+            for tag, error in sorted(result.failed.items()):
+                print(f"❌ {tag}: {error}")
+            print(f"Скопировано: {len(result.copied)}, пропущено: {len(result.skipped)}, ошибок: {len(result.failed)}")
+            sys.exit(0 if result.success else 1)
+                
+        elif args.command in ('serve-metrics', 'metrics-server'):
+            # В режиме multiprocess (PROMETHEUS_MULTIPROC_DIR) отдается
+            # сумма метрик всех процессов, использующих каталог
+            metrics = skopeo.metrics or get_metrics()
+            server = metrics.serve(port=args.port, addr=args.host, cache_interval=args.cache_interval)
+            print(f"📈 Метрики доступны на http://{args.host}:{server.port}/metrics", flush=True)
+            try:
+                server.thread.join()
+            finally:
+                server.close()
                 
     except KeyboardInterrupt:
         print("\n⚠️  Операция прервана пользователем")
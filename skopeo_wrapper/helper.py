@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Долгоживущий помощник для массовых операций skopeo
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .skopeo_wrapper import SkopeoCommandError, SkopeoWrapper
+
+# Сигнал остановки потока-диспетчера
+_STOP = object()
+
+
+@dataclass
+class _Request:
+    """Операция в очереди помощника"""
+    operation: str
+    image: str
+    timeout: Optional[int]
+    future: Future
+    # Назначение для copy
+    destination: Optional[str] = None
+
+    @property
+    def key(self) -> Tuple[str, str, Optional[str]]:
+        """Ключ объединения одинаковых операций"""
+        return self.operation, self.image, self.destination
+
+
+def _split_tag(image: str) -> Optional[Tuple[str, str]]:
+    """Разделяет docker://репозиторий:тег; None для ссылок по digest и без тега"""
+    if not image.startswith("docker://") or "@" in image:
+        return None
+    repository, _, tag = image.rpartition(":")
+    if not tag or "/" in tag:
+        return None
+    return repository, tag
+
+
+class SkopeoHelper:
+    """
+    Долгоживущий помощник, которому SkopeoWrapper передает множество операций
+
+    skopeo не имеет режима сервера: каждая команда - отдельный процесс со
+    своей авторизацией в реестре. Помощник сокращает количество запусков:
+
+    - операции принимаются в очередь и выполняются постоянным пулом потоков;
+    - одинаковые операции, пришедшие, пока первая еще выполняется,
+      получают ее результат без запуска второго процесса;
+    - при заданном tags_batch_threshold проверки существования тегов
+      одного репозитория, накопленные за batch_window секунд, выполняются
+      одним `skopeo list-tags`;
+    - копирования, накопленные за batch_window секунд, выполняются
+      SkopeoWrapper.copy_batch: одним `skopeo sync` на префикс назначения.
+
+    Методы возвращают concurrent.futures.Future с тем же результатом, что
+    и соответствующие методы SkopeoWrapper.
+
+        with SkopeoHelper(SkopeoWrapper(), max_workers=16) as helper:
+            futures = [helper.inspect(image) for image in images]
+            results = [future.result() for future in futures]
+    """
+
+    def __init__(self,
+                 skopeo: Optional[SkopeoWrapper] = None,
+                 max_workers: int = 8,
+                 batch_window: float = 0.01,
+                 max_batch: int = 1000,
+                 tags_batch_threshold: Optional[int] = None):
+        """
+        Args:
+            skopeo: Обертка, выполняющая команды (по умолчанию SkopeoWrapper())
+            max_workers: Максимальное количество одновременных процессов skopeo
+            batch_window: Время накопления пакетируемых операций в секундах
+            max_batch: Максимальный размер пакета
+            tags_batch_threshold: Минимальное количество накопленных проверок
+                тегов одного репозитория, при котором они заменяются одним
+                `skopeo list-tags`; None - не заменять. list-tags загружает
+                весь список тегов (для больших репозиториев - много страниц),
+                поэтому порог стоит выбирать больше числа страниц списка
+        """
+        self.skopeo = skopeo if skopeo is not None else SkopeoWrapper()
+        self.max_workers = max_workers
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.tags_batch_threshold = tags_batch_threshold
+        self._queue: "queue.Queue" = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        self._inflight: Dict[Tuple[str, str, Optional[str]], Future] = {}
+        self._lock = threading.Lock()
+        # Операции, которые накапливаются в пакеты: operation -> обработчик пакета
+        self._batchers: Dict[str, Callable[[List[_Request]], None]] = {
+            "image_exists": self._run_exists_batch,
+            "copy": self._run_copy_batch,
+        }
+
+    def start(self) -> "SkopeoHelper":
+        """Запускает пул и поток-диспетчер (вызывается автоматически)"""
+        with self._lock:
+            if self._dispatcher is not None:
+                return self
+            self._executor = ThreadPoolExecutor(max_workers=max(1, self.max_workers),
+                                                thread_name_prefix="skopeo-helper")
+            self._dispatcher = threading.Thread(target=self._run, name="skopeo-helper-dispatcher", daemon=True)
+            self._dispatcher.start()
+        return self
+
+    def close(self) -> None:
+        """Выполняет принятые операции и останавливает помощника"""
+        with self._lock:
+            dispatcher, self._dispatcher = self._dispatcher, None
+        if dispatcher is None:
+            return
+        self._queue.put(_STOP)
+        dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "SkopeoHelper":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def submit(self, operation: str, image: str, timeout: Optional[int] = None) -> Future:
+        """
+        Ставит операцию чтения в очередь
+
+        Args:
+            operation: Метод SkopeoWrapper (inspect, get_manifest_digest, image_exists)
+            image: URL образа
+            timeout: Таймаут команды; для объединенных операций действует
+                таймаут первой из них
+
+        Returns:
+            Future с результатом метода SkopeoWrapper
+        """
+        if operation not in ("inspect", "get_manifest_digest", "image_exists"):
+            raise ValueError(f"Unsupported helper operation: {operation}")
+        return self._enqueue(_Request(operation, image, timeout, Future()))
+
+    def _enqueue(self, request: _Request) -> Future:
+        """Ставит операцию в очередь или возвращает Future уже выполняющейся"""
+        self.start()
+        with self._lock:
+            future = self._inflight.get(request.key)
+            if future is not None:
+                return future
+            self._inflight[request.key] = request.future
+        self._queue.put(request)
+        return request.future
+
+    def inspect(self, image: str, timeout: Optional[int] = None) -> Future:
+        """Future с результатом SkopeoWrapper.inspect"""
+        return self.submit("inspect", image, timeout)
+
+    def get_manifest_digest(self, image: str, timeout: Optional[int] = None) -> Future:
+        """Future с результатом SkopeoWrapper.get_manifest_digest"""
+        return self.submit("get_manifest_digest", image, timeout)
+
+    def image_exists(self, image: str, timeout: Optional[int] = None) -> Future:
+        """Future с результатом SkopeoWrapper.image_exists"""
+        return self.submit("image_exists", image, timeout)
+
+    def copy(self, source: str, destination: str, timeout: Optional[int] = None) -> Future:
+        """
+        Ставит копирование в очередь
+
+        Копирования, накопленные за batch_window, выполняются одним
+        SkopeoWrapper.copy_batch.
+
+        Returns:
+            Future с CopyJobResult (index - порядковый номер в пакете)
+        """
+        return self._enqueue(_Request("copy", source, timeout, Future(), destination))
+
+    def _run(self) -> None:
+        """Цикл диспетчера: немедленный запуск или накопление пакета"""
+        pending: List[_Request] = []
+        deadline = 0.0
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()) if pending else None)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._dispatch_batch(pending)
+                return
+            if item is not None:
+                if item.operation not in self._batchers:
+                    self._executor.submit(self._execute, item)
+                    continue
+                if not pending:
+                    deadline = time.monotonic() + self.batch_window
+                pending.append(item)
+                if len(pending) < self.max_batch and time.monotonic() < deadline:
+                    continue
+            self._dispatch_batch(pending)
+            pending = []
+
+    def _dispatch_batch(self, batch: List[_Request]) -> None:
+        """Передает накопленный пакет обработчикам по типам операций"""
+        by_operation: Dict[str, List[_Request]] = {}
+        for request in batch:
+            by_operation.setdefault(request.operation, []).append(request)
+        for operation, requests in by_operation.items():
+            self._batchers[operation](requests)
+
+    def _finish(self, request: _Request, result=None, error: Optional[BaseException] = None) -> None:
+        """Снимает операцию с учета выполняющихся и передает результат"""
+        with self._lock:
+            self._inflight.pop(request.key, None)
+        if error is not None:
+            request.future.set_exception(error)
+        else:
+            request.future.set_result(result)
+
+    def _execute(self, request: _Request) -> None:
+        """Выполняет одну операцию через SkopeoWrapper"""
+        try:
+            result = getattr(self.skopeo, request.operation)(request.image, timeout=request.timeout)
+        except Exception as e:
+            self._finish(request, error=e)
+        else:
+            self._finish(request, result)
+
+    def _run_exists_batch(self, requests: List[_Request]) -> None:
+        """Группирует проверки существования по репозиторию"""
+        by_repository: Dict[str, List[_Request]] = {}
+        for request in requests:
+            split = _split_tag(request.image)
+            if split is None:
+                self._executor.submit(self._execute, request)
+            else:
+                by_repository.setdefault(split[0], []).append(request)
+
+        threshold = self.tags_batch_threshold
+        for repository, group in by_repository.items():
+            if threshold is not None and len(group) >= max(2, threshold):
+                self._executor.submit(self._exists_by_tags, repository, group)
+            else:
+                for request in group:
+                    self._executor.submit(self._execute, request)
+
+    def _exists_by_tags(self, repository: str, requests: List[_Request]) -> None:
+        """Отвечает на проверки тегов одного репозитория одним list-tags"""
+        timeouts = [request.timeout for request in requests if request.timeout is not None]
+        try:
+            tags = set(self.skopeo.list_tags(repository, timeout=max(timeouts) if timeouts else None))
+        except (SkopeoCommandError, ValueError):
+            # Репозиторий недоступен для list-tags: проверяем образы по одному
+            for request in requests:
+                self._execute(request)
+            return
+
+        for request in requests:
+            self._finish(request, (True, _split_tag(request.image)[1] in tags, ""))
+
+    def _run_copy_batch(self, requests: List[_Request]) -> None:
+        """Передает накопленные копирования в copy_batch"""
+        self._executor.submit(self._copy_batch, requests)
+
+    def _copy_batch(self, requests: List[_Request]) -> None:
+        """Выполняет пакет копирований и раздает результаты"""
+        timeouts = [request.timeout for request in requests if request.timeout is not None]
+        try:
+            results = self.skopeo.copy_batch(
+                [(request.image, request.destination) for request in requests],
+                timeout=max(timeouts) if timeouts else None
+            )
+        except Exception as e:
+            for request in requests:
+                self._finish(request, error=e)
+            return
+
+        for request, result in zip(requests, results):
+            self._finish(request, result)
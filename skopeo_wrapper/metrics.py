@@ -4,30 +4,190 @@ Prometheus метрики для skopeo-wrapper
 """
 
 from prometheus_client import Counter, Histogram, Gauge, Info, CollectorRegistry, generate_latest
-from typing import Optional, Dict, Any
+from prometheus_client import multiprocess
+from prometheus_client.exposition import choose_encoder
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, Iterable, List, Tuple
+from bisect import bisect_left
+import gzip
+import os
+import threading
 import time
 from enum import Enum
 
 
+def get_multiprocess_dir() -> Optional[str]:
+    """
+    Каталог файлов значений режима multiprocess prometheus_client
+    
+    Возвращает PROMETHEUS_MULTIPROC_DIR (или устаревшее
+    prometheus_multiproc_dir), None - режим не включен.
+    """
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir')
+
+
+def observe_many(histogram: Histogram, values: Iterable[float]) -> None:
+    """
+    Записывает набор наблюдений в дочернюю гистограмму за один проход
+    
+    Значения раскладываются по корзинам локально, после чего каждая
+    корзина и сумма увеличиваются одним вызовом inc(). Так блокировки
+    значений берутся не более len(buckets) + 1 раз вместо двух раз на
+    каждое наблюдение.
+    
+    Быстрый путь использует закрытые атрибуты Histogram, поэтому версия
+    prometheus_client ограничена сверху в pyproject.toml.
+    
+    Args:
+        histogram: Гистограмма с уже примененными метками (результат labels())
+        values: Наблюдаемые значения
+    """
+    upper_bounds = getattr(histogram, '_upper_bounds', None)
+    buckets = getattr(histogram, '_buckets', None)
+    total = getattr(histogram, '_sum', None)
+    if upper_bounds is None or buckets is None or total is None or len(upper_bounds) != len(buckets):
+        # Внутреннее устройство prometheus_client изменилось - обычный путь
+        for value in values:
+            histogram.observe(value)
+        return
+    
+    counts = [0] * len(upper_bounds)
+    amount = 0.0
+    for value in values:
+        counts[bisect_left(upper_bounds, value)] += 1
+        amount += value
+    
+    total.inc(amount)
+    for bucket, count in zip(buckets, counts):
+        if count:
+            bucket.inc(count)
+
+
+class CachedExposition:
+    """
+    Отрисованные метрики с кэшированием на interval секунд
+    
+    generate_latest сериализует все ряды реестра (а в режиме multiprocess
+    еще и читает файлы всех процессов). Частые запросы от нескольких
+    реплик Prometheus получают одну и ту же отрисовку: она выполняется не
+    чаще раза в interval секунд для каждого формата, одновременные запросы
+    ждут одну отрисовку, а сжатая gzip версия строится один раз на отрисовку.
+    """
+    
+    def __init__(self, registry: CollectorRegistry, interval: float = 1.0):
+        self.registry = registry
+        self.interval = interval
+        self._lock = threading.Lock()
+        # content type -> (время отрисовки, тело, тело в gzip или None)
+        self._cache: Dict[str, Tuple[float, bytes, Optional[bytes]]] = {}
+    
+    def render(self, accept: str = "", accept_gzip: bool = False) -> Tuple[bytes, str, bool]:
+        """
+        Возвращает (тело, content type, сжато ли gzip) для заголовков запроса
+        
+        Args:
+            accept: Заголовок Accept (application/openmetrics-text - формат OpenMetrics)
+            accept_gzip: Клиент принимает Content-Encoding: gzip
+        """
+        encoder, content_type = choose_encoder(accept)
+        with self._lock:
+            now = time.monotonic()
+            cached = self._cache.get(content_type)
+            if cached is None or now - cached[0] >= self.interval:
+                cached = (now, encoder(self.registry), None)
+            if accept_gzip and cached[2] is None:
+                cached = (cached[0], cached[1], gzip.compress(cached[1], compresslevel=6))
+            self._cache[content_type] = cached
+        if accept_gzip:
+            return cached[2], content_type, True
+        return cached[1], content_type, False
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Отдает метрики по /metrics (и /) из CachedExposition сервера"""
+    
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        accept_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+        body, content_type, compressed = self.server.exposition.render(self.headers.get("Accept", ""), accept_gzip)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        # Запросы Prometheus не пишутся в stderr
+        pass
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """HTTP-сервер метрик, работающий в фоновом потоке (см. SkopeoMetrics.serve)"""
+    
+    daemon_threads = True
+    
+    def __init__(self, address: Tuple[str, int], exposition: CachedExposition):
+        super().__init__(address, _MetricsHandler)
+        self.exposition = exposition
+        self.thread = threading.Thread(target=self.serve_forever, name="skopeo-metrics-server", daemon=True)
+        self.thread.start()
+    
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+    
+    def close(self) -> None:
+        """Останавливает сервер и освобождает порт"""
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+
 class SkopeoOperation(Enum):
     """Типы операций skopeo для метрик"""
     COPY = "copy"
     INSPECT = "inspect"
     DELETE = "delete"
     MANIFEST_DIGEST = "manifest_digest"
+    LIST_TAGS = "list_tags"
 
 
 class SkopeoMetrics:
     """Класс для управления Prometheus метриками skopeo-wrapper"""
     
-    def __init__(self, registry: Optional[CollectorRegistry] = None):
+    def __init__(self, registry: Optional[CollectorRegistry] = None, multiprocess_dir: Optional[str] = None):
         """
         Инициализация метрик
         
+        В режиме multiprocess prometheus_client (gunicorn, uwsgi, пулы
+        процессов) каждый процесс пишет значения в mmap-файлы каталога
+        PROMETHEUS_MULTIPROC_DIR. Переменная должна быть задана до импорта
+        prometheus_client. get_metrics и get_metrics_dict тогда отдают сумму
+        по всем процессам (MultiProcessCollector), skopeo_active_operations
+        суммируется только по живым процессам (livesum). Info в этом режиме
+        не поддерживается, поэтому ряд skopeo_wrapper_version_info
+        создается как Gauge с multiprocess_mode='max'.
+        
         Args:
             registry: Реестр Prometheus (по умолчанию используется глобальный)
+            multiprocess_dir: Каталог файлов значений для агрегирования
+                (по умолчанию PROMETHEUS_MULTIPROC_DIR); можно указать и в
+                процессе, который только экспортирует метрики рабочих процессов
         """
         self.registry = registry or CollectorRegistry()
+        self.multiprocess_dir = multiprocess_dir or get_multiprocess_dir()
+        
+        # Реестр, из которого отдаются метрики: в режиме multiprocess -
+        # сумма файлов всех процессов вместо значений этого процесса
+        if self.multiprocess_dir:
+            self.collector_registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(self.collector_registry, path=self.multiprocess_dir)
+        else:
+            self.collector_registry = self.registry
         
         # Счетчики операций
         self.operations_total = Counter(
@@ -76,19 +236,35 @@ class SkopeoMetrics:
             'skopeo_active_operations',
             'Количество активных операций skopeo',
             ['operation'],
-            registry=self.registry
+            registry=self.registry,
+            # В режиме multiprocess - сумма по живым процессам
+            multiprocess_mode='livesum'
         )
         
         # Информация о версии
-        self.version_info = Info(
-            'skopeo_wrapper_version',
-            'Информация о версии skopeo-wrapper',
-            registry=self.registry
-        )
-        self.version_info.info({
+        version_labels = {
             'version': '1.0.0',
             'python_version': '3.7+'
-        })
+        }
+        if self.multiprocess_dir:
+            # MultiProcessCollector не поддерживает Info: тот же ряд
+            # skopeo_wrapper_version_info отдается как Gauge со значением 1,
+            # одинаковым во всех процессах (max)
+            self.version_info = Gauge(
+                'skopeo_wrapper_version_info',
+                'Информация о версии skopeo-wrapper',
+                list(version_labels),
+                registry=self.registry,
+                multiprocess_mode='max'
+            )
+            self.version_info.labels(**version_labels).set(1)
+        else:
+            self.version_info = Info(
+                'skopeo_wrapper_version',
+                'Информация о версии skopeo-wrapper',
+                registry=self.registry
+            )
+            self.version_info.info(version_labels)
         
         # Счетчики по источникам и назначениям
         self.source_operations_total = Counter(
@@ -104,6 +280,29 @@ class SkopeoMetrics:
             ['destination_type', 'operation'],
             registry=self.registry
         )
+        
+        # Кэш результатов inspect/manifest-digest
+        self.cache_requests_total = Counter(
+            'skopeo_cache_requests_total',
+            'Обращения к кэшу результатов',
+            ['cache', 'result'],
+            registry=self.registry
+        )
+        
+        self.cache_evictions_total = Counter(
+            'skopeo_cache_evictions_total',
+            'Вытеснения записей из кэша результатов',
+            ['cache', 'reason'],
+            registry=self.registry
+        )
+        
+        # Синхронизация репозиториев
+        self.sync_tags_total = Counter(
+            'skopeo_sync_tags_total',
+            'Теги, обработанные при синхронизации репозиториев',
+            ['result'],
+            registry=self.registry
+        )
     
     def record_operation_start(self, operation: str) -> float:
         """
@@ -125,7 +324,8 @@ class SkopeoMetrics:
                            source: Optional[str] = None,
                            destination: Optional[str] = None,
                            blob_count: int = 0,
-                           total_blob_size: int = 0) -> None:
+                           total_blob_size: int = 0,
+                           blob_sizes: Optional[List[int]] = None) -> None:
         """
         Записывает завершение операции
         
@@ -137,6 +337,8 @@ class SkopeoMetrics:
             destination: Назначение (для анализа типов)
             blob_count: Количество обработанных blob'ов
             total_blob_size: Общий размер blob'ов в байтах
+            blob_sizes: Размеры отдельных blob'ов в байтах; если переданы,
+                в гистограмму записываются они вместо среднего размера
         """
         # Уменьшаем счетчик активных операций
         self.active_operations.labels(operation=operation).dec()
@@ -156,11 +358,14 @@ class SkopeoMetrics:
                 status=status
             ).inc(blob_count)
             
-            if total_blob_size > 0:
-                # Записываем средний размер blob'а
+            blob_size_histogram = self.blob_size_bytes.labels(operation=operation)
+            if blob_sizes:
+                # Фактические размеры blob'ов одним проходом
+                observe_many(blob_size_histogram, blob_sizes)
+            elif total_blob_size > 0:
+                # Размеры неизвестны - записываем средний размер blob'а
                 avg_blob_size = total_blob_size / blob_count
-                for _ in range(blob_count):
-                    self.blob_size_bytes.labels(operation=operation).observe(avg_blob_size)
+                observe_many(blob_size_histogram, [avg_blob_size] * blob_count)
         
         # Анализируем типы источников и назначений
         if source:
@@ -177,6 +382,16 @@ class SkopeoMetrics:
                 operation=operation
             ).inc()
     
+    def record_operation_skipped(self, operation: str) -> None:
+        """
+        Записывает операцию, которая не выполнялась, так как ее результат
+        уже достигнут (например, copy образа, уже имеющегося в назначении)
+        
+        Args:
+            operation: Тип операции
+        """
+        self.operations_total.labels(operation=operation, status='skipped').inc()
+    
     def record_error(self, operation: str, error_type: str) -> None:
         """
         Записывает ошибку операции
@@ -203,6 +418,35 @@ class SkopeoMetrics:
         if blob_size and blob_size > 0:
             self.blob_size_bytes.labels(operation=operation).observe(blob_size)
     
+    def record_cache_lookup(self, cache: str, hit: bool) -> None:
+        """
+        Записывает обращение к кэшу результатов
+        
+        Args:
+            cache: Тип кэша (memory, disk)
+            hit: Найдена ли запись
+        """
+        self.cache_requests_total.labels(cache=cache, result='hit' if hit else 'miss').inc()
+    
+    def record_cache_eviction(self, cache: str, reason: str) -> None:
+        """
+        Записывает вытеснение записи из кэша
+        
+        Args:
+            cache: Тип кэша (memory, disk)
+            reason: Причина вытеснения (size, expired)
+        """
+        self.cache_evictions_total.labels(cache=cache, reason=reason).inc()
+    
+    def record_sync_tag(self, result: str) -> None:
+        """
+        Записывает результат синхронизации одного тега
+        
+        Args:
+            result: Результат (copied, skipped, failed)
+        """
+        self.sync_tags_total.labels(result=result).inc()
+    
     def _extract_type_from_url(self, url: str) -> str:
         """
         Извлекает тип из URL (docker, dir, oci, etc.)
@@ -235,7 +479,39 @@ class SkopeoMetrics:
         Returns:
             Строка с метриками в формате Prometheus
         """
-        return generate_latest(self.registry).decode('utf-8')
+        return generate_latest(self.collector_registry).decode('utf-8')
+    
+    def serve(self, port: int = 8000, addr: str = "0.0.0.0", cache_interval: float = 1.0) -> MetricsServer:
+        """
+        Запускает HTTP-сервер метрик в фоновом потоке
+        
+        Отрисовка кэшируется на cache_interval секунд (CachedExposition),
+        поэтому частые запросы не конкурируют с операциями за блокировки
+        метрик. Формат выбирается по заголовку Accept (текстовый формат
+        Prometheus или OpenMetrics), при Accept-Encoding: gzip ответ сжимается.
+        В режиме multiprocess отдается сумма по всем процессам.
+        
+            server = get_metrics().serve(port=8000)
+            ...
+            server.close()
+        
+        Args:
+            port: Порт (0 - выбрать свободный, см. MetricsServer.port)
+            addr: Адрес для прослушивания
+            cache_interval: Время жизни отрисованных метрик в секундах
+        """
+        return MetricsServer((addr, port), CachedExposition(self.collector_registry, cache_interval))
+    
+    def mark_process_dead(self, pid: int) -> None:
+        """
+        Удаляет значения live-метрик завершившегося процесса (режим multiprocess)
+        
+        Вызывается для каждого завершенного рабочего процесса (например, в
+        хуке child_exit gunicorn), иначе его активные операции продолжат
+        учитываться в skopeo_active_operations.
+        """
+        if self.multiprocess_dir:
+            multiprocess.mark_process_dead(pid, self.multiprocess_dir)
     
     def get_metrics_dict(self) -> Dict[str, Any]:
         """
@@ -247,7 +523,7 @@ class SkopeoMetrics:
         metrics_data = {}
         
         # Собираем данные счетчиков
-        for metric in self.registry.collect():
+        for metric in self.collector_registry.collect():
             if hasattr(metric, 'samples'):
                 for sample in metric.samples:
                     key = f"{sample.name}"
@@ -299,6 +575,7 @@ class OperationTracker:
         self.success = False
         self.blob_count = 0
         self.total_blob_size = 0
+        self.blob_sizes: List[int] = []
     
     def __enter__(self):
         self.start_time = self.metrics.record_operation_start(self.operation)
@@ -313,7 +590,8 @@ class OperationTracker:
             source=self.source,
             destination=self.destination,
             blob_count=self.blob_count,
-            total_blob_size=self.total_blob_size
+            total_blob_size=self.total_blob_size,
+            blob_sizes=self.blob_sizes
         )
         
         if exc_type is not None:
@@ -325,5 +603,6 @@ class OperationTracker:
         self.blob_count += 1
         if blob_size:
             self.total_blob_size += blob_size
+            self.blob_sizes.append(blob_size)
         # Не вызываем record_blob_processed здесь, чтобы избежать дублирования
         # Метрики будут записаны в record_operation_end
@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+"""
+Выполнение множества процессов skopeo из одного потока
+"""
+
+import os
+import selectors
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+
+from .metrics import OperationTracker
+from .skopeo_wrapper import (
+    STREAM_CHUNK_SIZE,
+    CommandResult,
+    CopyJobResult,
+    CopyResult,
+    ProgressInfo,
+    SkopeoProgressParser,
+    SkopeoWrapper,
+    _OutputBuffer,
+    _complete_command,
+    _flush_progress_callback,
+    _line_handler,
+    _manifest_digest_args,
+    _open_pty,
+)
+
+# Интервал опроса процессов, закрывших каналы, но еще не завершившихся
+_REAP_INTERVAL = 0.01
+
+
+@dataclass
+class _Job:
+    """Процесс skopeo, выполняемый движком"""
+    command: List[str]
+    parser: SkopeoProgressParser
+    progress_callback: Optional[Callable[[ProgressInfo], None]]
+    timeout: Optional[float]
+    future: Future
+    # Преобразует CommandResult и длительность процесса в результат Future
+    transform: Callable[[CommandResult, float], Any]
+    tracker: Optional[OperationTracker] = None
+    use_pty: bool = False
+    process: Optional[subprocess.Popen] = None
+    terminal_fd: Optional[int] = None
+    stdout: Optional[_OutputBuffer] = None
+    stderr: Optional[_OutputBuffer] = None
+    open_pipes: int = 0
+    deadline: Optional[float] = None
+    timed_out: bool = False
+    # Исключение из progress_callback: процесс завершается, операция неуспешна
+    error: Optional[BaseException] = None
+    started: float = 0.0
+
+
+class SkopeoMultiplexer:
+    """
+    Движок, выполняющий множество процессов skopeo из одного потока
+
+    SkopeoWrapper занимает вызывающий поток на все время команды, поэтому
+    500 одновременных копирований требуют 500 потоков. Движок запускает
+    процессы и читает каналы stdout/stderr (и псевдотерминалы) всех
+    процессов одним циклом на selectors (epoll в Linux) в единственном
+    потоке "skopeo-multiplexer". У каждой задачи свой SkopeoProgressParser;
+    методы возвращают concurrent.futures.Future с тем же результатом, что и
+    соответствующие методы SkopeoWrapper.
+
+    progress_callback и обработчики Future вызываются в потоке движка:
+    медленный callback задерживает все задачи, для него используйте
+    ThrottledProgressCallback(..., asynchronous=True). flush() такого
+    callback'а после завершения процесса выполняется в отдельном пуле
+    потоков, и результат задачи передается в Future после доставки всех
+    событий.
+
+        with SkopeoMultiplexer(SkopeoWrapper(), max_processes=500) as engine:
+            for result in engine.copy_many(pairs):
+                ...
+
+    Требует POSIX: на Windows select не работает с каналами.
+    """
+
+    def __init__(self, skopeo: Optional[SkopeoWrapper] = None, max_processes: int = 256):
+        """
+        Args:
+            skopeo: Обертка, задающая путь к skopeo, метрики и кэш (по умолчанию SkopeoWrapper())
+            max_processes: Максимальное количество одновременных процессов;
+                каждый процесс занимает 2-3 файловых дескриптора
+        """
+        if os.name != "posix":
+            raise RuntimeError("SkopeoMultiplexer requires POSIX: select() does not support pipes on Windows")
+        self.skopeo = skopeo if skopeo is not None else SkopeoWrapper()
+        self.max_processes = max(1, max_processes)
+        self._pending: Deque[_Job] = deque()
+        self._running: List[_Job] = []
+        self._lock = threading.Lock()
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._wakeup: Optional[Tuple[int, int]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._flusher: Optional[ThreadPoolExecutor] = None
+        self._closing = False
+
+    def start(self) -> "SkopeoMultiplexer":
+        """Запускает поток движка (вызывается автоматически)"""
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("SkopeoMultiplexer is closed")
+            if self._thread is not None:
+                return self
+            self._selector = selectors.DefaultSelector()
+            self._wakeup = os.pipe()
+            for fd in self._wakeup:
+                os.set_blocking(fd, False)
+            self._selector.register(self._wakeup[0], selectors.EVENT_READ, None)
+            self._thread = threading.Thread(target=self._run, name="skopeo-multiplexer", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Дожидается принятых задач и останавливает поток движка"""
+        with self._lock:
+            self._closing = True
+            thread = self._thread
+        if thread is None:
+            return
+        self._wake()
+        thread.join()
+        if self._flusher is not None:
+            self._flusher.shutdown(wait=True)
+        self._selector.close()
+        for fd in self._wakeup:
+            os.close(fd)
+
+    def __enter__(self) -> "SkopeoMultiplexer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def submit(self,
+               args: List[str],
+               progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+               timeout: Optional[float] = None,
+               parser: Optional[SkopeoProgressParser] = None,
+               use_pty: bool = False) -> Future:
+        """
+        Ставит команду skopeo в очередь
+
+        Args:
+            args: Аргументы skopeo без имени программы
+            progress_callback: Callback прогресса (вызывается в потоке движка)
+            timeout: Таймаут команды в секундах
+            parser: Парсер прогресса (по умолчанию новый SkopeoProgressParser)
+            use_pty: Подключить stdout к псевдотерминалу (см. SkopeoWrapper.copy)
+
+        Returns:
+            Future с CommandResult
+        """
+        return self._submit(args, progress_callback, timeout, parser, use_pty)
+
+    def copy(self,
+             source: str,
+             destination: str,
+             progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+             timeout: Optional[float] = None,
+             use_pty: bool = False) -> Future:
+        """Future с CopyResult, как у SkopeoWrapper.copy"""
+        def transform(result: CommandResult, _: float) -> CopyResult:
+            self.skopeo._invalidate_cached(destination)
+            return CopyResult(result.success, result.stdout, result.stderr)
+
+        return self._submit(["copy", source, destination], progress_callback, timeout, use_pty=use_pty,
+                            transform=transform, operation="copy", source=source, destination=destination)
+
+    def inspect(self,
+                image: str,
+                progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+                timeout: Optional[float] = None) -> Future:
+        """Future с результатом SkopeoWrapper.inspect"""
+        return self._cached("inspect", image, ["inspect", image], progress_callback, timeout)
+
+    def get_manifest_digest(self,
+                            image: str,
+                            progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+                            timeout: Optional[float] = None) -> Future:
+        """Future с результатом SkopeoWrapper.get_manifest_digest"""
+        return self._cached("manifest_digest", image, _manifest_digest_args(image), progress_callback, timeout)
+
+    def delete(self,
+               image: str,
+               progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+               timeout: Optional[float] = None) -> Future:
+        """Future с результатом SkopeoWrapper.delete"""
+        def transform(result: CommandResult, _: float) -> Tuple[bool, str, str]:
+            self.skopeo._invalidate_cached(image)
+            return result.as_tuple()
+
+        return self._submit(["delete", image], progress_callback, timeout,
+                            transform=transform, operation="delete", source=image)
+
+    def copy_many(self,
+                  pairs: Iterable[Tuple[str, str]],
+                  progress_callback: Optional[Callable[[int, ProgressInfo], None]] = None,
+                  timeout: Optional[float] = None,
+                  use_pty: bool = False) -> Iterator[CopyJobResult]:
+        """
+        Копирует множество образов, как SkopeoWrapper.copy_many, но без
+        потока на задачу: одновременно выполняется до max_processes копирований
+
+        Yields:
+            CopyJobResult по мере завершения задач (не в порядке передачи)
+        """
+        futures: List[Future] = []
+        for index, (source, destination) in enumerate(pairs):
+            job_callback = None
+            if progress_callback:
+                def job_callback(progress: ProgressInfo, index=index):
+                    progress_callback(index, progress)
+
+            def transform(result: CommandResult, duration: float,
+                          index=index, source=source, destination=destination) -> CopyJobResult:
+                self.skopeo._invalidate_cached(destination)
+                return CopyJobResult(
+                    index=index,
+                    source=source,
+                    destination=destination,
+                    success=result.success,
+                    stdout=result.stdout,
+                    stderr=result.stderr,
+                    progress=result.progress,
+                    duration=duration
+                )
+
+            futures.append(self._submit(["copy", source, destination], job_callback, timeout, use_pty=use_pty,
+                                        transform=transform, operation="copy", source=source,
+                                        destination=destination))
+
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Если итерацию прервали, не запускаем оставшиеся задачи
+            for future in futures:
+                future.cancel()
+
+    def _cached(self,
+                operation: str,
+                image: str,
+                args: List[str],
+                progress_callback: Optional[Callable[[ProgressInfo], None]],
+                timeout: Optional[float]) -> Future:
+        """Операция чтения с кэшем результатов обертки"""
+        self.start()
+        cache = self.skopeo.cache
+        if cache is not None:
+            cached = cache.get(operation, image)
+            if cached is not None:
+                future = Future()
+                future.set_result((True, cached, ""))
+                return future
+
+        def transform(result: CommandResult, _: float) -> Tuple[bool, str, str]:
+            if result.success and cache is not None:
+                cache.set(operation, image, result.stdout)
+            return result.as_tuple()
+
+        return self._submit(args, progress_callback, timeout, transform=transform,
+                            operation=operation, source=image)
+
+    def _submit(self,
+                args: List[str],
+                progress_callback: Optional[Callable[[ProgressInfo], None]],
+                timeout: Optional[float],
+                parser: Optional[SkopeoProgressParser] = None,
+                use_pty: bool = False,
+                transform: Callable[[CommandResult, float], Any] = lambda result, _: result,
+                operation: Optional[str] = None,
+                source: Optional[str] = None,
+                destination: Optional[str] = None) -> Future:
+        self.start()
+        skopeo = self.skopeo
+        tracker = None
+        if operation is not None and skopeo.enable_metrics and skopeo.metrics:
+            tracker = OperationTracker(operation, skopeo.metrics, source, destination)
+        job = _Job(
+            command=[skopeo.skopeo_path] + list(args),
+            parser=parser if parser is not None else SkopeoProgressParser(),
+            progress_callback=progress_callback,
+            timeout=timeout,
+            future=Future(),
+            transform=transform,
+            tracker=tracker,
+            use_pty=use_pty
+        )
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("SkopeoMultiplexer is closed")
+            self._pending.append(job)
+        self._wake()
+        return job.future
+
+    def _wake(self) -> None:
+        """Прерывает ожидание select в потоке движка"""
+        try:
+            os.write(self._wakeup[1], b"\0")
+        except BlockingIOError:
+            # Канал пробуждения уже заполнен: движок и так проснется
+            pass
+
+    def _run(self) -> None:
+        """Поток движка: при непредвиденной ошибке задачи завершаются с ней, а не зависают"""
+        try:
+            self._loop()
+        except BaseException as e:
+            with self._lock:
+                self._closing = True
+                jobs = list(self._pending) + self._running
+                self._pending.clear()
+            self._running = []
+            for job in jobs:
+                if job.process is not None and job.process.poll() is None:
+                    job.process.kill()
+                if not job.future.done():
+                    job.future.set_exception(e)
+            raise
+
+    def _loop(self) -> None:
+        """Цикл движка: запуск процессов, чтение каналов, таймауты, завершение"""
+        selector = self._selector
+        while True:
+            self._spawn_pending()
+            with self._lock:
+                if self._closing and not self._pending and not self._running:
+                    return
+
+            for key, _ in selector.select(self._select_timeout()):
+                if key.data is None:
+                    try:
+                        while os.read(key.fd, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                self._read(key)
+
+            now = time.monotonic()
+            for job in list(self._running):
+                if job.open_pipes == 0 and job.process.poll() is not None:
+                    self._finish(job)
+                elif job.deadline is not None and now >= job.deadline and not job.timed_out:
+                    job.timed_out = True
+                    job.process.kill()
+
+    def _select_timeout(self) -> Optional[float]:
+        """Время до ближайшего таймаута или опроса завершающихся процессов"""
+        timeout = None
+        now = time.monotonic()
+        for job in self._running:
+            if job.open_pipes == 0:
+                return _REAP_INTERVAL
+            if job.deadline is not None and not job.timed_out:
+                left = max(0.0, job.deadline - now)
+                timeout = left if timeout is None else min(timeout, left)
+        return timeout
+
+    def _spawn_pending(self) -> None:
+        """Запускает ожидающие задачи в пределах max_processes"""
+        while len(self._running) < self.max_processes:
+            with self._lock:
+                if not self._pending:
+                    return
+                job = self._pending.popleft()
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            self._spawn(job)
+
+    def _spawn(self, job: _Job) -> None:
+        """Запускает процесс задачи и регистрирует его каналы"""
+        job.started = time.monotonic()
+        try:
+            self._start_process(job)
+        except Exception as e:
+            # Нехватка дескрипторов (EMFILE), псевдотерминалов и т.п. завершает
+            # только эту задачу: исключение в потоке движка оставило бы все
+            # Future невыполненными
+            self._abort_spawn(job)
+            self._resolve(job, CommandResult(False, "", str(e), job.parser))
+            return
+        self._running.append(job)
+
+    def _start_process(self, job: _Job) -> None:
+        """Открывает псевдотерминал, запускает процесс и регистрирует каналы в селекторе"""
+        handle_line = _line_handler(job.parser, job.progress_callback)
+        if job.tracker is not None:
+            # Трекер закрывается в _resolve, только если он был открыт
+            tracker, job.tracker = job.tracker, None
+            tracker.__enter__()
+            job.tracker = tracker
+        terminal = _open_pty() if job.use_pty else None
+        if terminal:
+            job.terminal_fd = terminal[0]
+        try:
+            job.process = subprocess.Popen(
+                job.command,
+                stdout=terminal[1] if terminal else subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+        finally:
+            if terminal:
+                os.close(terminal[1])
+
+        job.stdout = _OutputBuffer(handle_line, terminal=True) if terminal else _OutputBuffer()
+        job.stderr = _OutputBuffer(handle_line)
+        stdout_fd = terminal[0] if terminal else job.process.stdout.fileno()
+        for fd, output in ((stdout_fd, job.stdout), (job.process.stderr.fileno(), job.stderr)):
+            os.set_blocking(fd, False)
+            self._selector.register(fd, selectors.EVENT_READ, (job, output))
+            job.open_pipes += 1
+        if job.timeout is not None:
+            job.deadline = time.monotonic() + job.timeout
+
+    def _abort_spawn(self, job: _Job) -> None:
+        """Освобождает ресурсы задачи, запуск которой не удался"""
+        process = job.process
+        fds = [job.terminal_fd] if job.terminal_fd is not None else []
+        if process is not None:
+            fds += [pipe.fileno() for pipe in (process.stdout, process.stderr) if pipe is not None]
+        for fd in fds:
+            try:
+                self._selector.unregister(fd)
+            except (KeyError, ValueError):
+                pass
+        job.open_pipes = 0
+        if process is not None:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            for pipe in (process.stdout, process.stderr):
+                if pipe is not None:
+                    pipe.close()
+        if job.terminal_fd is not None:
+            os.close(job.terminal_fd)
+            job.terminal_fd = None
+
+    def _read(self, key: selectors.SelectorKey) -> None:
+        """Читает доступные данные канала и передает строки парсеру задачи"""
+        job, output = key.data
+        try:
+            data = os.read(key.fd, STREAM_CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            # EIO: все дескрипторы slave псевдотерминала закрыты
+            data = b""
+
+        try:
+            if data:
+                output.feed(data)
+                return
+            self._selector.unregister(key.fd)
+            job.open_pipes -= 1
+            output.close()
+        except Exception as e:
+            # Ошибка в callback прогресса завершает только эту задачу
+            if job.error is None:
+                job.error = e
+                job.process.kill()
+
+    def _finish(self, job: _Job) -> None:
+        """Формирует результат завершившегося процесса"""
+        self._running.remove(job)
+        for pipe in (job.process.stdout, job.process.stderr):
+            if pipe is not None:
+                pipe.close()
+        if job.terminal_fd is not None:
+            os.close(job.terminal_fd)
+
+        if job.error is not None:
+            result = CommandResult(False, "", str(job.error), job.parser)
+        elif job.timed_out:
+            result = CommandResult(False, "", "Operation timed out", job.parser)
+        else:
+            try:
+                result = _complete_command(job.process.returncode, job.stdout.getvalue(), job.stderr.getvalue(),
+                                           job.parser, job.progress_callback)
+            except Exception as e:
+                result = CommandResult(False, "", str(e), job.parser)
+        self._resolve(job, result)
+
+    def _resolve(self, job: _Job, result: CommandResult) -> None:
+        """Учитывает операцию в метриках и передает результат в Future"""
+        duration = time.monotonic() - job.started
+        if job.tracker is not None:
+            try:
+                for blob in job.parser.blobs.values():
+                    job.tracker.add_blob(blob.size)
+                job.tracker.__exit__(None, None, None)
+            except Exception:
+                pass
+        if getattr(job.progress_callback, "flush", None) is None:
+            self._complete(job, result, duration)
+            return
+        # flush() буферизующего callback'а ждет доставки событий (с
+        # ThrottledProgressCallback(asynchronous=True) - пока не отработает
+        # пользовательский код) и не должен задерживать чтение каналов
+        self._flush_executor().submit(self._complete, job, result, duration)
+
+    def _complete(self, job: _Job, result: CommandResult, duration: float) -> None:
+        """Доставляет отложенные события прогресса и передает результат в Future"""
+        try:
+            _flush_progress_callback(job.progress_callback)
+        except Exception:
+            pass
+        try:
+            job.future.set_result(job.transform(result, duration))
+        except Exception as e:
+            job.future.set_exception(e)
+
+    def _flush_executor(self) -> ThreadPoolExecutor:
+        """Пул для flush() callback'ов прогресса (создается при первой необходимости)"""
+        if self._flusher is None:
+            self._flusher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="skopeo-multiplexer-flush")
+        return self._flusher
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Распределение операций skopeo по рабочим процессам
+"""
+
+import itertools
+import multiprocessing
+import os
+import pickle
+import struct
+import threading
+from concurrent.futures import Future, InvalidStateError, as_completed
+from dataclasses import dataclass, replace
+from multiprocessing.connection import Connection, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from prometheus_client import multiprocess
+
+from .metrics import get_multiprocess_dir
+from .skopeo_wrapper import CopyJobResult, CopyResult, ProgressInfo
+
+# Этапы прогресса передаются номером в этом списке; неизвестный этап - 0
+_STEPS = ("", "started", "getting_signatures", "copying_blob", "copying_config",
+          "writing_manifest", "storing_signatures", "completed", "error", "skipped")
+_STEP_CODES = {step: code for code, step in enumerate(_STEPS)}
+
+# Флаги события прогресса
+_COMPLETED, _ERROR, _MANIFEST_WRITTEN, _SIGNATURES_STORED = 1, 2, 4, 8
+
+# Типы сообщений рабочего процесса
+_PROGRESS, _RESULT = 0, 1
+
+# Событие прогресса: тип, задача, этап, флаги, скопировано байт,
+# всего байт (-1 - неизвестно), blob'ов всего, blob'ов скопировано
+_PROGRESS_EVENT = struct.Struct("<BIBBqqII")
+
+# Заголовок итогового сообщения: тип, задача; далее pickle результата
+_RESULT_HEADER = struct.Struct("<BI")
+
+# Операции, которые выполняет рабочий процесс (методы SkopeoMultiplexer)
+_OPERATIONS = ("copy", "inspect", "get_manifest_digest", "delete")
+
+
+def encode_progress(job_id: int, progress: ProgressInfo) -> bytes:
+    """Упаковывает событие прогресса в 31 байт"""
+    flags = 0
+    if progress.completed:
+        flags |= _COMPLETED
+    if progress.error:
+        flags |= _ERROR
+    if progress.manifest_written:
+        flags |= _MANIFEST_WRITTEN
+    if progress.signatures_stored:
+        flags |= _SIGNATURES_STORED
+    blobs = progress.parser.blobs.values() if progress.parser is not None else ()
+    total_blobs = copied_blobs = 0
+    for blob in blobs:
+        total_blobs += 1
+        if blob.status in ("copied", "skipped"):
+            copied_blobs += 1
+    return _PROGRESS_EVENT.pack(
+        _PROGRESS, job_id, _STEP_CODES.get(progress.current_step, 0), flags,
+        progress.bytes_copied, -1 if progress.total_bytes is None else progress.total_bytes,
+        total_blobs, copied_blobs
+    )
+
+
+def decode_progress(data: bytes, operation: str = "") -> Tuple[int, ProgressInfo]:
+    """Восстанавливает (задача, ProgressInfo) из события encode_progress"""
+    _, job_id, step, flags, bytes_copied, total_bytes, total_blobs, copied_blobs = _PROGRESS_EVENT.unpack(data)
+    return job_id, ProgressInfo(
+        operation=operation,
+        current_step=_STEPS[step] if step < len(_STEPS) else "",
+        total_blobs=total_blobs,
+        copied_blobs=copied_blobs,
+        manifest_written=bool(flags & _MANIFEST_WRITTEN),
+        signatures_stored=bool(flags & _SIGNATURES_STORED),
+        error="error" if flags & _ERROR else None,
+        completed=bool(flags & _COMPLETED),
+        bytes_copied=bytes_copied,
+        total_bytes=None if total_bytes < 0 else total_bytes
+    )
+
+
+def _worker_main(tasks: Connection,
+                 events: Connection,
+                 skopeo_path: str,
+                 enable_metrics: bool,
+                 max_processes: int,
+                 progress_interval: float) -> None:
+    """
+    Рабочий процесс: выполняет задачи SkopeoMultiplexer'ом
+
+    Задачи приходят как pickle (id, операция, аргументы, timeout, нужен ли
+    прогресс), None - остановка. События прогресса и результаты
+    отправляются из потока движка.
+    """
+    from .callbacks import ThrottledProgressCallback
+    from .metrics import SkopeoMetrics
+    from .multiplexer import SkopeoMultiplexer
+    from .skopeo_wrapper import SkopeoWrapper
+
+    skopeo = SkopeoWrapper(skopeo_path=skopeo_path, enable_metrics=enable_metrics,
+                           metrics=SkopeoMetrics() if enable_metrics else None)
+    send_lock = threading.Lock()
+
+    def send(data: bytes) -> None:
+        with send_lock:
+            events.send_bytes(data)
+
+    def send_result(job_id: int, future: Future) -> None:
+        try:
+            success, stdout, stderr = future.result()
+        except Exception as e:
+            success, stdout, stderr = False, "", str(e)
+        send(_RESULT_HEADER.pack(_RESULT, job_id) + pickle.dumps((success, stdout, stderr)))
+
+    with SkopeoMultiplexer(skopeo, max_processes=max_processes) as engine:
+        while True:
+            try:
+                task = tasks.recv()
+            except EOFError:
+                break
+            if task is None:
+                break
+            job_id, operation, args, timeout, with_progress = task
+
+            callback = None
+            if with_progress:
+                def send_progress(progress: ProgressInfo, job_id=job_id) -> None:
+                    send(encode_progress(job_id, progress))
+                # Промежуточные события одной задачи сливаются до progress_interval
+                callback = ThrottledProgressCallback(send_progress, min_interval=progress_interval)
+
+            future = getattr(engine, operation)(*args, progress_callback=callback, timeout=timeout)
+            future.add_done_callback(lambda future, job_id=job_id: send_result(job_id, future))
+    events.close()
+
+
+@dataclass
+class _PendingJob:
+    """Задача, отправленная рабочему процессу"""
+    worker: int
+    operation: str
+    future: Future
+    progress_callback: Optional[Callable[[ProgressInfo], None]]
+    # Преобразует (success, stdout, stderr, последний прогресс) в результат Future
+    transform: Callable[[bool, str, str, ProgressInfo], Any]
+    progress: Optional[ProgressInfo] = None
+
+
+class SkopeoProcessPool:
+    """
+    Распределение операций skopeo по рабочим процессам
+
+    При сотнях одновременных копирований с подробными callback'ами
+    разбор вывода и обновление метрик упираются в GIL. Пул запускает
+    processes рабочих процессов, в каждом из которых SkopeoMultiplexer
+    выполняет свою долю задач (задачи распределяются по кругу). Разбор
+    вывода skopeo и метрики операций выполняются в рабочих процессах, а
+    в родительский приходят только компактные события прогресса (31 байт,
+    не чаще progress_interval на задачу) и итоговые результаты.
+
+    progress_callback вызывается в потоке-читателе родительского процесса
+    с ProgressInfo, восстановленным из события: parser и current_blob
+    недоступны, blob'ы передаются счетчиками total_blobs и copied_blobs.
+
+    Метрики рабочих процессов видны сборщику Prometheus в режиме
+    multiprocess prometheus_client: переменная PROMETHEUS_MULTIPROC_DIR
+    должна быть задана до создания пула, при остановке пул вызывает
+    multiprocess.mark_process_dead для своих процессов. Сумму по рабочим
+    процессам отдает SkopeoMetrics(multiprocess_dir=...) в родительском.
+
+        with SkopeoProcessPool(processes=4) as pool:
+            for result in pool.copy_many(pairs, progress_callback=on_progress):
+                ...
+
+    Как и SkopeoMultiplexer, требует POSIX.
+    """
+
+    def __init__(self,
+                 processes: Optional[int] = None,
+                 skopeo_path: str = "skopeo",
+                 enable_metrics: bool = True,
+                 max_processes_per_worker: int = 256,
+                 progress_interval: float = 0.1,
+                 mp_context: Optional[multiprocessing.context.BaseContext] = None):
+        """
+        Args:
+            processes: Количество рабочих процессов (по умолчанию os.cpu_count())
+            skopeo_path: Путь к исполняемому файлу skopeo
+            enable_metrics: Собирать метрики в рабочих процессах
+            max_processes_per_worker: Одновременных процессов skopeo на рабочий процесс
+            progress_interval: Минимальный интервал событий прогресса одной задачи
+            mp_context: Контекст multiprocessing (по умолчанию "spawn": родитель
+                многопоточный, и fork мог бы скопировать захваченные блокировки)
+        """
+        self.processes = max(1, processes or os.cpu_count() or 1)
+        self.skopeo_path = skopeo_path
+        self.enable_metrics = enable_metrics
+        self.max_processes_per_worker = max_processes_per_worker
+        self.progress_interval = progress_interval
+        self._context = mp_context or multiprocessing.get_context("spawn")
+        self._workers: List[multiprocessing.process.BaseProcess] = []
+        self._tasks: List[Connection] = []
+        self._events: Dict[Connection, int] = {}
+        self._jobs: Dict[int, _PendingJob] = {}
+        self._job_ids = itertools.count(1)
+        self._next_worker = itertools.cycle(range(self.processes))
+        # Рабочие процессы, закрывшие канал событий
+        self._dead: Set[int] = set()
+        self._lock = threading.Lock()
+        self._reader: Optional[threading.Thread] = None
+        self._closed = False
+
+    def start(self) -> "SkopeoProcessPool":
+        """Запускает рабочие процессы (вызывается автоматически)"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SkopeoProcessPool is closed")
+            if self._reader is not None:
+                return self
+            for index in range(self.processes):
+                task_reader, task_writer = self._context.Pipe(duplex=False)
+                event_reader, event_writer = self._context.Pipe(duplex=False)
+                worker = self._context.Process(
+                    target=_worker_main,
+                    args=(task_reader, event_writer, self.skopeo_path, self.enable_metrics,
+                          self.max_processes_per_worker, self.progress_interval),
+                    name=f"skopeo-worker-{index}",
+                    daemon=True
+                )
+                worker.start()
+                # Концы каналов рабочего процесса в родителе не нужны: иначе
+                # завершение рабочего процесса не даст EOF
+                task_reader.close()
+                event_writer.close()
+                self._workers.append(worker)
+                self._tasks.append(task_writer)
+                self._events[event_reader] = index
+            self._reader = threading.Thread(target=self._read_events, name="skopeo-pool-reader", daemon=True)
+            self._reader.start()
+        return self
+
+    def close(self) -> None:
+        """Дожидается отправленных задач и останавливает рабочие процессы"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            reader = self._reader
+            for tasks in self._tasks:
+                try:
+                    tasks.send(None)
+                except OSError:
+                    pass
+        if reader is None:
+            return
+        reader.join()
+        for worker in self._workers:
+            worker.join()
+        for tasks in self._tasks:
+            tasks.close()
+        path = get_multiprocess_dir()
+        if path:
+            for worker in self._workers:
+                multiprocess.mark_process_dead(worker.pid, path)
+
+    def __enter__(self) -> "SkopeoProcessPool":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def copy(self,
+             source: str,
+             destination: str,
+             progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+             timeout: Optional[float] = None) -> Future:
+        """Future с CopyResult, как у SkopeoWrapper.copy"""
+        return self._submit("copy", (source, destination), progress_callback, timeout,
+                            lambda success, stdout, stderr, _: CopyResult(success, stdout, stderr))
+
+    def inspect(self, image: str, timeout: Optional[float] = None) -> Future:
+        """Future с результатом SkopeoWrapper.inspect"""
+        return self._submit("inspect", (image,), None, timeout)
+
+    def get_manifest_digest(self, image: str, timeout: Optional[float] = None) -> Future:
+        """Future с результатом SkopeoWrapper.get_manifest_digest"""
+        return self._submit("get_manifest_digest", (image,), None, timeout)
+
+    def delete(self, image: str, timeout: Optional[float] = None) -> Future:
+        """Future с результатом SkopeoWrapper.delete"""
+        return self._submit("delete", (image,), None, timeout)
+
+    def copy_many(self,
+                  pairs: Iterable[Tuple[str, str]],
+                  progress_callback: Optional[Callable[[int, ProgressInfo], None]] = None,
+                  timeout: Optional[float] = None) -> Iterator[CopyJobResult]:
+        """
+        Копирует множество образов в рабочих процессах
+
+        Yields:
+            CopyJobResult по мере завершения задач (не в порядке передачи)
+        """
+        futures = []
+        for index, (source, destination) in enumerate(pairs):
+            job_callback = None
+            if progress_callback:
+                def job_callback(progress: ProgressInfo, index=index):
+                    progress_callback(index, progress)
+
+            def transform(success: bool, stdout: str, stderr: str, progress: ProgressInfo,
+                          index=index, source=source, destination=destination) -> CopyJobResult:
+                return CopyJobResult(index=index, source=source, destination=destination, success=success,
+                                     stdout=stdout, stderr=stderr, progress=progress)
+
+            futures.append(self._submit("copy", (source, destination), job_callback, timeout, transform))
+
+        for future in as_completed(futures):
+            yield future.result()
+
+    def _submit(self,
+                operation: str,
+                args: Tuple[str, ...],
+                progress_callback: Optional[Callable[[ProgressInfo], None]],
+                timeout: Optional[float],
+                transform: Optional[Callable[[bool, str, str, ProgressInfo], Any]] = None) -> Future:
+        if operation not in _OPERATIONS:
+            raise ValueError(f"Unsupported pool operation: {operation}")
+        self.start()
+        job_id = next(self._job_ids)
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SkopeoProcessPool is closed")
+            if len(self._dead) == self.processes:
+                raise RuntimeError("All skopeo worker processes exited")
+            worker = next(self._next_worker)
+            while worker in self._dead:
+                worker = next(self._next_worker)
+            self._jobs[job_id] = _PendingJob(
+                worker=worker,
+                operation=operation,
+                future=future,
+                progress_callback=progress_callback,
+                transform=transform or (lambda success, stdout, stderr, _: (success, stdout, stderr))
+            )
+            try:
+                self._tasks[worker].send((job_id, operation, args, timeout, progress_callback is not None))
+            except OSError as e:
+                # Рабочий процесс завершился; его задачи завершит поток-читатель
+                del self._jobs[job_id]
+                future.set_exception(RuntimeError(f"skopeo worker process {worker} is unavailable: {e}"))
+        return future
+
+    def _read_events(self) -> None:
+        """Поток-читатель: события и результаты всех рабочих процессов"""
+        connections = list(self._events)
+        while connections:
+            for connection in wait(connections):
+                try:
+                    data = connection.recv_bytes()
+                except (EOFError, OSError):
+                    connections.remove(connection)
+                    self._fail_worker(self._events[connection])
+                    continue
+                try:
+                    if data[0] == _PROGRESS:
+                        self._dispatch_progress(data)
+                    else:
+                        self._dispatch_result(data)
+                except Exception:
+                    # Поврежденное сообщение не должно останавливать поток-читатель:
+                    # иначе все ожидающие Future зависнут
+                    continue
+
+    def _dispatch_progress(self, data: bytes) -> None:
+        job_id, progress = decode_progress(data)
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return
+        progress.operation = job.operation
+        job.progress = progress
+        if job.progress_callback is not None:
+            try:
+                job.progress_callback(progress)
+            except Exception:
+                # Ошибка callback'а не должна останавливать поток-читатель
+                pass
+
+    def _dispatch_result(self, data: bytes) -> None:
+        _, job_id = _RESULT_HEADER.unpack_from(data)
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is None:
+            return
+        try:
+            success, stdout, stderr = pickle.loads(data[_RESULT_HEADER.size:])
+            progress = job.progress or ProgressInfo(operation=job.operation, current_step="")
+            if success and not progress.completed:
+                progress = replace(progress, completed=True, current_step="completed")
+            elif not success:
+                progress = replace(progress, error=stderr or progress.error or "error")
+            result = job.transform(success, stdout, stderr, progress)
+        except Exception as e:
+            _settle(job.future, error=e)
+        else:
+            _settle(job.future, result)
+
+    def _fail_worker(self, worker: int) -> None:
+        """Завершает задачи рабочего процесса, закрывшего канал событий"""
+        with self._lock:
+            self._dead.add(worker)
+            lost = [job_id for job_id, job in self._jobs.items() if job.worker == worker]
+            jobs = [self._jobs.pop(job_id) for job_id in lost]
+        for job in jobs:
+            _settle(job.future, error=RuntimeError(f"skopeo worker process {worker} exited unexpectedly"))
+
+
+def _settle(future: Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+    """Передает результат в Future, если его еще не отменили"""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
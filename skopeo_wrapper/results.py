@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Типизированные результаты операций skopeo
+"""
+
+import json
+import platform
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class InspectResult:
+    """
+    Разобранный результат `skopeo inspect`
+
+    При создании из JSON извлекаются часто используемые поля, а разобранный
+    словарь отбрасывается: сохраняется только исходный текст. Полный словарь
+    `raw` разбирается из текста при первом обращении и затем хранится вместо
+    него. Строка занимает в несколько раз меньше памяти, чем словарь
+    (особенно при десятках тысяч RepoTags), поэтому результат, у которого
+    не запрашивается `raw`, меньше словаря; ценой является повторный разбор
+    JSON при первом обращении к `raw`.
+    """
+
+    __slots__ = (
+        "name",
+        "digest",
+        "architecture",
+        "os",
+        "created",
+        "labels",
+        "layers",
+        "layer_sizes",
+        "_text",
+        "_raw",
+    )
+
+    def __init__(self,
+                 digest: str,
+                 layers: List[str],
+                 architecture: Optional[str] = None,
+                 os: Optional[str] = None,
+                 created: Optional[str] = None,
+                 labels: Optional[Dict[str, str]] = None,
+                 layer_sizes: Optional[List[Optional[int]]] = None,
+                 name: Optional[str] = None,
+                 raw: Optional[Dict[str, Any]] = None,
+                 text: Optional[str] = None):
+        self.name = name
+        self.digest = digest
+        self.architecture = architecture
+        self.os = os
+        self.created = created
+        self.labels = labels or {}
+        self.layers = layers
+        self.layer_sizes = layer_sizes if layer_sizes is not None else [None] * len(layers)
+        self._raw = raw
+        self._text = text
+
+    @classmethod
+    def from_json(cls, text: str) -> "InspectResult":
+        """
+        Создает результат из вывода `skopeo inspect`
+
+        Raises:
+            ValueError: Вывод не является JSON-объектом inspect
+        """
+        data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError("skopeo inspect output is not a JSON object")
+
+        layers = list(data.get("Layers") or [])
+
+        # LayersData с размерами есть в выводе skopeo >= 1.6
+        layers_data = data.get("LayersData") or []
+        sizes = {item.get("Digest"): item.get("Size") for item in layers_data}
+        layer_sizes = [sizes.get(layer) for layer in layers]
+
+        return cls(
+            digest=data.get("Digest", ""),
+            layers=layers,
+            architecture=data.get("Architecture"),
+            os=data.get("Os"),
+            created=data.get("Created"),
+            labels=data.get("Labels"),
+            layer_sizes=layer_sizes,
+            name=data.get("Name"),
+            text=text
+        )
+
+    @property
+    def raw(self) -> Dict[str, Any]:
+        """Полный словарь вывода inspect (разбирается при первом обращении)"""
+        if self._raw is None:
+            self._raw = json.loads(self._text) if self._text is not None else {}
+            self._text = None
+        return self._raw
+
+    @property
+    def total_size(self) -> Optional[int]:
+        """Суммарный размер слоев в байтах или None, если размеры неизвестны"""
+        if not self.layer_sizes or any(size is None for size in self.layer_sizes):
+            return None
+        return sum(self.layer_sizes)
+
+    def __repr__(self) -> str:
+        return (f"InspectResult(name={self.name!r}, digest={self.digest!r}, "
+                f"architecture={self.architecture!r}, os={self.os!r}, layers={len(self.layers)})")
+
+
+def manifest_blobs(text: str) -> Optional[List[Tuple[str, int]]]:
+    """
+    Извлекает digest'ы и размеры blob'ов из вывода `skopeo inspect --raw`
+
+    Возвращает слои и config образа или None, если это список манифестов
+    (multi-arch): какой из образов скопирует skopeo, из него не известно.
+    """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or "layers" not in data:
+        return None
+
+    blobs = []
+    for descriptor in data["layers"] + [data.get("config") or {}]:
+        digest, size = descriptor.get("digest"), descriptor.get("size")
+        if digest is None or size is None:
+            return None
+        blobs.append((digest, int(size)))
+    return blobs
+
+
+# Архитектуры Go (runtime.GOARCH), по которым skopeo выбирает образ из списка манифестов
+_GO_ARCHITECTURES = {
+    "x86_64": "amd64",
+    "amd64": "amd64",
+    "aarch64": "arm64",
+    "arm64": "arm64",
+    "i386": "386",
+    "i686": "386",
+    "armv6l": "arm",
+    "armv7l": "arm",
+    "ppc64le": "ppc64le",
+    "s390x": "s390x",
+    "riscv64": "riscv64",
+}
+
+
+def platform_manifest_digest(text: str, architecture: Optional[str] = None) -> Optional[str]:
+    """
+    Digest манифеста из списка манифестов, который скопирует `skopeo copy`
+
+    Без --all skopeo копирует только образ linux для архитектуры, на
+    которой он запущен, поэтому digest назначения совпадает с digest'ом
+    этого элемента, а не всего списка.
+
+    Args:
+        text: Вывод `skopeo inspect --raw`
+        architecture: Архитектура в обозначениях Go (по умолчанию текущая)
+
+    Returns:
+        Digest манифеста платформы или None, если это не список манифестов
+        или подходящей платформы в нем нет
+    """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("manifests"), list):
+        return None
+
+    if architecture is None:
+        machine = platform.machine().lower()
+        architecture = _GO_ARCHITECTURES.get(machine, machine)
+    for descriptor in data["manifests"]:
+        target = descriptor.get("platform") or {}
+        if target.get("os") == "linux" and target.get("architecture") == architecture:
+            return descriptor.get("digest")
+    return None
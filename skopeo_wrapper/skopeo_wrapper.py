@@ -3,15 +3,32 @@
 Python библиотека-обертка для утилиты skopeo с парсингом прогресса.
 """
 
+import codecs
+import io
+import os
+import selectors
 import subprocess
 import threading
 import time
 import re
 import json
-from typing import Dict, List, Optional, Callable, Any, Tuple
-from dataclasses import dataclass
+import struct
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Callable, Any, Tuple, Iterable, Iterator, Union
+from dataclasses import dataclass, field
 from enum import Enum
 from .metrics import SkopeoMetrics, OperationTracker, get_metrics
+from .cache import ResultCache
+from .results import InspectResult, manifest_blobs, platform_manifest_digest
+from .streaming import iter_json_array
+
+try:
+    import fcntl
+    import pty
+    import termios
+except ImportError:  # Windows: псевдотерминалы недоступны
+    pty = None
 
 
 class SkopeoOperation(Enum):
@@ -20,6 +37,7 @@ class SkopeoOperation(Enum):
     INSPECT = "inspect"
     DELETE = "delete"
     MANIFEST_DIGEST = "manifest-digest"
+    LIST_TAGS = "list-tags"
 
 
 @dataclass
@@ -28,6 +46,7 @@ class BlobInfo:
     sha256: str
     size: Optional[int] = None
     status: str = "pending"  # pending, copying, copied, error
+    bytes_copied: int = 0
 
 
 @dataclass
@@ -43,25 +62,112 @@ class ProgressInfo:
     error: Optional[str] = None
     completed: bool = False
     parser: Optional['SkopeoProgressParser'] = None
+    # Побайтовый прогресс (доступен при копировании с use_pty=True)
+    bytes_copied: int = 0
+    total_bytes: Optional[int] = None
+    bytes_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
+
+
+@dataclass
+class CopyJobResult:
+    """Результат одной задачи массового копирования"""
+    index: int
+    source: str
+    destination: str
+    success: bool
+    stdout: str
+    stderr: str
+    progress: ProgressInfo
+    duration: float = 0.0
+    skipped: bool = False
+
+
+@dataclass
+class SyncResult:
+    """Итог синхронизации репозитория"""
+    copied: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    
+    @property
+    def success(self) -> bool:
+        """Все выбранные теги синхронизированы"""
+        return not self.failed
+
+
+class SkopeoCommandError(Exception):
+    """Команда skopeo завершилась с ошибкой (для потоковых API, не возвращающих статус)"""
+    
+    def __init__(self, command: List[str], returncode: Optional[int], stderr: str):
+        self.command = command
+        self.returncode = returncode
+        self.stderr = stderr
+        if returncode is None:
+            message = f"skopeo command timed out: {' '.join(command[1:])}"
+        else:
+            message = f"skopeo exited with code {returncode}: {stderr.strip()}"
+        super().__init__(message)
 
 
 class SkopeoProgressParser:
     """Парсер для извлечения информации о прогрессе из вывода skopeo"""
     
+    # Регулярные выражения для отдельных типов строк (сохранены для совместимости)
+    patterns = {
+        'getting_signatures': re.compile(r'Getting image source signatures'),
+        'copying_blob': re.compile(r'Copying blob sha256:([a-f0-9]{64})'),
+        'copying_config': re.compile(r'Copying config sha256:([a-f0-9]{64})'),
+        'writing_manifest': re.compile(r'Writing manifest to image destination'),
+        'storing_signatures': re.compile(r'Storing signatures'),
+        'error': re.compile(r'Error: (.+)'),
+        'blob_size': re.compile(r'Copying blob sha256:([a-f0-9]{64}) \((\d+) bytes\)'),
+    }
+    
+    # Строки копирования blob/config одним выражением: blob с размером и без
+    # размера больше не сканируются двумя шаблонами подряд
+    copying_pattern = re.compile(r'Copying (blob|config) sha256:([a-f0-9]{64})(?: \((\d+) bytes\))?')
+    
+    # Строки индикаторов прогресса, которые skopeo выводит на терминал:
+    # "Copying blob 5e3b7ee77381 [===>---] 1.2MiB / 3.3MiB | 1.1 MiB/s"
+    # "Copying blob 5e3b7ee77381 done"
+    progress_bar_pattern = re.compile(
+        r'Copying (blob|config) (?:sha256:)?([a-f0-9]{8,64})\b'
+        r'(?:.*?([\d.]+)\s*([KMGT]i?B|[kMGT]B|B) / ([\d.]+)\s*([KMGT]i?B|[kMGT]B|B)'
+        r'|\s+(done|skipped))'
+    )
+    
     def __init__(self):
         self.progress = ProgressInfo(operation="", current_step="")
         self.blobs: Dict[str, BlobInfo] = {}
+        self._started_at: Optional[float] = None
+        # Суммарный размер blob'ов из манифеста, если он получен заранее
+        self.expected_bytes: Optional[int] = None
+        # Сообщает ли skopeo о скопированных байтах и завершении blob'ов
+        self.byte_progress = True
+    
+    def expect_blobs(self, blobs: Iterable[Tuple[str, int]], byte_progress: bool = True) -> None:
+        """
+        Задает заранее известный список blob'ов образа и их размеры
         
-        # Регулярные выражения для парсинга
-        self.patterns = {
-            'getting_signatures': re.compile(r'Getting image source signatures'),
-            'copying_blob': re.compile(r'Copying blob sha256:([a-f0-9]{64})'),
-            'copying_config': re.compile(r'Copying config sha256:([a-f0-9]{64})'),
-            'writing_manifest': re.compile(r'Writing manifest to image destination'),
-            'storing_signatures': re.compile(r'Storing signatures'),
-            'error': re.compile(r'Error: (.+)'),
-            'blob_size': re.compile(r'Copying blob sha256:([a-f0-9]{64}) \((\d+) bytes\)'),
-        }
+        После этого get_progress_percentage считает прогресс как долю
+        скопированных байт от суммарного размера вместо оценки по этапам.
+        
+        Args:
+            blobs: Пары (digest, размер) из манифеста
+            byte_progress: skopeo запущен в псевдотерминале и рисует индикаторы
+                прогресса. Без них skopeo сообщает только о начале копирования
+                blob'а, поэтому процент остается оценкой по этапам, а размеры
+                дают лишь total_bytes
+        """
+        self.byte_progress = byte_progress
+        total = 0
+        for digest, size in blobs:
+            sha256 = digest[len("sha256:"):] if digest.startswith("sha256:") else digest
+            self.blobs[sha256] = BlobInfo(sha256=sha256, size=size, status="pending")
+            total += size
+        self.expected_bytes = total
+        self.progress.total_bytes = total
     
     def parse_line(self, line: str) -> Optional[ProgressInfo]:
         """Парсит строку вывода skopeo и обновляет информацию о прогрессе"""
@@ -69,64 +175,144 @@ class SkopeoProgressParser:
         
         if not line:
             return None
-            
-        # Получение подписей
-        if self.patterns['getting_signatures'].match(line):
-            self.progress.operation = "copy"
-            self.progress.current_step = "getting_signatures"
-            return self.progress
         
-        # Копирование blob с размером
-        blob_size_match = self.patterns['blob_size'].match(line)
-        if blob_size_match:
-            sha256 = blob_size_match.group(1)
-            size = int(blob_size_match.group(2))
-            self.blobs[sha256] = BlobInfo(sha256=sha256, size=size, status="copying")
-            self.progress.current_blob = self.blobs[sha256]
-            self.progress.current_step = "copying_blob"
-            return self.progress
+        # Выбор обработчика по первому символу: каждая строка проверяется
+        # не более чем одним шаблоном, отладочный вывод отбрасывается сразу
+        first = line[0]
         
-        # Копирование blob без размера
-        blob_match = self.patterns['copying_blob'].match(line)
-        if blob_match:
-            sha256 = blob_match.group(1)
-            if sha256 not in self.blobs:
-                self.blobs[sha256] = BlobInfo(sha256=sha256, status="copying")
+        # Копирование blob или config
+        if first == 'C':
+            match = self.copying_pattern.match(line)
+            if match is None:
+                return self._parse_progress_bar(line)
+            kind, sha256, size = match.groups()
+            if kind == 'blob':
+                if size is not None:
+                    self.blobs[sha256] = BlobInfo(sha256=sha256, size=int(size), status="copying")
+                elif sha256 not in self.blobs:
+                    self.blobs[sha256] = BlobInfo(sha256=sha256, status="copying")
+                elif self.blobs[sha256].status == "pending":
+                    self.blobs[sha256].status = "copying"
+                self.progress.current_step = "copying_blob"
+            else:
+                if sha256 not in self.blobs:
+                    self.blobs[sha256] = BlobInfo(sha256=sha256, status="copying")
+                elif self.blobs[sha256].status == "pending":
+                    self.blobs[sha256].status = "copying"
+                self.progress.current_step = "copying_config"
             self.progress.current_blob = self.blobs[sha256]
-            self.progress.current_step = "copying_blob"
             return self.progress
         
-        # Копирование config
-        config_match = self.patterns['copying_config'].match(line)
-        if config_match:
-            sha256 = config_match.group(1)
-            if sha256 not in self.blobs:
-                self.blobs[sha256] = BlobInfo(sha256=sha256, status="copying")
-            self.progress.current_blob = self.blobs[sha256]
-            self.progress.current_step = "copying_config"
+        # Получение подписей
+        if first == 'G':
+            if not line.startswith('Getting image source signatures'):
+                return None
+            self.progress.operation = "copy"
+            self.progress.current_step = "getting_signatures"
             return self.progress
         
         # Запись манифеста
-        if self.patterns['writing_manifest'].match(line):
+        if first == 'W':
+            if not line.startswith('Writing manifest to image destination'):
+                return None
             self.progress.manifest_written = True
             self.progress.current_step = "writing_manifest"
             return self.progress
         
         # Сохранение подписей
-        if self.patterns['storing_signatures'].match(line):
+        if first == 'S':
+            if not line.startswith('Storing signatures'):
+                return None
             self.progress.signatures_stored = True
             self.progress.current_step = "storing_signatures"
             return self.progress
         
         # Ошибка
-        error_match = self.patterns['error'].match(line)
-        if error_match:
-            self.progress.error = error_match.group(1)
+        if first == 'E' and line.startswith('Error: '):
+            self.progress.error = line[7:]
             self.progress.current_step = "error"
             return self.progress
         
         return None
     
+    def _find_blob(self, digest: str) -> Optional[BlobInfo]:
+        """Ищет blob по полному или сокращенному digest"""
+        blob = self.blobs.get(digest)
+        if blob is None and len(digest) < 64:
+            for sha256, candidate in self.blobs.items():
+                if sha256.startswith(digest):
+                    return candidate
+        return blob
+    
+    def _parse_progress_bar(self, line: str) -> Optional[ProgressInfo]:
+        """Разбирает строку индикатора прогресса с количеством скопированных байт"""
+        match = self.progress_bar_pattern.match(line)
+        if match is None:
+            return None
+        kind, digest, current, current_unit, total, total_unit, finished = match.groups()
+        
+        blob = self._find_blob(digest)
+        if blob is None:
+            blob = self.blobs[digest] = BlobInfo(sha256=digest, status="copying")
+        
+        if finished:
+            blob.status = "copied" if finished == "done" else "skipped"
+            if blob.size is not None:
+                blob.bytes_copied = blob.size
+        else:
+            blob.status = "copying"
+            blob.bytes_copied = _parse_size(current, current_unit)
+            if blob.size is None:
+                blob.size = _parse_size(total, total_unit)
+        
+        self.progress.current_blob = blob
+        self.progress.current_step = "copying_blob" if kind == "blob" else "copying_config"
+        self._update_transfer_rate()
+        return self.progress
+    
+    def _update_transfer_rate(self) -> None:
+        """Пересчитывает объем, скорость и оставшееся время передачи"""
+        now = time.monotonic()
+        if self._started_at is None:
+            self._started_at = now
+        
+        bytes_copied = 0
+        total_bytes = 0
+        for blob in self.blobs.values():
+            bytes_copied += blob.bytes_copied
+            total_bytes += blob.size or 0
+        progress = self.progress
+        progress.bytes_copied = bytes_copied
+        progress.total_bytes = total_bytes or None
+        
+        elapsed = now - self._started_at
+        if elapsed > 0 and bytes_copied > 0:
+            progress.bytes_per_second = bytes_copied / elapsed
+            if progress.total_bytes is not None:
+                progress.eta_seconds = max(0, progress.total_bytes - bytes_copied) / progress.bytes_per_second
+    
+    def _weighted_percentage(self) -> Optional[float]:
+        """
+        Процент выполнения по размерам blob'ов из заранее полученного манифеста
+        
+        Завершенные blob'ы учитываются полным размером, копируемые - по числу
+        скопированных байт. После записи манифеста все blob'ы считаются
+        скопированными. 100% выставляется только по завершении процесса.
+        """
+        if not self.expected_bytes or not self.byte_progress:
+            return None
+        
+        if self.progress.current_step in ("writing_manifest", "storing_signatures"):
+            completed = self.expected_bytes
+        else:
+            completed = 0
+            for blob in self.blobs.values():
+                if blob.status in ("copied", "skipped"):
+                    completed += blob.size or 0
+                else:
+                    completed += blob.bytes_copied
+        return min(99.0, 100.0 * completed / self.expected_bytes)
+    
     def get_progress_percentage(self) -> float:
         """Возвращает процент выполнения операции"""
         if self.progress.error:
@@ -135,6 +321,10 @@ class SkopeoProgressParser:
         if self.progress.completed:
             return 100.0
         
+        weighted = self._weighted_percentage()
+        if weighted is not None:
+            return weighted
+        
         # Примерная оценка прогресса на основе этапов
         if self.progress.current_step == "getting_signatures":
             return 10.0
@@ -153,6 +343,199 @@ class SkopeoProgressParser:
         return 0.0
 
 
+# Поле записи logrus: ключ=значение, значение в кавычках (экранирование Go %q) или без
+_LOGRUS_FIELD = re.compile(r'(\w+)=("(?:[^"\\]|\\.)*"|[^\s"]*)')
+
+
+def _logrus_fields(line: str) -> Dict[str, str]:
+    """
+    Поля строки журнала logrus
+    
+    В текстовом формате (вывод не в терминал) сообщение тоже является
+    полем: time="..." level=info msg="..." from="..." to="...". В
+    терминальном формате (INFO[0001] сообщение from="...") в поля попадают
+    только структурированные данные.
+    """
+    fields = {}
+    for key, value in _LOGRUS_FIELD.findall(line):
+        if value.startswith('"'):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                value = value[1:-1]
+        fields[key] = value
+    return fields
+
+
+class SyncProgressParser(SkopeoProgressParser):
+    """
+    Парсер объединенного вывода `skopeo sync`
+    
+    skopeo sync копирует образы последовательно и перед каждым пишет в
+    журнал "Copying image ref N/M" с полями from и to. Строки копирования
+    после нее относятся к этому образу: они учитываются и в общем прогрессе
+    (progress, blobs), и в отдельном парсере образа (images). Ошибка
+    образа при --keep-going записывается как "Error copying ref" с текстом
+    в поле error. Строки журнала разбираются как в текстовом формате
+    logrus (time=... msg="..."), так и в терминальном (INFO[0001] ...).
+    """
+    
+    image_pattern = re.compile(r'Copying image ref (\d+)/(\d+)')
+    image_error_pattern = re.compile(r'Error copying ref "([^"]+)"(?:: (.*))?')
+    
+    def __init__(self):
+        super().__init__()
+        self.progress.operation = "sync"
+        # Парсеры образов по ссылке назначения
+        self.images: Dict[str, SkopeoProgressParser] = {}
+        # Ошибки копирования по ссылке назначения
+        self.errors: Dict[str, str] = {}
+        self.total_images = 0
+        self.current_destination: Optional[str] = None
+        self._destinations: Dict[str, str] = {}
+    
+    def parse_line(self, line: str) -> Optional[ProgressInfo]:
+        """Разбирает строку и возвращает прогресс образа, к которому она относится"""
+        if "Copying image ref" in line:
+            match = self.image_pattern.search(line)
+            fields = _logrus_fields(line)
+            source, destination = fields.get("from"), fields.get("to")
+            if match and source and destination:
+                self.total_images = int(match.group(2))
+                self._destinations[source] = destination
+                image = self.images[destination] = SkopeoProgressParser()
+                image.progress.operation = "copy"
+                image.progress.current_step = "started"
+                self.current_destination = destination
+                return image.progress
+        
+        if "Error copying ref" in line:
+            fields = _logrus_fields(line)
+            match = self.image_error_pattern.search(fields.get("msg", line))
+            if match:
+                source, detail = match.groups()
+                message = fields.get("error") or detail or "Error copying ref"
+                destination = self._destinations.get(source, source)
+                self.errors[destination] = message
+                self.current_destination = destination
+                image = self.images.get(destination)
+                if image is not None:
+                    image.progress.error = message
+                    image.progress.current_step = "error"
+                    return image.progress
+                return None
+        
+        if super().parse_line(line) is None:
+            return None
+        image = self.images.get(self.current_destination) if self.current_destination else None
+        if image is None:
+            return self.progress
+        return image.parse_line(line)
+    
+    def image_succeeded(self, destination: str, process_succeeded: bool = False) -> bool:
+        """
+        Образ скопирован: sync начал его копирование, ошибок не было, и
+        манифест записан или весь процесс sync завершился успешно
+        
+        Если в выводе нет ни одной строки "Copying image ref" (другой формат
+        журнала), результат определяется только кодом завершения.
+        
+        Args:
+            destination: Ссылка назначения образа
+            process_succeeded: Процесс sync завершился с кодом 0
+        """
+        if destination in self.errors:
+            return False
+        if not self.images:
+            return process_succeeded
+        image = self.images.get(destination)
+        return image is not None and (image.progress.manifest_written or process_succeeded)
+
+
+@dataclass
+class CommandResult:
+    """Результат выполнения одной команды skopeo вместе с ее парсером"""
+    success: bool
+    stdout: str
+    stderr: str
+    parser: SkopeoProgressParser
+    # Команда не выполнялась: результат уже достигнут (copy с skip_if_present)
+    skipped: bool = False
+    
+    @property
+    def progress(self) -> ProgressInfo:
+        """Итоговая информация о прогрессе операции"""
+        return self.parser.progress
+    
+    def as_tuple(self) -> Tuple[bool, str, str]:
+        """Возвращает результат в виде (success, stdout, stderr)"""
+        return self.success, self.stdout, self.stderr
+
+
+class CopyResult(tuple):
+    """
+    Результат copy: распаковывается как (success, stdout, stderr)
+    
+    Атрибут skipped равен True, если копирование не выполнялось, потому что
+    в назначении уже есть манифест с тем же digest (skip_if_present=True).
+    """
+    
+    def __new__(cls, success: bool, stdout: str, stderr: str, skipped: bool = False):
+        result = super().__new__(cls, (success, stdout, stderr))
+        result.skipped = skipped
+        return result
+    
+    @property
+    def success(self) -> bool:
+        return self[0]
+    
+    @property
+    def stdout(self) -> str:
+        return self[1]
+    
+    @property
+    def stderr(self) -> str:
+        return self[2]
+
+
+# Множители единиц размера в индикаторах прогресса skopeo
+_SIZE_UNITS = {
+    'B': 1,
+    'KiB': 1024, 'MiB': 1024 ** 2, 'GiB': 1024 ** 3, 'TiB': 1024 ** 4,
+    'kB': 1000, 'KB': 1000, 'MB': 1000 ** 2, 'GB': 1000 ** 3, 'TB': 1000 ** 4,
+}
+
+
+def _parse_size(value: str, unit: str) -> int:
+    """Переводит размер вида "1.5", "MiB" в байты"""
+    return int(float(value) * _SIZE_UNITS.get(unit, 1))
+
+
+def _sync_destination_prefix(source: str, destination: str) -> Optional[str]:
+    """
+    Префикс назначения для `skopeo sync --dest docker` или None
+    
+    sync копирует registry/path:tag в ПРЕФИКС/path:tag, поэтому пакетировать
+    можно только пары docker:// со ссылкой по тегу, в которых назначение
+    оканчивается путем репозитория источника.
+    """
+    if not (source.startswith("docker://") and destination.startswith("docker://")):
+        return None
+    if "@" in source or "@" in destination:
+        return None
+    registry, _, path = source[len("docker://"):].partition("/")
+    if not path or ":" not in path.rsplit("/", 1)[-1]:
+        return None
+    # Короткие имена Docker Hub ("alpine:3") skopeo раскрывает по-своему
+    if "." not in registry and ":" not in registry and registry != "localhost":
+        return None
+    target = destination[len("docker://"):]
+    suffix = "/" + path
+    if not target.endswith(suffix) or len(target) == len(suffix):
+        return None
+    return target[:-len(suffix)]
+
+
 def get_progress_percentage(progress: ProgressInfo, parser: SkopeoProgressParser) -> float:
     """Возвращает процент выполнения операции"""
     if progress.error:
@@ -161,6 +544,10 @@ def get_progress_percentage(progress: ProgressInfo, parser: SkopeoProgressParser
     if progress.completed:
         return 100.0
     
+    weighted = parser._weighted_percentage()
+    if weighted is not None:
+        return weighted
+    
     # Примерная оценка прогресса на основе этапов
     if progress.current_step == "getting_signatures":
         return 10.0
@@ -179,110 +566,928 @@ def get_progress_percentage(progress: ProgressInfo, parser: SkopeoProgressParser
     return 0.0
 
 
+# Аргументы skopeo для способов проверки существования образа
+_PROBE_ARGS = {
+    "full": ["inspect"],
+    # Только манифест: без config blob'а и без запроса списка тегов
+    "raw": ["inspect", "--raw"],
+}
+
+
+# Размер фрагмента чтения stdout в потоковом API
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Управляющие последовательности терминала, которыми skopeo перерисовывает индикаторы
+_ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+_TERMINAL_LINE_SPLIT = re.compile(r'\r\n|\r|\n')
+
+# Размер псевдотерминала: достаточно широкий, чтобы индикаторы не обрезались
+_PTY_ROWS = 50
+_PTY_COLUMNS = 200
+
+
+def _open_pty() -> Optional[Tuple[int, int]]:
+    """Открывает псевдотерминал и возвращает (master, slave) или None, если он недоступен"""
+    if pty is None:
+        return None
+    master_fd, slave_fd = pty.openpty()
+    winsize = struct.pack("HHHH", _PTY_ROWS, _PTY_COLUMNS, 0, 0)
+    try:
+        fcntl.ioctl(slave_fd, termios.TIOCSWINSZ, winsize)
+    except OSError:
+        os.close(master_fd)
+        os.close(slave_fd)
+        raise
+    return master_fd, slave_fd
+
+
+class _OutputBuffer:
+    """
+    Вывод одного канала процесса: накапливает текст и передает строки парсеру
+
+    Канал читается ровно одним читателем, поэтому строки, переданные
+    парсеру, и возвращаемый текст всегда совпадают. Для псевдотерминала
+    строкой считается любой фрагмент между '\r' и '\n' (индикаторы
+    прогресса перерисовываются через '\r' и ANSI-последовательности), а
+    сохраняются только непустые строки без управляющих последовательностей.
+    """
+
+    def __init__(self, handle_line: Optional[Callable[[str], None]] = None, terminal: bool = False):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        # Как и текстовый режим subprocess, приводим '\r\n' к '\n'; для
+        # терминала '\r' нужен разбору строк и сохраняется
+        self._decoder = decoder if terminal else io.IncrementalNewlineDecoder(decoder, translate=True)
+        self.handle_line = handle_line
+        self.terminal = terminal
+        self._chunks: List[str] = []
+        self._pending = ""
+
+    def feed(self, data: bytes) -> None:
+        """Добавляет прочитанный фрагмент"""
+        self._process(self._decoder.decode(data))
+
+    def close(self) -> None:
+        """Завершает канал: передает парсеру последнюю строку без перевода строки"""
+        self._process(self._decoder.decode(b"", final=True), final=True)
+
+    def getvalue(self) -> str:
+        return "".join(self._chunks)
+
+    def _process(self, text: str, final: bool = False) -> None:
+        if self.terminal:
+            text = _ANSI_ESCAPE.sub("", self._pending + text)
+            *lines, self._pending = _TERMINAL_LINE_SPLIT.split(text)
+            for line in lines:
+                if line:
+                    self._chunks.append(line + "\n")
+                    self.handle_line(line)
+            if final and self._pending:
+                self._chunks.append(self._pending)
+                self.handle_line(self._pending)
+                self._pending = ""
+            return
+
+        if text:
+            self._chunks.append(text)
+        if self.handle_line is None:
+            return
+        *lines, self._pending = (self._pending + text).split("\n")
+        for line in lines:
+            self.handle_line(line)
+        if final and self._pending:
+            self.handle_line(self._pending)
+            self._pending = ""
+
+
+def _communicate(process: subprocess.Popen, outputs: Dict[int, _OutputBuffer], timeout: Optional[float]) -> None:
+    """
+    Читает каналы процесса до их закрытия и дожидается его завершения
+
+    На POSIX все каналы (stdout, stderr, master псевдотерминала) читаются
+    одним циклом на selectors в вызывающем потоке: строки передаются
+    парсеру сразу по мере вывода, без дополнительных потоков и ожиданий их
+    остановки. На Windows select не работает с каналами, поэтому каждый
+    канал читает собственный поток, он же единственный читатель канала.
+
+    Raises:
+        subprocess.TimeoutExpired: Процесс не завершился за timeout секунд
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def remaining() -> Optional[float]:
+        if deadline is None:
+            return None
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise subprocess.TimeoutExpired(process.args, timeout)
+        return left
+
+    if os.name == "posix":
+        with selectors.DefaultSelector() as selector:
+            for fd, output in outputs.items():
+                selector.register(fd, selectors.EVENT_READ, output)
+            while selector.get_map():
+                for key, _ in selector.select(remaining()):
+                    try:
+                        data = os.read(key.fd, STREAM_CHUNK_SIZE)
+                    except OSError:
+                        # EIO: все дескрипторы slave псевдотерминала закрыты
+                        data = b""
+                    if data:
+                        key.data.feed(data)
+                    else:
+                        selector.unregister(key.fd)
+                        key.data.close()
+    else:
+        def read_all(fd: int, output: _OutputBuffer):
+            for data in iter(lambda: os.read(fd, STREAM_CHUNK_SIZE), b""):
+                output.feed(data)
+            output.close()
+
+        readers = [threading.Thread(target=read_all, args=item, daemon=True) for item in outputs.items()]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join(remaining())
+            if reader.is_alive():
+                raise subprocess.TimeoutExpired(process.args, timeout)
+
+    process.wait(remaining())
+
+
+def _line_handler(parser: SkopeoProgressParser,
+                  progress_callback: Optional[Callable[[ProgressInfo], None]]) -> Callable[[str], None]:
+    """Функция, передающая строку вывода парсеру и событие прогресса в callback"""
+    def handle_line(line: str):
+        if not line.strip():
+            return
+        progress_info = parser.parse_line(line)
+        if progress_info and progress_callback:
+            # Добавляем ссылку на парсер для доступа к blob'ам
+            progress_info.parser = parser
+            progress_callback(progress_info)
+    return handle_line
+
+
+def _complete_command(returncode: int,
+                      stdout: str,
+                      stderr: str,
+                      parser: SkopeoProgressParser,
+                      progress_callback: Optional[Callable[[ProgressInfo], None]]) -> CommandResult:
+    """Отмечает завершение команды в прогрессе и передает финальное событие"""
+    if returncode == 0:
+        parser.progress.completed = True
+        parser.progress.current_step = "completed"
+    else:
+        parser.progress.error = f"Process exited with code {returncode}"
+    
+    if progress_callback:
+        # Добавляем ссылку на парсер для финального callback
+        parser.progress.parser = parser
+        progress_callback(parser.progress)
+    
+    return CommandResult(returncode == 0, stdout, stderr, parser)
+
+
+def _flush_progress_callback(progress_callback: Optional[Callable[[ProgressInfo], None]]) -> None:
+    """Доставляет отложенные события callback'а с буферизацией (ThrottledProgressCallback)"""
+    flush = getattr(progress_callback, "flush", None)
+    if flush is not None:
+        flush()
+
+
+def _manifest_digest_args(image: str) -> List[str]:
+    """
+    Аргументы skopeo для получения digest манифеста
+    
+    `skopeo manifest-digest` вычисляет digest локального файла манифеста и не
+    принимает ссылки на образы. Для ссылки digest манифеста сообщает
+    `skopeo inspect`; --no-tags не загружает список тегов репозитория.
+    """
+    if os.path.isfile(image):
+        return ["manifest-digest", image]
+    return ["inspect", "--no-tags", "--format", "{{.Digest}}", image]
+
+
+def _probe_command(skopeo_path: str, image: str, probe: str) -> List[str]:
+    """Формирует команду проверки существования образа"""
+    if probe not in _PROBE_ARGS:
+        raise ValueError(f"Unknown probe mode: {probe!r}, expected one of {sorted(_PROBE_ARGS)}")
+    return [skopeo_path, *_PROBE_ARGS[probe], image]
+
+
+def _classify_image_exists(success: bool, stderr: str) -> Tuple[bool, bool, str]:
+    """
+    Определяет существование образа по результату `skopeo inspect`
+    
+    Args:
+        success: Код завершения inspect был нулевым
+        stderr: Вывод stderr команды
+        
+    Returns:
+        Tuple[bool, bool, str]: (success, exists, error_message)
+    """
+    if success:
+        return True, True, ""
+    
+    # Анализируем ошибки для определения существования образа
+    stderr_lower = stderr.lower()
+    if "manifest unknown" in stderr_lower:
+        return True, False, ""
+    elif "error reading manifest" in stderr_lower:
+        return True, False, ""
+    elif "repository not found" in stderr_lower:
+        return True, False, ""
+    elif "unauthorized" in stderr_lower:
+        return False, False, f"Unauthorized access: {stderr}"
+    elif "forbidden" in stderr_lower:
+        return False, False, f"Access forbidden: {stderr}"
+    else:
+        # Если stderr пустой, но success=False, считаем что образ не существует
+        if not stderr.strip():
+            return True, False, ""
+        else:
+            return False, False, f"Unexpected error: {stderr}"
+
+
 class SkopeoWrapper:
     """Основной класс-обертка для skopeo"""
     
-    def __init__(self, skopeo_path: str = "skopeo", metrics: Optional[SkopeoMetrics] = None, enable_metrics: bool = True):
+    def __init__(self,
+                 skopeo_path: str = "skopeo",
+                 metrics: Optional[SkopeoMetrics] = None,
+                 enable_metrics: bool = True,
+                 cache: Optional[ResultCache] = None):
         self.skopeo_path = skopeo_path
-        self.parser = SkopeoProgressParser()
         self.enable_metrics = enable_metrics
         self.metrics = metrics if metrics is not None else (get_metrics() if enable_metrics else None)
+        # Кэш результатов inspect/manifest-digest; без собственных метрик
+        # пишет попадания и промахи в метрики обертки
+        self.cache = cache
+        if cache is not None and cache.metrics is None:
+            cache.metrics = self.metrics
     
     def _run_command(self, 
                     command: List[str], 
                     progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
                     timeout: Optional[int] = None) -> Tuple[bool, str, str]:
         """Выполняет команду skopeo с мониторингом прогресса"""
+        return self._execute(command, progress_callback, timeout).as_tuple()
+    
+    def _execute(self,
+                 command: List[str],
+                 progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+                 timeout: Optional[int] = None,
+                 use_pty: bool = False,
+                 parser: Optional[SkopeoProgressParser] = None,
+                 merge_output: bool = False) -> CommandResult:
+        """
+        Выполняет команду skopeo и возвращает результат вместе с парсером
+        
+        При use_pty=True stdout skopeo подключается к псевдотерминалу: только
+        в этом случае skopeo рисует индикаторы прогресса с количеством
+        скопированных байт. Там, где псевдотерминалы недоступны (Windows),
+        команда выполняется как обычно.
+        
+        merge_output=True направляет stdout и stderr в один канал, чтобы
+        парсер получал строки в порядке их вывода (skopeo sync пишет журнал
+        в stderr, а прогресс копирования - в stdout). Весь вывод тогда
+        возвращается в stderr результата.
+        """
+        
+        # Парсер создается на каждый вызов и не хранится в экземпляре,
+        # поэтому одну обертку можно использовать из многих потоков
+        if parser is None:
+            parser = SkopeoProgressParser()
         
-        # Сбрасываем состояние парсера
-        self.parser = SkopeoProgressParser()
+        handle_line = _line_handler(parser, progress_callback)
+        
+        terminal = _open_pty() if use_pty and not merge_output else None
+        process = None
         
         try:
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            def monitor_stderr():
-                """Мониторинг stderr для парсинга прогресса"""
-                for line in iter(process.stderr.readline, ''):
-                    if line.strip():
-                        progress_info = self.parser.parse_line(line)
-                        if progress_info and progress_callback:
-                            # Добавляем ссылку на парсер для доступа к blob'ам
-                            progress_info.parser = self.parser
-                            progress_callback(progress_info)
-            
-            # Запускаем мониторинг в отдельном потоке
-            stderr_thread = threading.Thread(target=monitor_stderr)
-            stderr_thread.daemon = True
-            stderr_thread.start()
-            
-            # Ждем завершения процесса
-            stdout, stderr = process.communicate(timeout=timeout)
+            try:
+                process = subprocess.Popen(
+                    command,
+                    stdout=terminal[1] if terminal else subprocess.PIPE,
+                    stderr=subprocess.STDOUT if merge_output else subprocess.PIPE
+                )
+            finally:
+                if terminal:
+                    # Slave остается открытым только в дочернем процессе,
+                    # иначе чтение master не получит EIO после его завершения
+                    os.close(terminal[1])
             
-            # Завершаем мониторинг
-            stderr_thread.join(timeout=1)
-            
-            # Отмечаем операцию как завершенную
-            if process.returncode == 0:
-                self.parser.progress.completed = True
-                self.parser.progress.current_step = "completed"
+            # Каждый канал читается одним читателем, который и передает
+            # строки парсеру, и накапливает возвращаемый вывод
+            if merge_output:
+                stdout_output = _OutputBuffer()
+                stderr_output = _OutputBuffer(handle_line)
+                outputs = {process.stdout.fileno(): stderr_output}
             else:
-                self.parser.progress.error = f"Process exited with code {process.returncode}"
-            
-            if progress_callback:
-                # Добавляем ссылку на парсер для финального callback
-                self.parser.progress.parser = self.parser
-                progress_callback(self.parser.progress)
-            
-            return process.returncode == 0, stdout, stderr
+                stdout_output = _OutputBuffer(handle_line, terminal=True) if terminal else _OutputBuffer()
+                stderr_output = _OutputBuffer(handle_line)
+                outputs = {
+                    terminal[0] if terminal else process.stdout.fileno(): stdout_output,
+                    process.stderr.fileno(): stderr_output,
+                }
+            _communicate(process, outputs, timeout)
+            return _complete_command(process.returncode, stdout_output.getvalue(), stderr_output.getvalue(),
+                                     parser, progress_callback)
             
         except subprocess.TimeoutExpired:
             process.kill()
-            return False, "", "Operation timed out"
+            process.wait()
+            return CommandResult(False, "", "Operation timed out", parser)
         except Exception as e:
-            return False, "", str(e)
+            # Например, исключение progress_callback: skopeo не должен
+            # продолжать работу после того, как операция считается неудачной
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
+            return CommandResult(False, "", str(e), parser)
+        finally:
+            if process is not None:
+                for pipe in (process.stdout, process.stderr):
+                    if pipe is not None:
+                        pipe.close()
+            if terminal:
+                os.close(terminal[0])
+            _flush_progress_callback(progress_callback)
     
     def copy(self, 
              source: str, 
              destination: str,
              progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
-             timeout: Optional[int] = None) -> Tuple[bool, str, str]:
-        """Копирует образ из source в destination"""
+             timeout: Optional[int] = None,
+             use_pty: bool = False,
+             preflight: bool = False,
+             skip_if_present: bool = False) -> CopyResult:
+        """
+        Копирует образ из source в destination
         
+        use_pty=True запускает skopeo в псевдотерминале, чтобы получать
+        побайтовый прогресс: ProgressInfo.bytes_copied, total_bytes,
+        bytes_per_second и eta_seconds, а также BlobInfo.bytes_copied.
+        
+        preflight=True перед копированием загружает манифест источника
+        (`skopeo inspect --raw`), и процент выполнения считается по размерам
+        слоев. Это требует use_pty=True: без псевдотерминала skopeo не
+        сообщает о скопированных байтах, и известен только total_bytes.
+        Для списков манифестов остается оценка по этапам.
+        
+        skip_if_present=True параллельно получает digest'ы манифестов
+        источника и назначения и, если они совпадают, не запускает
+        `skopeo copy`: результат успешен, CopyResult.skipped равен True,
+        в метриках учитывается skopeo_operations_total{status="skipped"}.
+        Если источник - список манифестов (multi-arch), с назначением
+        сравнивается и digest образа текущей платформы, который копирует
+        `skopeo copy` (дополнительный `skopeo inspect --raw` источника).
+        """
+        result = self._copy(source, destination, progress_callback, timeout, use_pty, preflight, skip_if_present)
+        return CopyResult(result.success, result.stdout, result.stderr, result.skipped)
+    
+    def _resolve_digests(self,
+                         source: str,
+                         destination: str,
+                         timeout: Optional[int]) -> Tuple[Tuple[bool, str, str], Tuple[bool, str, str]]:
+        """Параллельно получает digest'ы манифестов источника и назначения"""
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            destination_future = executor.submit(self.get_manifest_digest, destination, None, timeout)
+            source_result = self.get_manifest_digest(source, timeout=timeout)
+            return source_result, destination_future.result()
+    
+    def _skipped_copy(self, progress_callback: Optional[Callable[[ProgressInfo], None]]) -> CommandResult:
+        """Результат copy, пропущенного из-за совпадения digest'ов"""
+        parser = SkopeoProgressParser()
+        parser.progress.operation = "copy"
+        parser.progress.current_step = "skipped"
+        parser.progress.completed = True
+        if progress_callback:
+            parser.progress.parser = parser
+            progress_callback(parser.progress)
+            _flush_progress_callback(progress_callback)
         if self.enable_metrics and self.metrics:
-            with OperationTracker("copy", self.metrics, source, destination) as tracker:
-                command = [self.skopeo_path, "copy", source, destination]
-                success, stdout, stderr = self._run_command(command, progress_callback, timeout)
-                
-                # Обновляем статистику blob'ов из парсера
-                if hasattr(self.parser, 'blobs'):
-                    for blob in self.parser.blobs.values():
+            self.metrics.record_operation_skipped("copy")
+        return CommandResult(True, "", "", parser, skipped=True)
+    
+    def _platform_digest(self, image: str, timeout: Optional[int]) -> Optional[str]:
+        """Digest образа текущей платформы, если image - список манифестов"""
+        command = [self.skopeo_path, "inspect", "--raw", image]
+        success, stdout, _ = self._run_cached("inspect_raw", image, command, None, timeout)
+        return platform_manifest_digest(stdout) if success else None
+    
+    def _preflight(self, source: str, timeout: Optional[int], use_pty: bool) -> SkopeoProgressParser:
+        """Создает парсер с размерами blob'ов из манифеста источника"""
+        parser = SkopeoProgressParser()
+        command = [self.skopeo_path, "inspect", "--raw", source]
+        success, stdout, _ = self._run_cached("inspect_raw", source, command, None, timeout)
+        blobs = manifest_blobs(stdout) if success else None
+        if blobs is not None:
+            parser.expect_blobs(blobs, byte_progress=use_pty and pty is not None)
+        return parser
+    
+    def _copy(self,
+              source: str,
+              destination: str,
+              progress_callback: Optional[Callable[[ProgressInfo], None]],
+              timeout: Optional[int],
+              use_pty: bool = False,
+              preflight: bool = False,
+              skip_if_present: bool = False,
+              all_platforms: bool = False) -> CommandResult:
+        """
+        Копирует образ и возвращает результат вместе с парсером
+        
+        all_platforms=True копирует список манифестов целиком (`--all`).
+        """
+        
+        if skip_if_present:
+            (source_ok, source_digest, _), (dest_ok, dest_digest, _) = self._resolve_digests(
+                source, destination, timeout
+            )
+            if source_ok and dest_ok:
+                dest_digest = dest_digest.strip()
+                # Из списка манифестов (multi-arch) копируется только образ
+                # текущей платформы, и назначение хранит его digest
+                if dest_digest == source_digest.strip() or dest_digest == self._platform_digest(source, timeout):
+                    return self._skipped_copy(progress_callback)
+        
+        parser = self._preflight(source, timeout, use_pty) if preflight else None
+        command = [self.skopeo_path, "copy", *(["--all"] if all_platforms else []), source, destination]
+        try:
+            if self.enable_metrics and self.metrics:
+                with OperationTracker("copy", self.metrics, source, destination) as tracker:
+                    result = self._execute(command, progress_callback, timeout, use_pty, parser)
+                    
+                    # Обновляем статистику blob'ов из парсера этого вызова
+                    for blob in result.parser.blobs.values():
                         tracker.add_blob(blob.size)
-                
-                return success, stdout, stderr
-        else:
-            command = [self.skopeo_path, "copy", source, destination]
-            return self._run_command(command, progress_callback, timeout)
+                    
+                    return result
+            else:
+                return self._execute(command, progress_callback, timeout, use_pty, parser)
+        finally:
+            # Даже неудачное копирование могло изменить назначение
+            self._invalidate_cached(destination)
+    
+    def _invalidate_cached(self, image: str) -> None:
+        """Удаляет из кэша результаты для образа, измененного copy или delete"""
+        if self.cache is not None:
+            self.cache.invalidate(image)
+    
+    def copy_many(self,
+                  pairs: Iterable[Tuple[str, str]],
+                  max_workers: int = 4,
+                  progress_callback: Optional[Callable[[int, ProgressInfo], None]] = None,
+                  timeout: Optional[int] = None,
+                  preflight: bool = False,
+                  skip_if_present: bool = False) -> Iterator[CopyJobResult]:
+        """
+        Копирует множество образов параллельно
+        
+        Args:
+            pairs: Пары (source, destination)
+            max_workers: Максимальное количество одновременных процессов skopeo
+            progress_callback: Callback прогресса, получает индекс задачи и ProgressInfo
+            timeout: Таймаут каждой операции в секундах
+            preflight: Загружать манифест источника для прогресса по размерам слоев
+            skip_if_present: Не копировать образы, уже имеющиеся в назначении
+            
+        Yields:
+            CopyJobResult по мере завершения задач (не в порядке передачи)
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pairs))))
+        futures = [
+            executor.submit(self._copy_job, index, source, destination, progress_callback, timeout,
+                            preflight, skip_if_present)
+            for index, (source, destination) in enumerate(pairs)
+        ]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Если итерацию прервали, не запускаем оставшиеся задачи
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+    
+    def _copy_job(self,
+                  index: int,
+                  source: str,
+                  destination: str,
+                  progress_callback: Optional[Callable[[int, ProgressInfo], None]],
+                  timeout: Optional[int],
+                  preflight: bool = False,
+                  skip_if_present: bool = False) -> CopyJobResult:
+        """Выполняет одну задачу copy_many"""
+        job_callback = None
+        if progress_callback:
+            def job_callback(progress: ProgressInfo):
+                progress_callback(index, progress)
+        
+        started = time.monotonic()
+        result = self._copy(source, destination, job_callback, timeout,
+                            preflight=preflight, skip_if_present=skip_if_present)
+        return CopyJobResult(
+            index=index,
+            source=source,
+            destination=destination,
+            success=result.success,
+            stdout=result.stdout,
+            stderr=result.stderr,
+            progress=result.progress,
+            duration=time.monotonic() - started,
+            skipped=result.skipped
+        )
+    
+    def copy_batch(self,
+                   pairs: Iterable[Tuple[str, str]],
+                   progress_callback: Optional[Callable[[int, ProgressInfo], None]] = None,
+                   timeout: Optional[int] = None) -> List[CopyJobResult]:
+        """
+        Копирует множество образов одним процессом `skopeo sync` на префикс
+        
+        Пары docker://registry/path:tag -> docker://ПРЕФИКС/path:tag с общим
+        префиксом назначения записываются во временный файл источников
+        (`skopeo sync --src yaml`) и копируются одним процессом: авторизация
+        в реестрах и запуск skopeo выполняются один раз на группу, а не на
+        образ. Строки копирования относятся к образам по журналу sync
+        (SyncProgressParser). Остальные пары (другие транспорты, ссылки по
+        digest, переименование при копировании) и группы из одного образа
+        копируются `skopeo copy`.
+        
+            pairs = [(f"docker://quay.io/team/{name}:1.0", f"docker://mirror.local/team/{name}:1.0")
+                     for name in names]
+            results = skopeo.copy_batch(pairs)
+        
+        Args:
+            pairs: Пары (source, destination)
+            progress_callback: Callback прогресса, получает индекс пары и ProgressInfo образа
+            timeout: Таймаут каждого процесса skopeo в секундах
+            
+        Returns:
+            CopyJobResult в порядке передачи пар. duration образов группы -
+            время всего процесса sync.
+        """
+        pairs = list(pairs)
+        results: Dict[int, CopyJobResult] = {}
+        groups: Dict[str, List[Tuple[int, str, str]]] = {}
+        for index, (source, destination) in enumerate(pairs):
+            prefix = _sync_destination_prefix(source, destination)
+            if prefix is None:
+                results[index] = self._copy_job(index, source, destination, progress_callback, timeout)
+            else:
+                groups.setdefault(prefix, []).append((index, source, destination))
+        
+        for prefix, group in groups.items():
+            if len(group) == 1:
+                index, source, destination = group[0]
+                results[index] = self._copy_job(index, source, destination, progress_callback, timeout)
+                continue
+            for result in self._sync_batch(prefix, group, progress_callback, timeout):
+                results[result.index] = result
+        return [results[index] for index in range(len(pairs))]
+    
+    def _sync_batch(self,
+                    prefix: str,
+                    group: List[Tuple[int, str, str]],
+                    progress_callback: Optional[Callable[[int, ProgressInfo], None]],
+                    timeout: Optional[int]) -> List[CopyJobResult]:
+        """Копирует группу образов с общим префиксом назначения одним skopeo sync"""
+        images: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+        for _, source, _ in group:
+            registry, _, path = source[len("docker://"):].partition("/")
+            repository, _, tag = path.rpartition(":")
+            images.setdefault(registry, {"images": {}})["images"].setdefault(repository, []).append(tag)
+        
+        # JSON является подмножеством YAML, поэтому PyYAML не требуется
+        with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False, encoding="utf-8") as source_file:
+            json.dump(images, source_file)
+        
+        parser = SyncProgressParser()
+        index_by_destination = {destination: index for index, _, destination in group}
+        
+        job_callback = None
+        if progress_callback:
+            def job_callback(progress: ProgressInfo):
+                # Итоговые события образов передаются после завершения процесса
+                if progress is parser.progress:
+                    return
+                index = index_by_destination.get(parser.current_destination)
+                if index is not None:
+                    progress.parser = parser.images[parser.current_destination]
+                    progress_callback(index, progress)
+        
+        command = [self.skopeo_path, "sync", "--src", "yaml", "--dest", "docker", "--keep-going",
+                   source_file.name, prefix]
+        started = time.monotonic()
+        try:
+            if self.enable_metrics and self.metrics:
+                with OperationTracker("copy_batch", self.metrics, destination=f"docker://{prefix}") as tracker:
+                    result = self._execute(command, job_callback, timeout, parser=parser, merge_output=True)
+                    for blob in parser.blobs.values():
+                        tracker.add_blob(blob.size)
+            else:
+                result = self._execute(command, job_callback, timeout, parser=parser, merge_output=True)
+        finally:
+            os.unlink(source_file.name)
+            for _, _, destination in group:
+                self._invalidate_cached(destination)
+        duration = time.monotonic() - started
+        
+        results = []
+        for index, source, destination in group:
+            image = parser.images.get(destination)
+            if image is None:
+                image = SkopeoProgressParser()
+                image.progress.operation = "copy"
+            success = parser.image_succeeded(destination, result.success)
+            if success:
+                stderr = ""
+                image.progress.completed = True
+                image.progress.current_step = "completed"
+            else:
+                stderr = parser.errors.get(destination) or (
+                    result.stderr if not result.success else "Image was not copied by skopeo sync"
+                )
+                image.progress.error = image.progress.error or stderr
+            if progress_callback:
+                image.progress.parser = image
+                progress_callback(index, image.progress)
+            results.append(CopyJobResult(
+                index=index,
+                source=source,
+                destination=destination,
+                success=success,
+                stdout="",
+                stderr=stderr,
+                progress=image.progress,
+                duration=duration
+            ))
+        return results
+    
+    def stream(self,
+               args: List[str],
+               timeout: Optional[int] = None,
+               chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Выполняет команду skopeo и возвращает итератор по фрагментам stdout
+        
+        Вывод не накапливается в памяти: фрагменты отдаются по мере чтения
+        из канала. Если итерацию прервать, процесс skopeo завершается.
+        
+            for chunk in skopeo.stream(["inspect", "--raw", image]):
+                output.write(chunk)
+        
+        Args:
+            args: Аргументы skopeo без имени программы
+            timeout: Таймаут всей команды в секундах
+            chunk_size: Максимальный размер фрагмента в байтах
+            
+        Raises:
+            SkopeoCommandError: skopeo завершился с ошибкой или по таймауту
+        """
+        command = [self.skopeo_path] + list(args)
+        chunks = self._stream(command, timeout, chunk_size)
+        if self.enable_metrics and self.metrics:
+            operation = args[0].replace("-", "_") if args else ""
+            return self._tracked_stream(operation, chunks)
+        return chunks
+    
+    def stream_json_array(self,
+                          args: List[str],
+                          key: Optional[str] = None,
+                          timeout: Optional[int] = None) -> Iterator[Any]:
+        """
+        Выполняет команду skopeo и возвращает элементы JSON-массива из stdout
+        по мере их поступления (см. streaming.iter_json_array)
+        
+            for manifest in skopeo.stream_json_array(["inspect", "--raw", image], key="manifests"):
+                ...
+        
+        Raises:
+            SkopeoCommandError: skopeo завершился с ошибкой или по таймауту
+            ValueError: Вывод не содержит ожидаемого массива
+        """
+        return iter_json_array(self.stream(args, timeout), key)
+    
+    def list_tags(self, repository: str, timeout: Optional[int] = None) -> Iterator[str]:
+        """
+        Возвращает теги репозитория по мере чтения вывода `skopeo list-tags`
+        
+        Массив Tags разбирается инкрементально, поэтому обработку можно
+        начинать до получения всего списка, а память не зависит от числа
+        тегов. Постраничную загрузку списка из реестра (заголовки Link)
+        выполняет сам skopeo.
+        
+            for tag in skopeo.list_tags("docker://registry.example.com/app"):
+                ...
+        
+        Args:
+            repository: Репозиторий с транспортом, например docker://quay.io/app
+            timeout: Таймаут команды в секундах
+            
+        Raises:
+            SkopeoCommandError: skopeo завершился с ошибкой или по таймауту
+        """
+        return self.stream_json_array(["list-tags", repository], key="Tags", timeout=timeout)
+    
+    def sync(self,
+             source_repo: str,
+             dest_repo: str,
+             tag_filter: Union[str, Callable[[str], bool], None] = None,
+             max_workers: int = 8,
+             copy_workers: int = 4,
+             timeout: Optional[int] = None) -> SyncResult:
+        """
+        Синхронизирует теги репозитория source_repo в dest_repo
+        
+        Для каждого тега параллельно сравниваются digest'ы манифестов
+        источника и назначения (get_manifest_digest, `skopeo inspect`); копируются только
+        теги, которых нет в назначении или digest которых отличается.
+        Теги копируются со всеми платформами (`skopeo copy --all`), поэтому
+        digest списка манифестов в назначении совпадает с источником.
+        
+            result = skopeo.sync("docker://quay.io/app", "docker://mirror.local/app",
+                                 tag_filter=r"v[0-9]+([.][0-9]+)*")
+        
+        Args:
+            source_repo: Репозиторий-источник с транспортом
+            dest_repo: Репозиторий-назначение с транспортом
+            tag_filter: Регулярное выражение (должно совпасть с тегом целиком)
+                или функция отбора тегов; None - все теги
+            max_workers: Количество тегов, обрабатываемых одновременно
+            copy_workers: Максимальное количество одновременных копирований
+            timeout: Таймаут каждой команды skopeo в секундах
+            
+        Returns:
+            SyncResult со списками скопированных и пропущенных тегов и
+            ошибками по тегам
+            
+        Raises:
+            SkopeoCommandError: Не удалось получить список тегов источника
+        """
+        if isinstance(tag_filter, str):
+            tag_filter = re.compile(tag_filter).fullmatch
+        
+        result = SyncResult()
+        copy_slots = threading.Semaphore(max(1, copy_workers))
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            # Теги отправляются в работу по мере чтения вывода list-tags
+            futures = {
+                executor.submit(self._sync_tag, source_repo, dest_repo, tag, copy_slots, timeout): tag
+                for tag in self.list_tags(source_repo, timeout=timeout)
+                if tag_filter is None or tag_filter(tag)
+            }
+            for future in as_completed(futures):
+                tag = futures[future]
+                status, error = future.result()
+                if status == "copied":
+                    result.copied.append(tag)
+                elif status == "skipped":
+                    result.skipped.append(tag)
+                else:
+                    result.failed[tag] = error
+                if self.enable_metrics and self.metrics:
+                    self.metrics.record_sync_tag(status)
+        
+        result.copied.sort()
+        result.skipped.sort()
+        return result
+    
+    def _sync_tag(self,
+                  source_repo: str,
+                  dest_repo: str,
+                  tag: str,
+                  copy_slots: threading.Semaphore,
+                  timeout: Optional[int]) -> Tuple[str, str]:
+        """Синхронизирует один тег; возвращает (copied | skipped | failed, ошибка)"""
+        source = f"{source_repo}:{tag}"
+        destination = f"{dest_repo}:{tag}"
+        
+        (success, source_digest, stderr), (dest_ok, dest_digest, _) = self._resolve_digests(
+            source, destination, timeout
+        )
+        if not success:
+            return "failed", stderr.strip()
+        
+        # Ошибка для назначения означает отсутствие тега: ошибки доступа
+        # проявятся при копировании
+        if dest_ok and dest_digest.strip() == source_digest.strip():
+            return "skipped", ""
+        
+        # Список манифестов копируется целиком: иначе в назначении окажется
+        # образ одной платформы, и его digest никогда не совпадет с источником
+        with copy_slots:
+            result = self._copy(source, destination, None, timeout, all_platforms=True)
+        return ("copied", "") if result.success else ("failed", result.stderr.strip())
+    
+    def _tracked_stream(self, operation: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """Учитывает потоковую команду в метриках на все время итерации"""
+        with OperationTracker(operation, self.metrics):
+            try:
+                yield from chunks
+            except GeneratorExit:
+                # Остановка итерации потребителем не является ошибкой операции
+                chunks.close()
+    
+    def _stream(self, command: List[str], timeout: Optional[int], chunk_size: int) -> Iterator[bytes]:
+        """Запускает процесс и отдает stdout фрагментами"""
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        
+        # stderr читается отдельно, чтобы переполнение его канала не остановило skopeo
+        stderr_chunks: List[bytes] = []
+        stderr_thread = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()))
+        stderr_thread.daemon = True
+        stderr_thread.start()
+        
+        timed_out = threading.Event()
+        
+        def kill_on_timeout():
+            timed_out.set()
+            process.kill()
+        
+        timer = threading.Timer(timeout, kill_on_timeout) if timeout else None
+        if timer:
+            timer.daemon = True
+            timer.start()
+        
+        try:
+            while True:
+                chunk = process.stdout.read1(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+            
+            process.wait()
+            stderr_thread.join()
+            if timed_out.is_set():
+                raise SkopeoCommandError(command, None, "Operation timed out")
+            if process.returncode != 0:
+                stderr = b"".join(stderr_chunks).decode("utf-8", errors="replace")
+                raise SkopeoCommandError(command, process.returncode, stderr)
+        finally:
+            if timer:
+                timer.cancel()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            stderr_thread.join()
+            process.stdout.close()
+            process.stderr.close()
     
     def inspect(self, 
                 image: str,
                 progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
                 timeout: Optional[int] = None) -> Tuple[bool, str, str]:
         """Получает информацию об образе"""
+        command = [self.skopeo_path, "inspect", image]
+        return self._run_cached("inspect", image, command, progress_callback, timeout)
+    
+    def _run_cached(self,
+                    operation: str,
+                    image: str,
+                    command: List[str],
+                    progress_callback: Optional[Callable[[ProgressInfo], None]],
+                    timeout: Optional[int]) -> Tuple[bool, str, str]:
+        """Выполняет операцию чтения с использованием кэша результатов"""
+        if self.cache is not None:
+            cached = self.cache.get(operation, image)
+            if cached is not None:
+                return True, cached, ""
         
         if self.enable_metrics and self.metrics:
-            with OperationTracker("inspect", self.metrics, source=image):
-                command = [self.skopeo_path, "inspect", image]
-                return self._run_command(command, progress_callback, timeout)
+            with OperationTracker(operation, self.metrics, source=image):
+                success, stdout, stderr = self._run_command(command, progress_callback, timeout)
         else:
-            command = [self.skopeo_path, "inspect", image]
-            return self._run_command(command, progress_callback, timeout)
+            success, stdout, stderr = self._run_command(command, progress_callback, timeout)
+        
+        if success and self.cache is not None:
+            self.cache.set(operation, image, stdout)
+        return success, stdout, stderr
+    
+    def get_inspect_result(self,
+                           image: str,
+                           progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+                           timeout: Optional[int] = None) -> Tuple[bool, Optional[InspectResult], str]:
+        """
+        Получает разобранную информацию об образе
+        
+        Returns:
+            Tuple[bool, Optional[InspectResult], str]: (success, result, error_message)
+        """
+        success, stdout, stderr = self.inspect(image, progress_callback, timeout)
+        if not success:
+            return False, None, stderr
+        try:
+            return True, InspectResult.from_json(stdout), ""
+        except ValueError as e:
+            return False, None, f"Invalid inspect output: {e}"
     
     def delete(self, 
                image: str,
@@ -290,32 +1495,35 @@ class SkopeoWrapper:
                timeout: Optional[int] = None) -> Tuple[bool, str, str]:
         """Удаляет образ"""
         
-        if self.enable_metrics and self.metrics:
-            with OperationTracker("delete", self.metrics, source=image):
+        try:
+            if self.enable_metrics and self.metrics:
+                with OperationTracker("delete", self.metrics, source=image):
+                    command = [self.skopeo_path, "delete", image]
+                    return self._run_command(command, progress_callback, timeout)
+            else:
                 command = [self.skopeo_path, "delete", image]
                 return self._run_command(command, progress_callback, timeout)
-        else:
-            command = [self.skopeo_path, "delete", image]
-            return self._run_command(command, progress_callback, timeout)
+        finally:
+            self._invalidate_cached(image)
     
     def get_manifest_digest(self, 
                            image: str,
                            progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
                            timeout: Optional[int] = None) -> Tuple[bool, str, str]:
-        """Получает digest манифеста образа"""
+        """
+        Получает digest манифеста образа
         
-        if self.enable_metrics and self.metrics:
-            with OperationTracker("manifest_digest", self.metrics, source=image):
-                command = [self.skopeo_path, "manifest-digest", image]
-                return self._run_command(command, progress_callback, timeout)
-        else:
-            command = [self.skopeo_path, "manifest-digest", image]
-            return self._run_command(command, progress_callback, timeout)
+        image - ссылка на образ (digest из `skopeo inspect`) или путь к
+        локальному файлу манифеста (`skopeo manifest-digest`).
+        """
+        command = [self.skopeo_path, *_manifest_digest_args(image)]
+        return self._run_cached("manifest_digest", image, command, progress_callback, timeout)
     
     def image_exists(self, 
                     image: str,
                     progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
-                    timeout: Optional[int] = None) -> Tuple[bool, bool, str]:
+                    timeout: Optional[int] = None,
+                    probe: str = "full") -> Tuple[bool, bool, str]:
         """
         Проверяет существование образа в репозитории
         
@@ -323,6 +1531,8 @@ class SkopeoWrapper:
             image: URL образа для проверки
             progress_callback: Callback для отображения прогресса
             timeout: Таймаут операции в секундах
+            probe: Способ проверки: "full" - полный `skopeo inspect`,
+                "raw" - `skopeo inspect --raw` (загружается только манифест)
             
         Returns:
             Tuple[bool, bool, str]: (success, exists, error_message)
@@ -330,56 +1540,43 @@ class SkopeoWrapper:
             - exists: True если образ существует, False если нет
             - error_message: Сообщение об ошибке или пустая строка
         """
+        command = _probe_command(self.skopeo_path, image, probe)
         
         if self.enable_metrics and self.metrics:
             with OperationTracker("image_exists", self.metrics, source=image):
-                command = [self.skopeo_path, "inspect", image]
                 success, stdout, stderr = self._run_command(command, progress_callback, timeout)
-                
-                if success:
-                    return True, True, ""
-                else:
-                    # Анализируем ошибки для определения существования образа
-                    if "manifest unknown" in stderr.lower():
-                        return True, False, ""
-                    elif "error reading manifest" in stderr.lower():
-                        return True, False, ""
-                    elif "repository not found" in stderr.lower():
-                        return True, False, ""
-                    elif "unauthorized" in stderr.lower():
-                        return False, False, f"Unauthorized access: {stderr}"
-                    elif "forbidden" in stderr.lower():
-                        return False, False, f"Access forbidden: {stderr}"
-                    else:
-                        # Если stderr пустой, но success=False, считаем что образ не существует
-                        if not stderr.strip():
-                            return True, False, ""
-                        else:
-                            return False, False, f"Unexpected error: {stderr}"
+                return _classify_image_exists(success, stderr)
         else:
-            command = [self.skopeo_path, "inspect", image]
             success, stdout, stderr = self._run_command(command, progress_callback, timeout)
+            return _classify_image_exists(success, stderr)
+    
+    def images_exist(self,
+                     images: Iterable[str],
+                     concurrency: int = 16,
+                     timeout: Optional[int] = None,
+                     probe: str = "full") -> Dict[str, Tuple[bool, bool, str]]:
+        """
+        Проверяет существование множества образов параллельно
+        
+        Повторяющиеся ссылки проверяются один раз.
+        
+        Args:
+            images: URL образов для проверки
+            concurrency: Максимальное количество одновременных процессов skopeo
+            timeout: Таймаут каждой проверки в секундах
+            probe: Способ проверки (см. image_exists)
             
-            if success:
-                return True, True, ""
-            else:
-                # Анализируем ошибки для определения существования образа
-                if "manifest unknown" in stderr.lower():
-                    return True, False, ""
-                elif "error reading manifest" in stderr.lower():
-                    return True, False, ""
-                elif "repository not found" in stderr.lower():
-                    return True, False, ""
-                elif "unauthorized" in stderr.lower():
-                    return False, False, f"Unauthorized access: {stderr}"
-                elif "forbidden" in stderr.lower():
-                    return False, False, f"Access forbidden: {stderr}"
-                else:
-                    # Если stderr пустой, но success=False, считаем что образ не существует
-                    if not stderr.strip():
-                        return True, False, ""
-                    else:
-                        return False, False, f"Unexpected error: {stderr}"
+        Returns:
+            Dict[str, Tuple[bool, bool, str]]: ссылка -> (success, exists, error_message)
+        """
+        unique_images = list(dict.fromkeys(images))
+        if not unique_images:
+            return {}
+        
+        workers = max(1, min(concurrency, len(unique_images)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda image: self.image_exists(image, timeout=timeout, probe=probe), unique_images)
+            return dict(zip(unique_images, results))
     
     def get_metrics(self) -> Optional[str]:
         """Возвращает метрики в формате Prometheus"""
@@ -429,6 +1626,12 @@ def create_progress_callback(show_progress: bool = True) -> Callable[[ProgressIn
                 if progress.current_blob.size:
                     blob_info += f" {progress.current_blob.size} bytes"
                 print(f"   {blob_info}")
+            
+            if progress.bytes_per_second:
+                transfer_info = f"{progress.bytes_copied} bytes, {progress.bytes_per_second / 1024 ** 2:.1f} MiB/s"
+                if progress.eta_seconds is not None:
+                    transfer_info += f", ETA {progress.eta_seconds:.0f}s"
+                print(f"   {transfer_info}")
     
     return progress_callback
 
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Инкрементальный разбор JSON из потока stdout skopeo
+"""
+
+import codecs
+import json
+from typing import Any, Iterable, Iterator, Optional
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+class _JSONReader:
+    """
+    Буфер над потоком фрагментов байт с разбором отдельных JSON-значений
+
+    В памяти хранится только еще не разобранный хвост потока, поэтому
+    объем памяти определяется размером одного значения, а не документа.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """Дочитывает следующий фрагмент; False - поток закончился"""
+        if self.eof:
+            return False
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                self.buffer = self.buffer[self.pos:] + text
+                self.pos = 0
+                return True
+        self.buffer = self.buffer[self.pos:] + self._decoder.decode(b"", final=True)
+        self.pos = 0
+        self.eof = True
+        return False
+
+    def peek(self) -> Optional[str]:
+        """Возвращает следующий непробельный символ (None в конце потока)"""
+        while True:
+            buffer, pos = self.buffer, self.pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                return None
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON stream, got {found!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Разбирает одно JSON-значение, дочитывая поток по мере необходимости"""
+        while True:
+            if self.peek() is None:
+                raise ValueError("Unexpected end of JSON stream")
+            try:
+                value, end = self._json.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise ValueError("Truncated JSON value in stream") from None
+                continue
+            # Число на границе фрагмента могло быть обрезано ("12" из "123",
+            # "1" из "1.5e3"): разбираем заново, когда придут следующие данные
+            if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and self._number_may_continue(end) and self._fill()):
+                continue
+            self.pos = end
+            return value
+
+    def drain(self) -> None:
+        """Дочитывает поток до конца, не разбирая оставшиеся данные"""
+        for _ in self._chunks:
+            pass
+        self.eof = True
+
+    def _number_may_continue(self, end: int) -> bool:
+        """Проверяет, что после числа до конца буфера идут только символы числа"""
+        buffer = self.buffer
+        while end < len(buffer):
+            if buffer[end] not in _NUMBER_CHARS:
+                return False
+            end += 1
+        return True
+
+
+def iter_json_array(chunks: Iterable[bytes], key: Optional[str] = None) -> Iterator[Any]:
+    """
+    Возвращает элементы JSON-массива по мере поступления данных
+
+    Args:
+        chunks: Фрагменты байт документа (например, SkopeoWrapper.stream)
+        key: Ключ массива в объекте верхнего уровня ("Tags" для list-tags,
+            "manifests" для списка манифестов). None - массивом является
+            сам документ.
+
+    После конца массива поток дочитывается до конца: ошибка источника
+    (например, код завершения skopeo в SkopeoWrapper.stream) передается
+    исключением после последнего элемента.
+
+    Raises:
+        ValueError: Документ не соответствует ожидаемой структуре
+    """
+    reader = _JSONReader(chunks)
+    if key is not None:
+        reader.expect("{")
+        while True:
+            if reader.peek() == "}":
+                raise ValueError(f"Key {key!r} not found in JSON stream")
+            name = reader.value()
+            reader.expect(":")
+            if name == key:
+                break
+            # Остальные поля объекта верхнего уровня пропускаются целиком
+            reader.value()
+            if reader.peek() == ",":
+                reader.pos += 1
+
+    reader.expect("[")
+    if reader.peek() != "]":
+        while True:
+            yield reader.value()
+            separator = reader.peek()
+            if separator == "]":
+                break
+            if separator != ",":
+                raise ValueError(f"Expected ',' or ']' in JSON array, got {separator!r}")
+            reader.pos += 1
+    reader.drain()
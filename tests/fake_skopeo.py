@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Поддельный skopeo для тестов без доступа к реестру
+
+Поведение определяется ссылкой на образ:
+- "missing" в ссылке - ошибка "manifest unknown"
+- "unauthorized" в ссылке - ошибка авторизации
+- "broken" в ссылке - неожиданная ошибка
+
+Переменные окружения:
+- FAKE_SKOPEO_DELAY - задержка перед выводом в секундах
+- FAKE_SKOPEO_BLOBS - количество blob'ов при копировании
+- FAKE_SKOPEO_LOG - файл лога stderr, воспроизводимый при копировании
+- FAKE_SKOPEO_LINE_DELAY - задержка между строками stderr при копировании
+- FAKE_SKOPEO_TAGS - количество тегов в выводе list-tags
+- FAKE_SKOPEO_BARRIER - "КАТАЛОГ:N": каждый процесс ждет, пока до барьера
+  дойдут N процессов (проверка одновременного выполнения без замеров
+  времени); если они не выполняются одновременно, команда завершается ошибкой
+- FAKE_SKOPEO_REGISTRY - JSON-файл состояния реестра {ссылка: digest}:
+  inspect возвращает digest из файла (null - образа нет),
+  copy записывает в файл digest источника для назначения
+
+sync поддерживает только --src yaml --dest docker: файл источников
+читается как JSON, журнал logrus пишется в stderr, прогресс - в stdout.
+
+Digest образа зависит только от последнего компонента ссылки ("app:v1"),
+поэтому одинаковые теги в разных репозиториях совпадают.
+
+"multiarch" в ссылке - список манифестов: inspect сообщает digest списка,
+copy без --all записывает в назначение образ текущей архитектуры.
+
+Если stdout копирования подключен к терминалу, как и настоящий skopeo,
+рисует в stdout индикаторы прогресса с количеством скопированных байт.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+
+
+def _hex(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def _registry():
+    """Состояние реестра из FAKE_SKOPEO_REGISTRY под блокировкой файла"""
+    path = os.environ.get("FAKE_SKOPEO_REGISTRY")
+    if not path:
+        yield None
+        return
+    with open(path, "a+", encoding="utf-8") as state_file:
+        fcntl.flock(state_file, fcntl.LOCK_EX)
+        state_file.seek(0)
+        content = state_file.read()
+        state = json.loads(content) if content.strip() else {}
+        yield state
+        state_file.seek(0)
+        state_file.truncate()
+        json.dump(state, state_file)
+
+
+def _digest(ref: str):
+    """Digest образа или None, если образа нет в реестре"""
+    with _registry() as state:
+        if state is not None and ref in state:
+            return state[ref]
+    return "sha256:" + _hex(ref.rsplit("/", 1)[-1])
+
+
+def _host_architecture() -> str:
+    """Архитектура в обозначениях Go, как runtime.GOARCH у skopeo"""
+    machine = platform.machine().lower()
+    return {"x86_64": "amd64", "aarch64": "arm64"}.get(machine, machine)
+
+
+def _platform_digests(ref: str):
+    """Digest'ы образов списка манифестов по архитектурам"""
+    name = ref.rsplit("/", 1)[-1]
+    architectures = dict.fromkeys(("amd64", "arm64", _host_architecture()))
+    return {architecture: "sha256:" + _hex(f"{name}-{architecture}") for architecture in architectures}
+
+
+def _manifest_unknown(ref: str) -> int:
+    sys.stderr.write(f'Error: reading manifest latest in {ref}: manifest unknown\n')
+    return 1
+
+
+def _fail_for(ref: str) -> bool:
+    """Печатает ошибку для "проблемных" ссылок и возвращает True"""
+    if "missing" in ref:
+        sys.stderr.write(f'Error: reading manifest latest in {ref}: manifest unknown\n')
+        return True
+    if "unauthorized" in ref:
+        sys.stderr.write(f"Error: reading manifest in {ref}: unauthorized: authentication required\n")
+        return True
+    if "broken" in ref:
+        sys.stderr.write(f"Error: something went wrong with {ref}\n")
+        return True
+    return False
+
+
+def _layers(ref: str):
+    count = int(os.environ.get("FAKE_SKOPEO_BLOBS", "3"))
+    return [("sha256:" + _hex(f"{ref}-layer-{i}"), 1024 * (i + 1)) for i in range(count)]
+
+
+def _copy_lines(source):
+    log_path = os.environ.get("FAKE_SKOPEO_LOG")
+    if log_path:
+        with open(log_path, encoding="utf-8") as log:
+            yield from log
+        return
+    yield "Getting image source signatures\n"
+    for digest, size in _layers(source):
+        yield f"Copying blob {digest} ({size} bytes)\n"
+    yield f"Copying config sha256:{_hex(source + '-config')}\n"
+    yield "Writing manifest to image destination\n"
+    yield "Storing signatures\n"
+
+
+def _progress_bars(source):
+    """Индикаторы прогресса в формате mpb, перерисовываемые через '\\r'"""
+    yield "Getting image source signatures\n"
+    for digest, size in _layers(source):
+        short = digest[len("sha256:"):][:12]
+        for copied in (0, size // 2, size):
+            filled = 20 * copied // size
+            bar = "=" * filled + (">" if filled < 20 else "") + "-" * max(0, 19 - filled)
+            yield (f"\r\x1b[KCopying blob {short} [{bar}] "
+                   f"{copied / 1024:.1f}KiB / {size / 1024:.1f}KiB | 1.0 KiB/s")
+        yield f"\r\x1b[KCopying blob {short} done   |\n"
+    config = _hex(source + "-config")[:12]
+    yield f"Copying config {config} done   |\n"
+    yield "Writing manifest to image destination\n"
+
+
+def cmd_copy(args):
+    source, destination = args[-2], args[-1]
+    if _fail_for(source):
+        return 1
+    digest = _digest(source)
+    if digest is None:
+        return _manifest_unknown(source)
+    if "multiarch" in source and "--all" not in args:
+        digest = _platform_digests(source)[_host_architecture()]
+    with _registry() as state:
+        if state is not None:
+            state[destination] = digest
+    if sys.stdout.isatty():
+        for chunk in _progress_bars(source):
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+        return 0
+    line_delay = float(os.environ.get("FAKE_SKOPEO_LINE_DELAY", "0"))
+    for line in _copy_lines(source):
+        sys.stderr.write(line)
+        if line_delay:
+            sys.stderr.flush()
+            time.sleep(line_delay)
+    return 0
+
+
+def _log(level: str, message: str, **fields):
+    """
+    Строка журнала logrus, как ее пишет skopeo sync без терминала
+
+    Поля после msg упорядочены по ключу; значения со спецсимволами
+    заключаются в кавычки (json.dumps совпадает с Go %q для ASCII).
+    """
+    line = f'time="2024-01-01T00:00:00Z" level={level} msg={json.dumps(message)}'
+    for key in sorted(fields):
+        line += f" {key}={json.dumps(fields[key])}"
+    sys.stderr.write(line + "\n")
+    sys.stderr.flush()
+
+
+def cmd_sync(args):
+    """sync --src yaml --dest docker [--keep-going] ФАЙЛ НАЗНАЧЕНИЕ"""
+    source_file, destination = args[-2], args[-1]
+    with open(source_file, encoding="utf-8") as config_file:
+        # Обертка записывает YAML в JSON-подмножестве
+        config = json.load(config_file)
+    refs = [
+        (f"docker://{registry}/{repository}:{tag}", f"docker://{destination}/{repository}:{tag}")
+        for registry, options in config.items()
+        for repository, tags in options["images"].items()
+        for tag in tags
+    ]
+    failed = 0
+    for number, (source, target) in enumerate(refs, 1):
+        _log("info", f"Copying image ref {number}/{len(refs)}", **{"from": source, "to": target})
+        digest = _digest(source)
+        if any(marker in source for marker in ("missing", "unauthorized", "broken")) or digest is None:
+            # logrus.WithError(err).Errorf("Error copying ref %q", ...)
+            _log("error", f'Error copying ref "{source}"',
+                 error=f"initializing source {source}: reading manifest v1 in {source}: manifest unknown")
+            failed += 1
+            if "--keep-going" not in args:
+                return 1
+            continue
+        with _registry() as state:
+            if state is not None:
+                state[target] = digest
+        for line in _copy_lines(source):
+            # Как и настоящий skopeo, прогресс копирования пишется в stdout
+            sys.stdout.write(line)
+            sys.stdout.flush()
+    _log("info", f"Synced {len(refs) - failed} images from {len(config)} sources")
+    return 1 if failed else 0
+
+
+def cmd_inspect(args):
+    ref = args[-1]
+    if _fail_for(ref):
+        return 1
+    digest = _digest(ref)
+    if digest is None:
+        return _manifest_unknown(ref)
+    if "--format" in args:
+        # Поддерживается только --format {{.Digest}}
+        sys.stdout.write(digest + "\n")
+        return 0
+    layers = _layers(ref)
+    if "--raw" in args and "multiarch" in ref:
+        manifest = {
+            "schemaVersion": 2,
+            "mediaType": "application/vnd.docker.distribution.manifest.list.v2+json",
+            "manifests": [
+                {
+                    "mediaType": "application/vnd.docker.distribution.manifest.v2+json",
+                    "size": 1024,
+                    "digest": platform_digest,
+                    "platform": {"architecture": architecture, "os": "linux"},
+                }
+                for architecture, platform_digest in _platform_digests(ref).items()
+            ],
+        }
+        sys.stdout.write(json.dumps(manifest))
+        return 0
+    if "--raw" in args:
+        manifest = {
+            "schemaVersion": 2,
+            "mediaType": "application/vnd.docker.distribution.manifest.v2+json",
+            "config": {
+                "mediaType": "application/vnd.docker.container.image.v1+json",
+                "size": 512,
+                "digest": "sha256:" + _hex(ref + "-config"),
+            },
+            "layers": [
+                {
+                    "mediaType": "application/vnd.docker.image.rootfs.diff.tar.gzip",
+                    "size": size,
+                    "digest": digest,
+                }
+                for digest, size in layers
+            ],
+        }
+        sys.stdout.write(json.dumps(manifest))
+        return 0
+    data = {
+        "Name": ref.split("://", 1)[-1].rsplit(":", 1)[0],
+        "Digest": digest,
+        "RepoTags": [] if "--no-tags" in args else ["latest"],
+        "Created": "2024-01-01T00:00:00Z",
+        "DockerVersion": "",
+        "Labels": {"maintainer": "fake"},
+        "Architecture": "amd64",
+        "Os": "linux",
+        "Layers": [digest for digest, _ in layers],
+        "LayersData": [
+            {"MIMEType": "application/vnd.oci.image.layer.v1.tar+gzip", "Digest": digest, "Size": size}
+            for digest, size in layers
+        ],
+        "Env": ["PATH=/usr/bin"],
+    }
+    sys.stdout.write(json.dumps(data, indent=4) + "\n")
+    return 0
+
+
+def cmd_manifest_digest(args):
+    """manifest-digest ФАЙЛ: как и настоящий skopeo, принимает только файл манифеста"""
+    path = args[-1]
+    try:
+        with open(path, "rb") as manifest:
+            content = manifest.read()
+    except OSError as e:
+        sys.stderr.write(f"Error: reading manifest: open {path}: {e.strerror.lower()}\n")
+        return 1
+    sys.stdout.write("sha256:" + hashlib.sha256(content).hexdigest() + "\n")
+    return 0
+
+
+def cmd_list_tags(args):
+    ref = args[-1]
+    if _fail_for(ref):
+        return 1
+    count = int(os.environ.get("FAKE_SKOPEO_TAGS", "5"))
+    repository = ref.split("://", 1)[-1]
+    tags = json.dumps([f"v{i}" for i in range(count)])
+    sys.stdout.write(f'{{\n    "Repository": {json.dumps(repository)},\n    "Tags": {tags}\n}}\n')
+    return 0
+
+
+def cmd_delete(args):
+    return 1 if _fail_for(args[-1]) else 0
+
+
+COMMANDS = {
+    "copy": cmd_copy,
+    "inspect": cmd_inspect,
+    "manifest-digest": cmd_manifest_digest,
+    "delete": cmd_delete,
+    "list-tags": cmd_list_tags,
+    "sync": cmd_sync,
+}
+
+
+def _await_barrier(spec: str) -> bool:
+    """Ждет, пока до барьера дойдут N процессов; False, если не дождался"""
+    directory, _, count = spec.rpartition(":")
+    os.makedirs(directory, exist_ok=True)
+    open(os.path.join(directory, str(os.getpid())), "w").close()
+    # Срок только защищает от зависания, когда процессы выполняются по очереди
+    deadline = time.monotonic() + 30
+    while len(os.listdir(directory)) < int(count):
+        if time.monotonic() > deadline:
+            sys.stderr.write(f"Error: barrier timeout: fewer than {count} concurrent processes\n")
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def main(argv):
+    if argv[:1] == ["--version"]:
+        sys.stdout.write("skopeo version 1.18.0 (fake)\n")
+        return 0
+    barrier = os.environ.get("FAKE_SKOPEO_BARRIER")
+    if barrier and not _await_barrier(barrier):
+        return 1
+    delay = float(os.environ.get("FAKE_SKOPEO_DELAY", "0"))
+    if delay:
+        time.sleep(delay)
+    if not argv or argv[0] not in COMMANDS:
+        sys.stderr.write(f"Error: unknown command {argv[:1]}\n")
+        return 2
+    return COMMANDS[argv[0]](argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Тесты для AsyncSkopeoWrapper
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from skopeo_wrapper import AsyncSkopeoWrapper, SkopeoMetrics
+
+FAKE_SKOPEO = os.path.join(os.path.dirname(__file__), "fake_skopeo.py")
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Поддельный skopeo требует POSIX")
+
+
+@pytest.fixture
+def async_wrapper():
+    """Фикстура для AsyncSkopeoWrapper с поддельным skopeo"""
+    return AsyncSkopeoWrapper(skopeo_path=FAKE_SKOPEO, metrics=SkopeoMetrics())
+
+
+def test_async_copy_with_progress(async_wrapper):
+    """Тест асинхронного копирования с прогрессом"""
+    steps = []
+    success, stdout, stderr = asyncio.run(async_wrapper.copy(
+        "docker://example.com/alpine:latest",
+        "dir:/tmp/alpine",
+        progress_callback=lambda progress: steps.append(progress.current_step)
+    ))
+
+    assert success
+    assert "Copying blob" in stderr
+    assert steps[0] == "getting_signatures"
+    assert steps[-1] == "completed"
+    blobs = async_wrapper.metrics.blobs_processed_total.labels(operation="copy", status="success")._value.get()
+    assert blobs == 4
+
+
+def test_async_copy_preflight(async_wrapper):
+    """preflight без псевдотерминала: размер известен, процент - по этапам"""
+    percentages = []
+    totals = set()
+
+    def callback(progress):
+        percentages.append(progress.parser.get_progress_percentage())
+        totals.add(progress.total_bytes)
+
+    success, _, stderr = asyncio.run(async_wrapper.copy(
+        "docker://example.com/alpine:latest", "dir:/tmp/alpine", progress_callback=callback, preflight=True
+    ))
+
+    assert success, stderr
+    assert totals == {6656}
+    assert percentages == sorted(percentages)
+    assert percentages[0] == 10.0 and percentages[-1] == 100.0
+
+
+def test_async_inspect(async_wrapper):
+    """Тест асинхронной инспекции образа"""
+    success, stdout, stderr = asyncio.run(async_wrapper.inspect("docker://example.com/alpine:latest"))
+
+    assert success
+    assert "Architecture" in stdout
+
+
+def test_async_image_exists(async_wrapper):
+    """Тест асинхронной проверки существования образа"""
+    assert asyncio.run(async_wrapper.image_exists("docker://example.com/alpine:latest")) == (True, True, "")
+    assert asyncio.run(async_wrapper.image_exists("docker://example.com/missing:latest")) == (True, False, "")
+
+    success, exists, error = asyncio.run(async_wrapper.image_exists("docker://example.com/unauthorized:latest"))
+    assert not success
+    assert "Unauthorized" in error
+
+
+def test_async_images_exist(async_wrapper):
+    """Тест асинхронной пакетной проверки существования образов"""
+    images = ["docker://example.com/alpine:latest"] * 3 + ["docker://example.com/missing:latest"]
+
+    results = asyncio.run(async_wrapper.images_exist(images, concurrency=2))
+
+    assert results == {
+        "docker://example.com/alpine:latest": (True, True, ""),
+        "docker://example.com/missing:latest": (True, False, ""),
+    }
+
+
+def test_async_concurrent_operations(async_wrapper, monkeypatch, tmp_path):
+    """Тест параллельного выполнения операций в одном цикле событий"""
+    # Каждый процесс ждет у барьера, пока не запустятся все пять
+    monkeypatch.setenv("FAKE_SKOPEO_BARRIER", f"{tmp_path / 'barrier'}:5")
+
+    async def run_all():
+        return await asyncio.gather(*[
+            async_wrapper.inspect(f"docker://example.com/image{i}:latest") for i in range(5)
+        ])
+
+    results = asyncio.run(run_all())
+
+    assert all(success for success, _, _ in results)
+
+
+def test_async_timeout(async_wrapper, monkeypatch):
+    """Тест таймаута асинхронной операции"""
+    monkeypatch.setenv("FAKE_SKOPEO_DELAY", "5")
+
+    success, stdout, stderr = asyncio.run(async_wrapper.inspect("docker://example.com/alpine:latest", timeout=0.2))
+
+    assert not success
+    assert stderr == "Operation timed out"
+
+
+def test_async_cancellation_kills_process(async_wrapper, monkeypatch, tmp_path):
+    """Тест отмены задачи с завершением процесса skopeo"""
+    # Барьер на два процесса не пройдет: skopeo ждет, пока его не завершат
+    barrier = tmp_path / "barrier"
+    monkeypatch.setenv("FAKE_SKOPEO_BARRIER", f"{barrier}:2")
+
+    async def run_and_cancel():
+        task = asyncio.ensure_future(async_wrapper.copy("docker://example.com/alpine:latest", "dir:/tmp/alpine"))
+        while not (barrier.exists() and os.listdir(barrier)):
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run_and_cancel())
+
+    pid = int(os.listdir(barrier)[0])
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+    assert async_wrapper.metrics.active_operations.labels(operation="copy")._value.get() == 0
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Тесты для кэша результатов skopeo-wrapper
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from skopeo_wrapper import SkopeoWrapper, SkopeoMetrics, ResultCache, MemoryResultCache, DiskResultCache
+
+FAKE_SKOPEO = os.path.join(os.path.dirname(__file__), "fake_skopeo.py")
+
+DIGEST_REF = "docker://example.com/alpine@sha256:" + "a" * 64
+
+
+@pytest.fixture
+def metrics():
+    """Фикстура для создания экземпляра метрик"""
+    return SkopeoMetrics()
+
+
+def test_incomplete_cache_subclass():
+    """Подкласс без clear нельзя создать"""
+    class IncompleteCache(ResultCache):
+        def _get(self, operation, image):
+            return None
+
+        def _set(self, operation, image, stdout, expires_at):
+            pass
+
+        def invalidate(self, image):
+            pass
+
+    with pytest.raises(TypeError):
+        IncompleteCache()
+
+
+class TestMemoryResultCache:
+    """Тесты для MemoryResultCache"""
+
+    def test_hit_and_miss(self, metrics):
+        """Тест попаданий и промахов"""
+        cache = MemoryResultCache(metrics=metrics)
+
+        assert cache.get("inspect", "docker://example.com/alpine:latest") is None
+        cache.set("inspect", "docker://example.com/alpine:latest", "{}")
+        assert cache.get("inspect", "docker://example.com/alpine:latest") == "{}"
+        assert cache.get("manifest_digest", "docker://example.com/alpine:latest") is None
+
+        assert (cache.hits, cache.misses) == (1, 2)
+        assert metrics.cache_requests_total.labels(cache="memory", result="hit")._value.get() == 1
+        assert metrics.cache_requests_total.labels(cache="memory", result="miss")._value.get() == 2
+
+    def test_lru_eviction(self, metrics):
+        """Тест вытеснения наименее используемых записей"""
+        cache = MemoryResultCache(maxsize=2, metrics=metrics)
+        cache.set("inspect", "a", "1")
+        cache.set("inspect", "b", "2")
+        cache.get("inspect", "a")
+        cache.set("inspect", "c", "3")
+
+        assert len(cache) == 2
+        assert cache.get("inspect", "b") is None
+        assert cache.get("inspect", "a") == "1"
+        assert metrics.cache_evictions_total.labels(cache="memory", reason="size")._value.get() == 1
+
+    def test_ttl_expiry(self, metrics, monkeypatch):
+        """Тест устаревания записей по тегу и бессрочных записей по digest"""
+        cache = MemoryResultCache(ttl=10, metrics=metrics)
+        cache.set("inspect", "docker://example.com/alpine:latest", "tag")
+        cache.set("inspect", DIGEST_REF, "digest")
+
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 3600)
+
+        assert cache.get("inspect", "docker://example.com/alpine:latest") is None
+        assert cache.get("inspect", DIGEST_REF) == "digest"
+        assert metrics.cache_evictions_total.labels(cache="memory", reason="expired")._value.get() == 1
+
+
+class TestDiskResultCache:
+    """Тесты для DiskResultCache"""
+
+    def test_shared_between_instances(self, tmp_path, metrics):
+        """Тест общего кэша для нескольких экземпляров (процессов)"""
+        path = str(tmp_path / "cache" / "results.sqlite3")
+        writer = DiskResultCache(path=path)
+        reader = DiskResultCache(path=path, metrics=metrics)
+
+        writer.set("inspect", "docker://example.com/alpine:latest", "{}")
+
+        assert reader.get("inspect", "docker://example.com/alpine:latest") == "{}"
+        assert metrics.cache_requests_total.labels(cache="disk", result="hit")._value.get() == 1
+
+    def test_ttl_and_size(self, tmp_path, monkeypatch):
+        """Тест устаревания и ограничения размера"""
+        cache = DiskResultCache(path=str(tmp_path / "results.sqlite3"), ttl=10, maxsize=2)
+        cache.set("inspect", DIGEST_REF, "digest")
+        cache.set("inspect", "docker://example.com/a:latest", "a")
+        cache.set("inspect", "docker://example.com/b:latest", "b")
+
+        assert cache.get("inspect", DIGEST_REF) is None
+        assert cache.evictions == 1
+
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 3600)
+        assert cache.get("inspect", "docker://example.com/b:latest") is None
+
+    def test_default_path(self, tmp_path, monkeypatch):
+        """Тест размещения кэша в каталоге XDG"""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        cache = DiskResultCache()
+
+        assert cache.path == str(tmp_path / "skopeo-wrapper" / "results.sqlite3")
+        assert os.path.exists(cache.path)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Поддельный skopeo требует POSIX")
+def test_cli_disk_cache(tmp_path):
+    """Тест дискового кэша между процессами CLI"""
+    command = [sys.executable, "-m", "skopeo_wrapper.cli", "--skopeo-path", FAKE_SKOPEO,
+               "--cache-dir", str(tmp_path), "manifest-digest", "docker://example.com/alpine:latest"]
+    # Барьер на один процесс не задерживает skopeo, но оставляет файл на каждый запуск
+    barrier = tmp_path / "barrier"
+    env = dict(os.environ, FAKE_SKOPEO_BARRIER=f"{barrier}:1")
+
+    first = subprocess.run(command, capture_output=True, text=True, env=env)
+    second = subprocess.run(command, capture_output=True, text=True, env=env)
+
+    assert first.returncode == 0
+    assert first.stdout == second.stdout
+    assert len(os.listdir(barrier)) == 1
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Поддельный skopeo требует POSIX")
+def test_wrapper_uses_cache(metrics):
+    """Тест повторного inspect из кэша без запуска skopeo"""
+    cache = MemoryResultCache()
+    wrapper = SkopeoWrapper(skopeo_path=FAKE_SKOPEO, metrics=metrics, cache=cache)
+
+    first = wrapper.inspect("docker://example.com/alpine:latest")
+    second = wrapper.inspect("docker://example.com/alpine:latest")
+    missing = wrapper.get_manifest_digest("docker://example.com/missing:latest")
+    wrapper.get_manifest_digest("docker://example.com/missing:latest")
+
+    assert first == second
+    assert not missing[0]
+    assert cache.metrics is metrics
+    assert metrics.operations_total.labels(operation="inspect", status="success")._value.get() == 1
+    # Неудачные результаты не кэшируются: skopeo запускался дважды
+    assert metrics.operations_total.labels(operation="manifest_digest", status="success")._value.get() == 2
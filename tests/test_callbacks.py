@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Тесты для ThrottledProgressCallback
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+from skopeo_wrapper import SkopeoWrapper, ProgressInfo, ThrottledProgressCallback
+
+FAKE_SKOPEO = os.path.join(os.path.dirname(__file__), "fake_skopeo.py")
+
+
+def make_progress(step: str, completed: bool = False) -> ProgressInfo:
+    return ProgressInfo(operation="copy", current_step=step, completed=completed)
+
+
+def test_throttle_latest_wins():
+    """Промежуточные события в пределах интервала заменяются последним"""
+    delivered = []
+    callback = ThrottledProgressCallback(lambda progress: delivered.append(progress.current_step), min_interval=60)
+
+    for step in ("first", "second", "third"):
+        callback(make_progress(step))
+    assert delivered == ["first"]
+
+    callback.flush()
+    assert delivered == ["first", "third"]
+    callback.flush()
+    assert delivered == ["first", "third"]
+
+
+def test_throttle_always_delivers_final():
+    """События завершения и ошибки не отбрасываются"""
+    delivered = []
+    callback = ThrottledProgressCallback(lambda progress: delivered.append(progress.current_step), min_interval=60)
+
+    callback(make_progress("first"))
+    callback(make_progress("second"))
+    callback(make_progress("completed", completed=True))
+    error = make_progress("error")
+    error.error = "boom"
+    callback(error)
+    callback.flush()
+
+    assert delivered == ["first", "completed", "error"]
+
+
+def test_throttle_snapshots_progress():
+    """Callback получает копию, которую парсер больше не изменяет"""
+    delivered = []
+    callback = ThrottledProgressCallback(delivered.append, min_interval=0)
+    progress = make_progress("copying_blob")
+
+    callback(progress)
+    progress.current_step = "writing_manifest"
+
+    assert delivered[0].current_step == "copying_blob"
+    assert delivered[0] is not progress
+
+
+def test_throttle_asynchronous_does_not_block():
+    """Медленный callback не задерживает поток, передающий события"""
+    delivered = []
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_callback(progress):
+        entered.set()
+        # False, если вызывающий поток ждал callback и не смог освободить его
+        released = release.wait(timeout=5)
+        delivered.append((progress.current_step, threading.current_thread().name, released))
+
+    with ThrottledProgressCallback(slow_callback, min_interval=60, asynchronous=True) as callback:
+        callback(make_progress("step0"))
+        assert entered.wait(timeout=5)
+        # Callback заблокирован: события должны приниматься без ожидания
+        for i in range(1, 100):
+            callback(make_progress(f"step{i}"))
+        callback(make_progress("completed", completed=True))
+        release.set()
+
+        assert callback.flush(timeout=5)
+        assert delivered == [
+            ("step0", "skopeo-progress-callback", True),
+            ("completed", "skopeo-progress-callback", True),
+        ]
+
+    with pytest.raises(RuntimeError):
+        callback(make_progress("late"))
+
+
+def test_throttle_asynchronous_latest_wins():
+    """Асинхронный режим доставляет ту же последовательность, что и синхронный"""
+    delivered = []
+    callback = ThrottledProgressCallback(lambda progress: delivered.append(progress.current_step),
+                                         min_interval=60, asynchronous=True)
+
+    for step in ("first", "second", "third"):
+        callback(make_progress(step))
+    assert callback.flush(timeout=5)
+    assert delivered == ["first", "third"]
+    callback.close()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Поддельный skopeo требует POSIX")
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_wrapper_flushes_throttled_callback(asynchronous):
+    """К возврату из copy финальное событие уже доставлено"""
+    delivered = []
+    skopeo = SkopeoWrapper(skopeo_path=FAKE_SKOPEO, enable_metrics=False)
+    callback = ThrottledProgressCallback(delivered.append, min_interval=60, asynchronous=asynchronous)
+
+    success, _, stderr = skopeo.copy("docker://example.com/alpine:latest", "dir:/tmp/alpine",
+                                     progress_callback=callback, use_pty=True)
+
+    assert success, stderr
+    assert [progress.current_step for progress in delivered] == ["getting_signatures", "completed"]
+    callback.close()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Тесты для SkopeoHelper
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+from skopeo_wrapper import SkopeoWrapper, SkopeoMetrics, SkopeoHelper
+
+FAKE_SKOPEO = os.path.join(os.path.dirname(__file__), "fake_skopeo.py")
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Поддельный skopeo требует POSIX")
+
+
+@pytest.fixture
+def counting_wrapper(monkeypatch):
+    """SkopeoWrapper с поддельным skopeo, считающий запущенные команды"""
+    wrapper = SkopeoWrapper(skopeo_path=FAKE_SKOPEO, metrics=SkopeoMetrics())
+    wrapper.commands = []
+    lock = threading.Lock()
+    run_command, stream = wrapper._run_command, wrapper._stream
+
+    def counting_run(command, *args, **kwargs):
+        with lock:
+            wrapper.commands.append(command[1])
+        return run_command(command, *args, **kwargs)
+
+    def counting_stream(command, *args, **kwargs):
+        with lock:
+            wrapper.commands.append(command[1])
+        return stream(command, *args, **kwargs)
+
+    monkeypatch.setattr(wrapper, "_run_command", counting_run)
+    monkeypatch.setattr(wrapper, "_stream", counting_stream)
+    return wrapper
+
+
+def test_helper_coalesces_inflight(counting_wrapper, monkeypatch):
+    """Одинаковые одновременные операции выполняются одним процессом"""
+    monkeypatch.setenv("FAKE_SKOPEO_DELAY", "0.2")
+    images = [f"docker://example.com/image{i % 3}:latest" for i in range(30)]
+
+    with SkopeoHelper(counting_wrapper, max_workers=8) as helper:
+        futures = [helper.inspect(image) for image in images]
+        results = [future.result() for future in futures]
+        inspects = counting_wrapper.commands.count("inspect")
+        digest = helper.get_manifest_digest("docker://example.com/image0:latest").result()
+
+    assert all(success for success, _, _ in results)
+    assert results[0] == results[3]
+    assert inspects == 3
+    assert digest[0] and digest[1].startswith("sha256:")
+
+
+def test_helper_batches_image_exists(counting_wrapper, monkeypatch):
+    """Проверки тегов одного репозитория выполняются одним list-tags"""
+    monkeypatch.setenv("FAKE_SKOPEO_TAGS", "10")
+    images = [f"docker://example.com/app:v{i}" for i in range(8)] + ["docker://example.com/app:v99"]
+    images += ["docker://example.com/other:v1", "docker://example.com/app@sha256:" + "a" * 64]
+
+    with SkopeoHelper(counting_wrapper, batch_window=0.05, tags_batch_threshold=2) as helper:
+        futures = {image: helper.image_exists(image) for image in images}
+        results = {image: future.result() for image, future in futures.items()}
+
+    assert results["docker://example.com/app:v3"] == (True, True, "")
+    assert results["docker://example.com/app:v99"] == (True, False, "")
+    assert results["docker://example.com/other:v1"] == (True, True, "")
+    assert sorted(counting_wrapper.commands) == ["inspect", "inspect", "list-tags"]
+
+
+def test_helper_tags_batching_is_opt_in(counting_wrapper):
+    """Без tags_batch_threshold и ниже порога list-tags не запускается"""
+    images = [f"docker://example.com/app:v{i}" for i in range(3)]
+
+    with SkopeoHelper(counting_wrapper, batch_window=0.05) as helper:
+        assert all(future.result()[1] for future in [helper.image_exists(image) for image in images])
+    with SkopeoHelper(counting_wrapper, batch_window=0.05, tags_batch_threshold=4) as helper:
+        assert all(future.result()[1] for future in [helper.image_exists(image) for image in images])
+
+    assert counting_wrapper.commands == ["inspect"] * 6
+
+
+def test_helper_falls_back_when_list_tags_fails(counting_wrapper):
+    """Если list-tags недоступен, образы проверяются по одному"""
+    images = ["docker://example.com/missing:v1", "docker://example.com/missing:v2"]
+
+    with SkopeoHelper(counting_wrapper, batch_window=0.05, tags_batch_threshold=2) as helper:
+        results = [future.result() for future in [helper.image_exists(image) for image in images]]
+
+    assert results == [(True, False, ""), (True, False, "")]
+    assert sorted(counting_wrapper.commands) == ["inspect", "inspect", "list-tags"]
+
+    with pytest.raises(ValueError):
+        helper.submit("delete", images[0])
+
+
+def test_helper_batches_copies(counting_wrapper, monkeypatch, tmp_path):
+    """Накопленные копирования выполняются одним copy_batch"""
+    monkeypatch.setenv("FAKE_SKOPEO_REGISTRY", str(tmp_path / "registry.json"))
+    batches = []
+    copy_batch = counting_wrapper.copy_batch
+
+    def counting_copy_batch(pairs, **kwargs):
+        batches.append(len(pairs))
+        return copy_batch(pairs, **kwargs)
+
+    monkeypatch.setattr(counting_wrapper, "copy_batch", counting_copy_batch)
+    pairs = [(f"docker://example.com/app:v{i}", f"docker://mirror.example.com/app:v{i}") for i in range(5)]
+
+    with SkopeoHelper(counting_wrapper, batch_window=0.1) as helper:
+        futures = [helper.copy(source, destination) for source, destination in pairs]
+        assert helper.copy(*pairs[0]) is futures[0]
+        results = [future.result() for future in futures]
+
+    assert batches == [5]
+    assert all(result.success for result in results)
+    assert [result.destination for result in results] == [destination for _, destination in pairs]
@@ -82,6 +82,46 @@ class TestSkopeoMetrics:
         blobs_total = metrics.blobs_processed_total.labels(operation="copy", status="success")._value._value
         assert blobs_total == 3
     
+    def test_record_operation_end_blob_sizes(self, metrics):
+        """Тест записи фактических размеров blob'ов"""
+        start_time = metrics.record_operation_start("copy")
+        metrics.record_operation_end(
+            operation="copy",
+            success=True,
+            start_time=start_time,
+            blob_count=3,
+            total_blob_size=2048 + 2 * 10 ** 6,
+            blob_sizes=[1024, 1024, 2 * 10 ** 6]
+        )
+        
+        samples = metrics.get_metrics_dict()
+        assert samples['skopeo_blob_size_bytes_count{operation=copy}'] == 3
+        assert samples['skopeo_blob_size_bytes_sum{operation=copy}'] == 2 * 10 ** 6 + 2048
+        assert samples['skopeo_blob_size_bytes_bucket{operation=copy,le=1024.0}'] == 2
+        assert samples['skopeo_blob_size_bytes_bucket{operation=copy,le=1.048576e+06}'] == 2
+        assert samples['skopeo_blob_size_bytes_bucket{operation=copy,le=1.048576e+07}'] == 3
+    
+    @pytest.mark.parametrize("fallback", [False, True])
+    def test_observe_many_matches_observe(self, fallback):
+        """Тест эквивалентности пакетной записи и поштучных observe"""
+        from skopeo_wrapper.metrics import observe_many
+        
+        values = [0, 1, 1024, 1025, 50000, 10 ** 7, 10 ** 10, 1024.5]
+        bulk, single = SkopeoMetrics(), SkopeoMetrics()
+        histogram = bulk.blob_size_bytes.labels(operation="copy")
+        # Быстрый путь должен работать с поддерживаемыми версиями prometheus_client
+        assert all(hasattr(histogram, name) for name in ('_upper_bounds', '_buckets', '_sum'))
+        if fallback:
+            # Гистограмма только с публичным API, как после изменения библиотеки
+            histogram = type("PublicHistogram", (), {"observe": staticmethod(histogram.observe)})()
+        observe_many(histogram, values)
+        for value in values:
+            single.blob_size_bytes.labels(operation="copy").observe(value)
+        
+        bulk_samples = {k: v for k, v in bulk.get_metrics_dict().items() if k.startswith('skopeo_blob_size_bytes') and '_created' not in k}
+        single_samples = {k: v for k, v in single.get_metrics_dict().items() if k.startswith('skopeo_blob_size_bytes') and '_created' not in k}
+        assert bulk_samples == single_samples
+    
     def test_record_error(self, metrics):
         """Тест записи ошибки"""
         metrics.record_error("copy", "TimeoutError")
@@ -179,6 +219,105 @@ class TestGlobalMetrics:
 
 
 
+class TestMultiprocess:
+    """Тесты режима multiprocess prometheus_client"""
+    
+    WORKER = """
+import os, sys
+from skopeo_wrapper.metrics import SkopeoMetrics
+metrics = SkopeoMetrics()
+start = metrics.record_operation_start("copy")
+if sys.argv[1] == "finish":
+    metrics.record_operation_end("copy", True, start)
+print(os.getpid())
+"""
+    
+    def run_worker(self, path, mode):
+        import os
+        import subprocess
+        import sys
+        
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(path))
+        result = subprocess.run([sys.executable, "-c", self.WORKER, mode], env=env,
+                                capture_output=True, text=True, check=True)
+        return int(result.stdout)
+    
+    def test_aggregates_worker_processes(self, tmp_path):
+        """Значения процессов суммируются, активные операции - только живых"""
+        self.run_worker(tmp_path, "finish")
+        self.run_worker(tmp_path, "finish")
+        pid = self.run_worker(tmp_path, "leave-active")
+        
+        metrics = SkopeoMetrics(multiprocess_dir=str(tmp_path))
+        values = metrics.get_metrics_dict()
+        assert values['skopeo_operations_total{operation=copy,status=success}'] == 2
+        assert values['skopeo_active_operations{operation=copy}'] == 1
+        assert 'skopeo_operations_total{operation="copy",status="success"} 2.0' in metrics.get_metrics()
+        # Информация о версии одна на все процессы, а не сумма
+        assert values['skopeo_wrapper_version_info{python_version=3.7+,version=1.0.0}'] == 1
+        
+        # Операции завершившегося процесса больше не считаются активными
+        metrics.mark_process_dead(pid)
+        assert metrics.get_metrics_dict().get('skopeo_active_operations{operation=copy}', 0) == 0
+    
+    def test_single_process_by_default(self, monkeypatch):
+        """Без PROMETHEUS_MULTIPROC_DIR метрики отдаются из собственного реестра"""
+        monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+        monkeypatch.delenv("prometheus_multiproc_dir", raising=False)
+        metrics = SkopeoMetrics()
+        assert metrics.multiprocess_dir is None
+        assert metrics.collector_registry is metrics.registry
+
+
+class TestMetricsServer:
+    """Тесты встроенного HTTP-сервера метрик"""
+    
+    def fetch(self, server, path="/metrics", headers=None):
+        import urllib.request
+        
+        request = urllib.request.Request(f"http://127.0.0.1:{server.port}{path}", headers=headers or {})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.headers, response.read()
+    
+    def test_serve_caches_exposition(self, metrics):
+        """Отрисовка переиспользуется в пределах cache_interval"""
+        metrics.record_operation_end("copy", True, time.time())
+        server = metrics.serve(port=0, addr="127.0.0.1", cache_interval=60)
+        try:
+            headers, body = self.fetch(server)
+            assert headers["Content-Type"].startswith("text/plain")
+            assert b'skopeo_operations_total{operation="copy",status="success"} 1.0' in body
+            
+            metrics.record_operation_end("copy", True, time.time())
+            assert self.fetch(server)[1] == body
+            
+            server.exposition.interval = 0
+            assert b'status="success"} 2.0' in self.fetch(server)[1]
+        finally:
+            server.close()
+    
+    def test_serve_negotiates_format_and_gzip(self, metrics):
+        """OpenMetrics по заголовку Accept, gzip по Accept-Encoding"""
+        import gzip
+        import urllib.error
+        
+        server = metrics.serve(port=0, addr="127.0.0.1")
+        try:
+            headers, body = self.fetch(server, headers={"Accept": "application/openmetrics-text; version=1.0.0"})
+            assert headers["Content-Type"].startswith("application/openmetrics-text")
+            assert body.endswith(b"# EOF\n")
+            
+            headers, body = self.fetch(server, headers={"Accept-Encoding": "gzip"})
+            assert headers["Content-Encoding"] == "gzip"
+            assert b"skopeo_active_operations" in gzip.decompress(body)
+            
+            with pytest.raises(urllib.error.HTTPError) as error:
+                self.fetch(server, path="/other")
+            assert error.value.code == 404
+        finally:
+            server.close()
+
+
 class TestIntegration:
     """Интеграционные тесты"""
     
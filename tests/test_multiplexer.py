@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Тесты для SkopeoMultiplexer
+"""
+
+import os
+import sys
+import errno
+import threading
+
+import pytest
+from skopeo_wrapper import SkopeoWrapper, SkopeoMetrics, SkopeoMultiplexer, MemoryResultCache
+
+FAKE_SKOPEO = os.path.join(os.path.dirname(__file__), "fake_skopeo.py")
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Движок требует POSIX")
+
+
+@pytest.fixture
+def wrapper():
+    return SkopeoWrapper(skopeo_path=FAKE_SKOPEO, metrics=SkopeoMetrics())
+
+
+def test_multiplexer_copy_many_single_thread(wrapper, monkeypatch, tmp_path):
+    """Множество одновременных копирований без потока на задачу"""
+    # Каждый процесс ждет, пока запустятся все 40
+    monkeypatch.setenv("FAKE_SKOPEO_BARRIER", f"{tmp_path / 'barrier'}:40")
+    pairs = [(f"docker://example.com/app{i}:v1", f"dir:/tmp/app{i}") for i in range(40)]
+    events = {}
+    threads_before = threading.active_count()
+    peak_threads = []
+
+    def on_progress(index, progress):
+        events.setdefault(index, []).append(progress.current_step)
+        peak_threads.append(threading.active_count())
+
+    with SkopeoMultiplexer(wrapper, max_processes=40) as engine:
+        results = list(engine.copy_many(pairs, progress_callback=on_progress))
+
+    assert sorted(result.index for result in results) == list(range(40))
+    # Процессы выполнялись одновременно (барьер пройден), а потоков добавился один
+    assert all(result.success and result.progress.completed for result in results), results[0].stderr
+    assert max(peak_threads) <= threads_before + 1
+    # У каждой задачи свой парсер
+    assert events[7][-1] == "completed" and events[7].count("copying_blob") == 3
+    assert len({id(result.progress.parser) for result in results}) == 40
+    assert wrapper.metrics.operations_total.labels(operation="copy", status="success")._value.get() == 40
+
+
+def test_multiplexer_operations_and_errors(wrapper, monkeypatch):
+    """Результаты совпадают с SkopeoWrapper, ошибки не влияют на другие задачи"""
+    wrapper.cache = MemoryResultCache()
+
+    with SkopeoMultiplexer(wrapper, max_processes=2) as engine:
+        inspect = engine.inspect("docker://example.com/app:v1")
+        digest = engine.get_manifest_digest("docker://example.com/app:v1")
+        missing = engine.inspect("docker://example.com/missing:v1")
+        deleted = engine.delete("docker://example.com/app:v1")
+        copied = engine.copy("docker://example.com/app:v1", "dir:/tmp/app", use_pty=True)
+
+        def failing_callback(progress):
+            raise RuntimeError("callback failed")
+
+        failed = engine.copy("docker://example.com/app:v2", "dir:/tmp/app", progress_callback=failing_callback)
+
+        assert inspect.result() == wrapper.inspect("docker://example.com/app:v1")
+        assert engine.inspect("docker://example.com/app:v1").result() == inspect.result()
+        assert digest.result()[1].startswith("sha256:")
+        assert not missing.result()[0] and "manifest unknown" in missing.result()[2]
+        assert deleted.result() == (True, "", "")
+        assert copied.result().success and "Copying blob" in copied.result().stdout
+        assert failed.result() == (False, "", "callback failed")
+
+    with pytest.raises(RuntimeError):
+        engine.inspect("docker://example.com/app:v1")
+
+
+def test_multiplexer_timeout_and_missing_binary(wrapper, monkeypatch):
+    """Таймаут завершает процесс, отсутствующий skopeo дает ошибку задачи"""
+    monkeypatch.setenv("FAKE_SKOPEO_DELAY", "5")
+
+    with SkopeoMultiplexer(wrapper) as engine:
+        assert engine.inspect("docker://example.com/app:v1", timeout=0.3).result() == (
+            False, "", "Operation timed out"
+        )
+
+    engine = SkopeoMultiplexer(SkopeoWrapper(skopeo_path="/nonexistent/skopeo", enable_metrics=False))
+    success, _, stderr = engine.inspect("docker://example.com/app:v1").result()
+    engine.close()
+    assert not success and "nonexistent" in stderr
+
+
+def test_multiplexer_spawn_failure_fails_only_that_job(wrapper, monkeypatch):
+    """Ошибка при запуске (псевдотерминал, регистрация канала) не останавливает движок"""
+    import skopeo_wrapper.multiplexer as multiplexer
+
+    def no_pty():
+        raise OSError(errno.ENOSPC, "out of pty devices")
+
+    monkeypatch.setattr(multiplexer, "_open_pty", no_pty)
+    with SkopeoMultiplexer(wrapper) as engine:
+        register = engine._selector.register
+        calls = []
+
+        def failing_register(fd, events, data=None):
+            calls.append(fd)
+            if len(calls) == 2:
+                raise OSError(errno.EMFILE, "too many open files")
+            return register(fd, events, data)
+
+        pty_copy = engine.copy("docker://example.com/app:v1", "dir:/tmp/app", use_pty=True)
+        success, _, stderr = pty_copy.result(timeout=30)
+        assert not success and "out of pty devices" in stderr
+
+        monkeypatch.setattr(engine._selector, "register", failing_register)
+        success, _, stderr = engine.inspect("docker://example.com/app:v1").result(timeout=30)
+        assert not success and "too many open files" in stderr
+
+        monkeypatch.setattr(engine._selector, "register", register)
+        assert engine.inspect("docker://example.com/app:v2").result(timeout=30)[0]
+    assert wrapper.metrics.active_operations.labels(operation="copy")._value.get() == 0
+
+
+def test_multiplexer_flushes_callbacks_off_engine_thread(wrapper):
+    """Медленный flush() callback'а не задерживает другие задачи"""
+    entered, release = threading.Event(), threading.Event()
+    flushed = []
+
+    class SlowFlushCallback:
+        def __call__(self, progress):
+            pass
+
+        def flush(self):
+            flushed.append(threading.current_thread().name)
+            entered.set()
+            release.wait(timeout=30)
+
+    with SkopeoMultiplexer(wrapper) as engine:
+        slow = engine.copy("docker://example.com/app:v1", "dir:/tmp/app", progress_callback=SlowFlushCallback())
+        assert entered.wait(timeout=30)
+        # Задача без буферизации завершается, пока flush первой еще ждет
+        assert engine.inspect("docker://example.com/app:v2").result(timeout=30)[0]
+        assert not slow.done()
+        release.set()
+        assert slow.result(timeout=30).success
+
+    assert flushed and all(name.startswith("skopeo-multiplexer-flush") for name in flushed)
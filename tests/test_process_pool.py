@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Тесты для SkopeoProcessPool
+"""
+
+import os
+import signal
+import time
+import sys
+
+import pytest
+from skopeo_wrapper import SkopeoMetrics, SkopeoProcessPool, ProgressInfo, SkopeoProgressParser, BlobInfo
+from skopeo_wrapper.process_pool import _RESULT, _RESULT_HEADER, encode_progress, decode_progress
+
+FAKE_SKOPEO = os.path.join(os.path.dirname(__file__), "fake_skopeo.py")
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Пул требует POSIX")
+
+
+def test_progress_event_roundtrip():
+    """Событие прогресса упаковывается в фиксированные 31 байт"""
+    parser = SkopeoProgressParser()
+    parser.blobs = {"a": BlobInfo(sha256="a", status="copied"), "b": BlobInfo(sha256="b", status="copying")}
+    progress = ProgressInfo(operation="copy", current_step="copying_blob", bytes_copied=1 << 40,
+                            total_bytes=None, manifest_written=True, parser=parser)
+
+    data = encode_progress(7, progress)
+    job_id, decoded = decode_progress(data, "copy")
+
+    assert len(data) == 31
+    assert job_id == 7
+    assert decoded.current_step == "copying_blob"
+    assert decoded.bytes_copied == 1 << 40 and decoded.total_bytes is None
+    assert decoded.manifest_written and not decoded.completed and decoded.error is None
+    assert (decoded.total_blobs, decoded.copied_blobs) == (2, 1)
+
+
+def test_process_pool_copy_many():
+    """Задачи распределяются по процессам, прогресс приходит в родительский"""
+    pairs = [(f"docker://example.com/app{i}:v1", f"dir:/tmp/app{i}") for i in range(12)]
+    events = {}
+
+    with SkopeoProcessPool(processes=2, skopeo_path=FAKE_SKOPEO, progress_interval=0) as pool:
+        results = list(pool.copy_many(pairs, progress_callback=lambda index, progress: events.setdefault(
+            index, []).append(progress)))
+        inspect = pool.inspect("docker://example.com/app:v1").result()
+        missing = pool.copy("docker://example.com/missing:v1", "dir:/tmp/missing").result()
+        pids = {worker.pid for worker in pool._workers}
+
+    assert sorted(result.index for result in results) == list(range(12))
+    assert all(result.success and result.progress.completed for result in results)
+    assert "Copying blob" in results[0].stderr
+    assert events[3][-1].completed and events[3][-1].total_blobs == 4
+    assert "copying_blob" in [progress.current_step for progress in events[3]]
+    assert inspect[0] and '"Digest"' in inspect[1]
+    assert not missing.success and "manifest unknown" in missing.stderr
+    assert len(pids) == 2 and os.getpid() not in pids
+
+    with pytest.raises(RuntimeError):
+        pool.inspect("docker://example.com/app:v1")
+
+
+def test_process_pool_multiprocess_metrics(tmp_path, monkeypatch):
+    """Метрики рабочих процессов собираются через PROMETHEUS_MULTIPROC_DIR"""
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    with SkopeoProcessPool(processes=2, skopeo_path=FAKE_SKOPEO) as pool:
+        for future in [pool.inspect(f"docker://example.com/app{i}:v1") for i in range(6)]:
+            assert future.result()[0]
+
+    values = SkopeoMetrics(multiprocess_dir=str(tmp_path)).get_metrics_dict()
+    assert values["skopeo_operations_total{operation=inspect,status=success}"] == 6
+    assert values.get("skopeo_active_operations{operation=inspect}", 0) == 0
+
+
+def test_process_pool_reader_survives_failed_dispatch():
+    """Исключение при разборе результата завершает только свою задачу"""
+    def broken(success, stdout, stderr, progress):
+        raise ValueError("broken transform")
+
+    with SkopeoProcessPool(processes=1, skopeo_path=FAKE_SKOPEO) as pool:
+        failed = pool._submit("inspect", ("docker://example.com/app:v1",), None, None, transform=broken)
+        with pytest.raises(ValueError, match="broken transform"):
+            failed.result(timeout=30)
+        # Результат неизвестной задачи отбрасывается
+        pool._dispatch_result(_RESULT_HEADER.pack(_RESULT, 2 ** 31) + b"not a pickle")
+        assert pool.inspect("docker://example.com/app:v1").result(timeout=30)[0]
+
+
+def test_process_pool_worker_death_fails_its_jobs(tmp_path, monkeypatch):
+    """Задачи погибшего рабочего процесса получают исключение, новые идут в живые"""
+    barrier = tmp_path / "barrier"
+    monkeypatch.setenv("FAKE_SKOPEO_BARRIER", f"{barrier}:2")
+
+    with SkopeoProcessPool(processes=2, skopeo_path=FAKE_SKOPEO) as pool:
+        lost = pool.inspect("docker://example.com/app0:v1")
+        # skopeo первой задачи запущен и ждет у барьера
+        while not (barrier.exists() and os.listdir(barrier)):
+            time.sleep(0.01)
+        victim = pool._workers[0]
+        os.kill(victim.pid, signal.SIGKILL)
+        with pytest.raises(RuntimeError, match="exited unexpectedly"):
+            lost.result(timeout=30)
+
+        results = [pool.inspect(f"docker://example.com/app{i}:v1").result(timeout=60) for i in range(1, 4)]
+
+    assert all(result[0] for result in results)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Тесты для типизированных результатов skopeo-wrapper
+"""
+
+import json
+import os
+import sys
+
+import pytest
+from skopeo_wrapper import SkopeoWrapper, SkopeoMetrics, InspectResult
+
+FAKE_SKOPEO = os.path.join(os.path.dirname(__file__), "fake_skopeo.py")
+
+INSPECT_OUTPUT = json.dumps({
+    "Name": "docker.io/library/alpine",
+    "Digest": "sha256:" + "a" * 64,
+    "RepoTags": ["3.18", "3.19", "latest"],
+    "Created": "2024-01-01T00:00:00Z",
+    "Labels": {"maintainer": "alpine"},
+    "Architecture": "amd64",
+    "Os": "linux",
+    "Layers": ["sha256:" + "b" * 64, "sha256:" + "c" * 64],
+    "LayersData": [
+        {"Digest": "sha256:" + "b" * 64, "Size": 100},
+        {"Digest": "sha256:" + "c" * 64, "Size": 200},
+    ],
+})
+
+
+def test_inspect_result_from_json():
+    """Тест разбора вывода skopeo inspect"""
+    result = InspectResult.from_json(INSPECT_OUTPUT)
+
+    assert result.name == "docker.io/library/alpine"
+    assert result.digest == "sha256:" + "a" * 64
+    assert result.architecture == "amd64"
+    assert result.os == "linux"
+    assert result.labels == {"maintainer": "alpine"}
+    assert result.layers == ["sha256:" + "b" * 64, "sha256:" + "c" * 64]
+    assert result.layer_sizes == [100, 200]
+    assert result.total_size == 300
+    assert not hasattr(result, "__dict__")
+
+
+def test_inspect_result_raw():
+    """Тест полного словаря, разбираемого при первом обращении"""
+    result = InspectResult.from_json(INSPECT_OUTPUT)
+
+    assert result._raw is None
+    assert result.raw["RepoTags"] == ["3.18", "3.19", "latest"]
+    assert result.raw is result.raw
+    assert result.raw == json.loads(INSPECT_OUTPUT)
+    assert result._text is None
+
+
+def test_inspect_result_memory():
+    """Результат без обращения к raw меньше разобранного словаря"""
+    import tracemalloc
+
+    data = json.loads(INSPECT_OUTPUT)
+    data["RepoTags"] = [f"v1.{i}" for i in range(20000)]
+    text = json.dumps(data)
+
+    def allocated(build):
+        tracemalloc.start()
+        try:
+            value = build()
+            return tracemalloc.get_traced_memory()[0], value
+        finally:
+            tracemalloc.stop()
+
+    parsed, _ = allocated(lambda: json.loads(text))
+    kept, result = allocated(lambda: InspectResult.from_json(text))
+
+    assert len(result.raw["RepoTags"]) == 20000
+    assert kept < parsed
+
+
+def test_inspect_result_without_layers_data():
+    """Тест вывода старых версий skopeo без LayersData"""
+    result = InspectResult.from_json(json.dumps({"Digest": "sha256:" + "a" * 64, "Layers": ["sha256:" + "b" * 64]}))
+
+    assert result.layer_sizes == [None]
+    assert result.total_size is None
+
+    with pytest.raises(ValueError):
+        InspectResult.from_json("[]")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Поддельный skopeo требует POSIX")
+def test_manifest_blobs():
+    """Тест извлечения размеров blob'ов из вывода inspect --raw"""
+    from skopeo_wrapper.results import manifest_blobs
+
+    manifest = {
+        "schemaVersion": 2,
+        "config": {"digest": "sha256:" + "c" * 64, "size": 512},
+        "layers": [{"digest": "sha256:" + "a" * 64, "size": 1024}],
+    }
+    assert manifest_blobs(json.dumps(manifest)) == [("sha256:" + "a" * 64, 1024), ("sha256:" + "c" * 64, 512)]
+
+    index = {"schemaVersion": 2, "manifests": [{"digest": "sha256:" + "d" * 64, "size": 700}]}
+    assert manifest_blobs(json.dumps(index)) is None
+    assert manifest_blobs("not json") is None
+
+
+def test_get_inspect_result():
+    """Тест получения разобранного результата через обертку"""
+    wrapper = SkopeoWrapper(skopeo_path=FAKE_SKOPEO, metrics=SkopeoMetrics())
+
+    success, result, error = wrapper.get_inspect_result("docker://example.com/alpine:latest")
+    assert success
+    assert result.os == "linux"
+    assert len(result.layers) == 3
+    assert result.total_size == 1024 + 2048 + 3072
+
+    success, result, error = wrapper.get_inspect_result("docker://example.com/missing:latest")
+    assert not success
+    assert result is None
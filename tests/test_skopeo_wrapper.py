@@ -5,9 +5,14 @@
 
 import pytest
 import os
+import sys
 import tempfile
 import subprocess
-from skopeo_wrapper import SkopeoWrapper, create_progress_callback, ProgressInfo
+from skopeo_wrapper import SkopeoWrapper, SkopeoMetrics, create_progress_callback, ProgressInfo
+
+FAKE_SKOPEO = os.path.join(os.path.dirname(__file__), "fake_skopeo.py")
+
+requires_posix = pytest.mark.skipif(sys.platform == "win32", reason="Поддельный skopeo требует POSIX")
 
 
 @pytest.fixture
@@ -116,6 +121,151 @@ def test_progress_info_creation():
     assert not progress.completed
 
 
+def test_parser_recorded_log():
+    """Тест разбора записанного лога skopeo с отладочным выводом"""
+    from skopeo_wrapper import SkopeoProgressParser
+    
+    log_path = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "data", "skopeo_copy_debug.log")
+    parser = SkopeoProgressParser()
+    steps = []
+    with open(log_path, encoding="utf-8") as log:
+        for line in log:
+            progress = parser.parse_line(line)
+            if progress:
+                steps.append(progress.current_step)
+    
+    assert steps[0] == "getting_signatures"
+    assert steps.count("copying_blob") == 24
+    assert steps[-2:] == ["writing_manifest", "storing_signatures"]
+    assert len(parser.blobs) == 13
+    assert sum(blob.size for blob in parser.blobs.values() if blob.size) == 360428503
+    assert parser.progress.manifest_written and parser.progress.signatures_stored
+
+
+def test_parser_error_and_unknown_lines():
+    """Тест разбора ошибок и нераспознаваемых строк"""
+    from skopeo_wrapper import SkopeoProgressParser
+    
+    parser = SkopeoProgressParser()
+    assert parser.parse_line("Copying blob 8a49fdb3b6a5") is None
+    assert parser.parse_line("Signature storage is not configured") is None
+    assert parser.parse_line("Error:") is None
+    
+    progress = parser.parse_line("Error: initializing source: manifest unknown\n")
+    assert progress.current_step == "error"
+    assert progress.error == "initializing source: manifest unknown"
+
+
+def test_parser_progress_bars():
+    """Тест разбора индикаторов прогресса с количеством байт"""
+    from skopeo_wrapper import SkopeoProgressParser
+    
+    parser = SkopeoProgressParser()
+    digest = "8a49fdb3b6a5" + "0" * 52
+    parser.parse_line(f"Copying blob sha256:{digest}")
+    
+    progress = parser.parse_line("Copying blob 8a49fdb3b6a5 [=====>------] 1.5MiB / 3.0MiB | 1.1 MiB/s")
+    assert progress.current_step == "copying_blob"
+    assert progress.current_blob is parser.blobs[digest]
+    assert progress.current_blob.bytes_copied == 1572864
+    assert progress.current_blob.size == 3145728
+    
+    parser.parse_line("Copying blob 77ea7eee3d00 [>---------] 500.0kB / 2.0MB")
+    assert parser.blobs["77ea7eee3d00"].bytes_copied == 500000
+    assert progress.bytes_copied == 1572864 + 500000
+    assert progress.total_bytes == 3145728 + 2000000
+    
+    progress = parser.parse_line("Copying blob 8a49fdb3b6a5 done   |")
+    assert parser.blobs[digest].status == "copied"
+    assert parser.blobs[digest].bytes_copied == 3145728
+    assert progress.bytes_per_second > 0
+    assert progress.eta_seconds >= 0
+
+
+@requires_posix
+def test_copy_use_pty(fake_wrapper):
+    """Тест побайтового прогресса при копировании в псевдотерминале"""
+    events = []
+    
+    def callback(progress):
+        events.append((progress.current_step, progress.bytes_copied, progress.total_bytes))
+    
+    success, stdout, stderr = fake_wrapper.copy(
+        "docker://example.com/alpine:latest", "dir:/tmp/alpine", progress_callback=callback, use_pty=True
+    )
+    
+    assert success, stderr
+    assert "\x1b" not in stdout and "\r" not in stdout
+    assert "Copying blob" in stdout
+    # Слои поддельного skopeo: 1, 2 и 3 KiB, каждый передается в два шага
+    copied = [bytes_copied for step, bytes_copied, _ in events if step == "copying_blob"]
+    assert copied == sorted(copied)
+    assert 512 in copied and copied[-1] == 6144
+    assert events[-1] == ("completed", 6144, 6144)
+
+
+@requires_posix
+def test_copy_preflight(fake_wrapper):
+    """Тест прогресса по размерам слоев из заранее загруженного манифеста"""
+    percentages = []
+    totals = set()
+    
+    def callback(progress):
+        percentages.append(progress.parser.get_progress_percentage())
+        totals.add(progress.total_bytes)
+    
+    success, _, stderr = fake_wrapper.copy(
+        "docker://example.com/alpine:latest", "dir:/tmp/alpine",
+        progress_callback=callback, use_pty=True, preflight=True
+    )
+    
+    assert success, stderr
+    # Слои 1, 2 и 3 KiB и config 512 байт известны до начала копирования
+    assert totals == {6656}
+    assert percentages == sorted(percentages)
+    assert percentages[-1] == 100.0
+    assert 100.0 * 512 / 6656 in percentages
+    assert max(percentages[:-1]) == 99.0
+
+
+def test_copy_preflight_without_pty(fake_wrapper):
+    """Без псевдотерминала процент выполнения остается оценкой по этапам"""
+    percentages = []
+    totals = set()
+    
+    def callback(progress):
+        percentages.append(progress.parser.get_progress_percentage())
+        totals.add(progress.total_bytes)
+    
+    success, _, stderr = fake_wrapper.copy(
+        "docker://example.com/alpine:latest", "dir:/tmp/alpine",
+        progress_callback=callback, preflight=True
+    )
+    
+    assert success, stderr
+    assert totals == {6656}
+    assert percentages == sorted(percentages)
+    assert percentages[0] == 10.0 and 75.0 in percentages and 90.0 in percentages
+    assert percentages[-1] == 100.0
+
+
+def test_parser_expect_blobs():
+    """Тест процента выполнения по размерам blob'ов без индикаторов прогресса"""
+    from skopeo_wrapper import SkopeoProgressParser
+    
+    parser = SkopeoProgressParser()
+    parser.expect_blobs([("sha256:" + "a" * 64, 3000), ("sha256:" + "b" * 64, 1000)])
+    
+    parser.parse_line("Getting image source signatures")
+    assert parser.get_progress_percentage() == 0.0
+    parser.parse_line("Copying blob sha256:" + "a" * 64)
+    assert parser.blobs["a" * 64].status == "copying"
+    parser.parse_line("Copying blob aaaaaaaaaaaa done")
+    assert parser.get_progress_percentage() == 75.0
+    parser.parse_line("Writing manifest to image destination")
+    assert parser.get_progress_percentage() == 99.0
+
+
 def test_create_progress_callback():
     """Тест создания callback для прогресса"""
     callback = create_progress_callback(show_progress=True)
@@ -123,5 +273,380 @@ def test_create_progress_callback():
     assert callable(callback)
 
 
+@pytest.fixture
+def fake_wrapper():
+    """Фикстура для SkopeoWrapper с поддельным skopeo"""
+    return SkopeoWrapper(skopeo_path=FAKE_SKOPEO, metrics=SkopeoMetrics())
+
+
+@requires_posix
+def test_copy_many(fake_wrapper, monkeypatch, tmp_path):
+    """Тест параллельного копирования множества образов"""
+    # Каждый процесс ждет у барьера, пока не запустятся все семь
+    monkeypatch.setenv("FAKE_SKOPEO_BARRIER", f"{tmp_path / 'barrier'}:7")
+    pairs = [(f"docker://example.com/image{i}:latest", f"dir:/tmp/image{i}") for i in range(6)]
+    pairs.append(("docker://example.com/missing:latest", "dir:/tmp/missing"))
+    progress_jobs = set()
+    
+    results = list(fake_wrapper.copy_many(
+        pairs,
+        max_workers=7,
+        progress_callback=lambda index, progress: progress_jobs.add(index)
+    ))
+    
+    assert sorted(result.index for result in results) == list(range(7))
+    by_index = {result.index: result for result in results}
+    assert all(by_index[i].success and by_index[i].progress.completed for i in range(6))
+    assert not by_index[6].success
+    assert by_index[6].progress.error
+    assert by_index[3].source == pairs[3][0]
+    assert progress_jobs == set(range(7))
+
+
+@requires_posix
+def test_copy_many_early_stop(fake_wrapper, monkeypatch):
+    """Тест прерывания итерации copy_many"""
+    monkeypatch.setenv("FAKE_SKOPEO_DELAY", "0.2")
+    pairs = [(f"docker://example.com/image{i}:latest", f"dir:/tmp/image{i}") for i in range(10)]
+    
+    results = fake_wrapper.copy_many(pairs, max_workers=2)
+    first = next(results)
+    results.close()
+    
+    assert first.success
+    copies = fake_wrapper.metrics.operations_total.labels(operation="copy", status="success")._value.get()
+    assert copies < 10
+
+
+@requires_posix
+def test_shared_wrapper_isolates_parsers(fake_wrapper):
+    """Тест изоляции состояния парсера между потоками одной обертки"""
+    from concurrent.futures import ThreadPoolExecutor
+    import hashlib
+    
+    sources = [f"docker://example.com/image{i}:latest" for i in range(16)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(
+            lambda source: (source, fake_wrapper._copy(source, "dir:/tmp/target", None, None)),
+            sources
+        ))
+    
+    for source, result in results:
+        expected = {hashlib.sha256(f"{source}-layer-{i}".encode()).hexdigest() for i in range(3)}
+        expected.add(hashlib.sha256(f"{source}-config".encode()).hexdigest())
+        assert result.success
+        assert result.progress.completed
+        assert set(result.parser.blobs) == expected
+
+
+@requires_posix
+def test_images_exist(fake_wrapper, monkeypatch, tmp_path):
+    """Тест пакетной проверки существования образов"""
+    # Каждая из шести уникальных проверок ждет у барьера остальные
+    monkeypatch.setenv("FAKE_SKOPEO_BARRIER", f"{tmp_path / 'barrier'}:6")
+    images = [f"docker://example.com/image{i % 4}:latest" for i in range(40)]
+    images += ["docker://example.com/missing:latest", "docker://example.com/unauthorized:latest"]
+    
+    results = fake_wrapper.images_exist(images, concurrency=8)
+    
+    assert len(results) == 6
+    assert results["docker://example.com/image0:latest"] == (True, True, "")
+    assert results["docker://example.com/missing:latest"] == (True, False, "")
+    assert not results["docker://example.com/unauthorized:latest"][0]
+    probes = fake_wrapper.metrics.operations_total.labels(operation="image_exists", status="success")._value.get()
+    assert probes == 6
+
+
+@requires_posix
+def test_image_exists_raw_probe(fake_wrapper, monkeypatch):
+    """Тест облегченной проверки существования через inspect --raw"""
+    commands = []
+    run_command = fake_wrapper._run_command
+    
+    def capture(command, *args, **kwargs):
+        commands.append(command)
+        return run_command(command, *args, **kwargs)
+    
+    monkeypatch.setattr(fake_wrapper, "_run_command", capture)
+    
+    assert fake_wrapper.image_exists("docker://example.com/alpine:latest", probe="raw") == (True, True, "")
+    assert fake_wrapper.image_exists("docker://example.com/missing:latest", probe="raw") == (True, False, "")
+    assert commands[0] == [FAKE_SKOPEO, "inspect", "--raw", "docker://example.com/alpine:latest"]
+    
+    with pytest.raises(ValueError):
+        fake_wrapper.image_exists("docker://example.com/alpine:latest", probe="head")
+
+
+@requires_posix
+def test_sync(fake_wrapper, monkeypatch, tmp_path):
+    """Тест синхронизации репозитория с пропуском совпадающих digest'ов"""
+    import json
+    
+    source, mirror = "docker://example.com/app", "docker://mirror.example.com/app"
+    registry = tmp_path / "registry.json"
+    registry.write_text(json.dumps({
+        f"{mirror}:v1": "sha256:" + "0" * 64,  # устаревший тег
+        f"{mirror}:v2": None,                  # тега нет в назначении
+        f"{source}:v3": None,                  # тег удален из источника после list-tags
+    }))
+    monkeypatch.setenv("FAKE_SKOPEO_REGISTRY", str(registry))
+    monkeypatch.setenv("FAKE_SKOPEO_TAGS", "6")
+    
+    result = fake_wrapper.sync(source, mirror, tag_filter=r"v[0-4]")
+    
+    assert result.copied == ["v1", "v2"]
+    assert result.skipped == ["v0", "v4"]
+    assert list(result.failed) == ["v3"] and "manifest unknown" in result.failed["v3"]
+    assert not result.success
+    synced = fake_wrapper.metrics.sync_tags_total
+    assert synced.labels(result="copied")._value.get() == 2
+    assert synced.labels(result="skipped")._value.get() == 2
+    assert synced.labels(result="failed")._value.get() == 1
+    
+    # Повторный запуск ничего не копирует
+    result = fake_wrapper.sync(source, mirror, tag_filter=lambda tag: tag != "v3")
+    assert result.copied == []
+    assert result.skipped == ["v0", "v1", "v2", "v4", "v5"]
+
+
+@requires_posix
+def test_manifest_digest_of_reference_and_file(fake_wrapper, tmp_path):
+    """Digest ссылки берется из inspect, digest файла - из manifest-digest"""
+    import hashlib
+    
+    image = "docker://example.com/app:v1"
+    success, digest, stderr = fake_wrapper.get_manifest_digest(image)
+    assert success, stderr
+    assert digest.strip() == fake_wrapper.get_inspect_result(image)[1].digest
+    
+    manifest = tmp_path / "manifest.json"
+    manifest.write_bytes(b'{"schemaVersion": 2}')
+    success, digest, stderr = fake_wrapper.get_manifest_digest(str(manifest))
+    assert success, stderr
+    assert digest.strip() == "sha256:" + hashlib.sha256(b'{"schemaVersion": 2}').hexdigest()
+
+
+@requires_posix
+def test_execute_single_reader(fake_wrapper, monkeypatch):
+    """Парсер и возвращаемый stderr получают одни и те же строки"""
+    monkeypatch.setenv("FAKE_SKOPEO_BLOBS", "500")
+    lines = []
+    
+    success, stdout, stderr = fake_wrapper.copy(
+        "docker://example.com/app:v1", "dir:/tmp/app",
+        progress_callback=lambda progress: lines.append(progress.current_step)
+    )
+    
+    assert success
+    assert stderr.count("Copying blob") == lines.count("copying_blob") == 500
+    assert stderr.endswith("Storing signatures\n")
+
+
+def test_output_buffer_lines():
+    """Строки на границах фрагментов и без завершающего перевода строки"""
+    from skopeo_wrapper.skopeo_wrapper import _OutputBuffer
+    
+    lines = []
+    output = _OutputBuffer(lines.append)
+    error = "Error: ошибка".encode()
+    for chunk in (b"Getting image", b" source signatures\r", b"\nWriting manifest\n", error[:10], error[10:]):
+        output.feed(chunk)
+    output.close()
+    assert lines == ["Getting image source signatures", "Writing manifest", "Error: ошибка"]
+    assert output.getvalue() == "Getting image source signatures\nWriting manifest\nError: ошибка"
+    
+    lines = []
+    terminal = _OutputBuffer(lines.append, terminal=True)
+    terminal.feed(b"\r\x1b[KCopying blob 1 [=>-] 1KiB / 2KiB\r\x1b[KCopying blob 1 done\n")
+    terminal.close()
+    assert lines == ["Copying blob 1 [=>-] 1KiB / 2KiB", "Copying blob 1 done"]
+
+
+@requires_posix
+def test_raising_callback_kills_process(fake_wrapper, monkeypatch, tmp_path):
+    """Исключение progress_callback завершает процесс skopeo"""
+    # Барьер на один процесс не задерживает skopeo, но сохраняет его pid
+    barrier = tmp_path / "barrier"
+    monkeypatch.setenv("FAKE_SKOPEO_BARRIER", f"{barrier}:1")
+    monkeypatch.setenv("FAKE_SKOPEO_LINE_DELAY", "5")
+    
+    def callback(progress):
+        raise ValueError("boom")
+    
+    result = fake_wrapper.copy("docker://example.com/app:v1", "dir:/tmp/app", progress_callback=callback)
+    
+    assert not result.success and result.stderr == "boom"
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(os.listdir(barrier)[0]), 0)
+
+
+@requires_posix
+def test_execute_timeout(fake_wrapper, monkeypatch, tmp_path):
+    """Таймаут завершает процесс, не дожидаясь закрытия каналов"""
+    # Барьер на два процесса не пройдет: skopeo ждет, пока его не завершат
+    barrier = tmp_path / "barrier"
+    monkeypatch.setenv("FAKE_SKOPEO_BARRIER", f"{barrier}:2")
+    success, _, stderr = fake_wrapper.inspect("docker://example.com/app:v1", timeout=0.3)
+    
+    assert not success and stderr == "Operation timed out"
+    pid = int(os.listdir(barrier)[0])
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+
+
+@requires_posix
+def test_copy_batch(fake_wrapper, monkeypatch, tmp_path):
+    """Тест пакетного копирования одним skopeo sync"""
+    import json
+    
+    registry = tmp_path / "registry.json"
+    monkeypatch.setenv("FAKE_SKOPEO_REGISTRY", str(registry))
+    pairs = [(f"docker://example.com/team/app{i}:v1", f"docker://mirror.example.com/copy/team/app{i}:v1")
+             for i in range(3)]
+    pairs.insert(1, ("docker://example.com/team/missing:v1", "docker://mirror.example.com/copy/team/missing:v1"))
+    # Пары, которые sync не выразит, копируются по одному
+    pairs.append(("docker://example.com/team/app0:v1", f"dir:{tmp_path / 'app0'}"))
+    pairs.append(("docker://example.com/team/app0:v1", "docker://mirror.example.com/renamed:v1"))
+    events = []
+    
+    results = fake_wrapper.copy_batch(pairs, progress_callback=lambda index, progress: events.append(
+        (index, progress.current_step)
+    ))
+    
+    assert [result.index for result in results] == list(range(len(pairs)))
+    assert [result.success for result in results] == [True, False, True, True, True, True]
+    assert "manifest unknown" in results[1].stderr and results[1].progress.error
+    assert results[0].progress.completed and len(results[0].progress.parser.blobs) == 4
+    state = json.loads(registry.read_text())
+    assert state["docker://mirror.example.com/copy/team/app2:v1"] == fake_wrapper.get_manifest_digest(pairs[3][0])[1].strip()
+    assert "docker://mirror.example.com/renamed:v1" in state
+    
+    # Строки прогресса относятся к своим образам
+    assert not set(results[0].progress.parser.blobs) & set(results[2].progress.parser.blobs)
+    assert [step for index, step in events if index == 0] == [
+        "started", "getting_signatures", "copying_blob", "copying_blob", "copying_blob",
+        "copying_config", "writing_manifest", "storing_signatures", "completed"
+    ]
+    assert [step for index, step in events if index == 1] == ["started", "error", "error"]
+    
+    operations = fake_wrapper.metrics.operations_total
+    assert operations.labels(operation="copy_batch", status="success")._value.get() == 1
+    assert operations.labels(operation="copy", status="success")._value.get() == 2
+
+
+def test_sync_destination_prefix():
+    """Тест выбора пар, которые можно копировать через skopeo sync"""
+    from skopeo_wrapper.skopeo_wrapper import _sync_destination_prefix
+    
+    assert _sync_destination_prefix("docker://quay.io/ns/app:1", "docker://mirror.local/x/ns/app:1") == "mirror.local/x"
+    assert _sync_destination_prefix("docker://localhost:5000/app:1", "docker://mirror.local/app:1") == "mirror.local"
+    assert _sync_destination_prefix("docker://quay.io/ns/app:1", "docker://mirror.local/ns/app:2") is None
+    assert _sync_destination_prefix("docker://quay.io/ns/app@sha256:" + "a" * 64,
+                                    "docker://mirror.local/ns/app@sha256:" + "a" * 64) is None
+    assert _sync_destination_prefix("docker://alpine:3", "docker://mirror.local/alpine:3") is None
+    assert _sync_destination_prefix("docker://quay.io/app", "docker://mirror.local/app") is None
+    assert _sync_destination_prefix("docker://quay.io/app:1", "dir:/tmp/app") is None
+
+
+def test_sync_parser_logrus_formats():
+    """Разбор журнала skopeo sync в текстовом и терминальном форматах logrus"""
+    from skopeo_wrapper import SyncProgressParser
+    
+    source, target = "docker://quay.io/team/app:v1", "docker://mirror.local/team/app:v1"
+    parser = SyncProgressParser()
+    parser.parse_line(f'time="2024-01-01T00:00:00Z" level=info msg="Copying image ref 1/2" '
+                      f'from="{source}" to="{target}"')
+    parser.parse_line("Writing manifest to image destination")
+    parser.parse_line(f'INFO[0001] Copying image ref 2/2                         '
+                      f'from="{source}-missing" to="{target}-missing"')
+    parser.parse_line(f'ERRO[0002] Error copying ref "{source}-missing"           '
+                      f'error="initializing source: \\"v1-missing\\": manifest unknown"')
+    
+    assert parser.total_images == 2
+    assert list(parser.images) == [target, f"{target}-missing"]
+    assert parser.image_succeeded(target)
+    assert not parser.image_succeeded(f"{target}-missing", process_succeeded=True)
+    assert parser.errors == {f"{target}-missing": 'initializing source: "v1-missing": manifest unknown'}
+    
+    text = SyncProgressParser()
+    text.parse_line(f'time="2024-01-01T00:00:00Z" level=error msg="Error copying ref \\"{source}\\"" '
+                    f'error="reading manifest: manifest unknown"')
+    assert text.errors == {source: "reading manifest: manifest unknown"}
+    
+    # Без строк "Copying image ref" результат определяется кодом завершения
+    assert SyncProgressParser().image_succeeded(target, process_succeeded=True)
+    assert not SyncProgressParser().image_succeeded(target)
+
+
+@requires_posix
+def test_copy_skip_if_present(fake_wrapper, monkeypatch, tmp_path):
+    """Тест пропуска копирования при совпадении digest'ов"""
+    registry = tmp_path / "registry.json"
+    monkeypatch.setenv("FAKE_SKOPEO_REGISTRY", str(registry))
+    source, destination = "docker://example.com/app:v1", "docker://mirror.example.com/other:v2"
+    events = []
+    
+    # Назначения нет: копирование выполняется
+    result = fake_wrapper.copy(source, destination, skip_if_present=True)
+    success, _, stderr = result
+    assert success, stderr
+    assert not result.skipped
+    
+    result = fake_wrapper.copy(source, destination, progress_callback=events.append, skip_if_present=True)
+    assert result == (True, "", "")
+    assert result.skipped and result.success
+    assert [(event.current_step, event.completed) for event in events] == [("skipped", True)]
+    
+    operations = fake_wrapper.metrics.operations_total
+    assert operations.labels(operation="copy", status="skipped")._value.get() == 1
+    assert operations.labels(operation="copy", status="success")._value.get() == 1
+    
+    jobs = list(fake_wrapper.copy_many([(source, destination)], skip_if_present=True))
+    assert jobs[0].success and jobs[0].skipped
+
+
+@requires_posix
+def test_multi_arch_digests(fake_wrapper, monkeypatch, tmp_path):
+    """Теги со списком манифестов не копируются повторно"""
+    import json
+    
+    source, mirror = "docker://example.com/multiarch", "docker://mirror.example.com/multiarch"
+    destination = "docker://mirror.example.com/single:v0"
+    registry = tmp_path / "registry.json"
+    registry.write_text(json.dumps({f"{mirror}:v0": None, f"{mirror}:v1": None, destination: None}))
+    monkeypatch.setenv("FAKE_SKOPEO_REGISTRY", str(registry))
+    monkeypatch.setenv("FAKE_SKOPEO_TAGS", "2")
+    
+    # sync копирует список манифестов целиком (--all), и digest'ы совпадают
+    assert fake_wrapper.sync(source, mirror).copied == ["v0", "v1"]
+    assert fake_wrapper.sync(source, mirror).skipped == ["v0", "v1"]
+    
+    # copy без --all записывает образ текущей платформы
+    assert not fake_wrapper.copy(f"{source}:v0", destination, skip_if_present=True).skipped
+    assert fake_wrapper.copy(f"{source}:v0", destination, skip_if_present=True).skipped
+
+
+
+@requires_posix
+def test_copy_and_delete_invalidate_cache(monkeypatch, tmp_path):
+    """copy и delete удаляют устаревшие записи кэша о назначении"""
+    from skopeo_wrapper import MemoryResultCache
+    
+    monkeypatch.setenv("FAKE_SKOPEO_REGISTRY", str(tmp_path / "registry.json"))
+    cache = MemoryResultCache()
+    wrapper = SkopeoWrapper(skopeo_path=FAKE_SKOPEO, metrics=SkopeoMetrics(), cache=cache)
+    source, destination = "docker://example.com/app:v1", "docker://mirror.example.com/other:v2"
+    
+    # Digest назначения попадает в кэш до копирования
+    result = wrapper.copy(source, destination, skip_if_present=True)
+    assert result.success and not result.skipped
+    assert wrapper.copy(source, destination, skip_if_present=True).skipped
+    
+    wrapper.inspect(destination)
+    assert cache.get("inspect", destination) is not None
+    assert wrapper.delete(destination)[0]
+    assert cache.get("inspect", destination) is None
+    assert cache.get("manifest_digest", destination) is None
+
 if __name__ == "__main__":
     pytest.main([__file__])
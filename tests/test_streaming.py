@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Тесты для потокового чтения вывода skopeo
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from skopeo_wrapper import SkopeoWrapper, SkopeoMetrics, SkopeoCommandError, iter_json_array
+
+FAKE_SKOPEO = os.path.join(os.path.dirname(__file__), "fake_skopeo.py")
+
+requires_posix = pytest.mark.skipif(sys.platform == "win32", reason="Поддельный skopeo требует POSIX")
+
+
+def split(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+DOCUMENT = {
+    "Repository": "example.com/app",
+    "Nested": {"items": [1, 2, {"]": "[,"}]},
+    "Tags": ["v1", "привет \"]\"", 123456, 1.5e3, -7, True, None, {"k": [1, 2]}, []],
+}
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_iter_json_array_chunk_boundaries(size):
+    """Элементы разбираются при любых границах фрагментов, включая середину числа и UTF-8"""
+    data = json.dumps(DOCUMENT, ensure_ascii=False).encode("utf-8")
+    assert list(iter_json_array(split(data, size), key="Tags")) == DOCUMENT["Tags"]
+
+    data = json.dumps(DOCUMENT["Tags"], indent=2).encode("utf-8")
+    assert list(iter_json_array(split(data, size))) == DOCUMENT["Tags"]
+
+
+def test_iter_json_array_is_incremental():
+    """Элементы доступны до получения всего документа"""
+    def chunks():
+        yield b'{"Tags": ["a", "b", '
+        raise AssertionError("read past the first elements")
+
+    items = iter_json_array(chunks(), key="Tags")
+    assert next(items) == "a"
+    assert next(items) == "b"
+
+
+def test_iter_json_array_drains_stream():
+    """Ошибка источника после конца массива не теряется"""
+    def chunks():
+        yield b'{"Tags": ["a", "b"]}'
+        raise SkopeoCommandError(["skopeo"], 1, "boom")
+
+    items = iter_json_array(chunks(), key="Tags")
+    assert next(items) == "a"
+    assert next(items) == "b"
+    with pytest.raises(SkopeoCommandError):
+        next(items)
+
+
+def test_iter_json_array_errors():
+    """Некорректные и обрезанные документы"""
+    assert list(iter_json_array([b'{"Tags": []}'], key="Tags")) == []
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"Repository": "x"}'], key="Tags"))
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"Tags": [1, 2'], key="Tags"))
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'[1 2]']))
+
+
+@pytest.fixture
+def fake_wrapper():
+    """Фикстура для SkopeoWrapper с поддельным skopeo"""
+    return SkopeoWrapper(skopeo_path=FAKE_SKOPEO, metrics=SkopeoMetrics())
+
+
+@requires_posix
+def test_stream(fake_wrapper):
+    """Фрагменты stdout совпадают с обычным выводом команды"""
+    image = "docker://example.com/alpine:latest"
+    chunks = list(fake_wrapper.stream(["inspect", "--raw", image], chunk_size=64))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 64 for chunk in chunks)
+    _, stdout, _ = fake_wrapper._run_command([FAKE_SKOPEO, "inspect", "--raw", image])
+    assert b"".join(chunks).decode("utf-8") == stdout
+
+    layers = list(fake_wrapper.stream_json_array(["inspect", "--raw", image], key="layers"))
+    assert [layer["size"] for layer in layers] == [1024, 2048, 3072]
+
+
+@requires_posix
+def test_stream_errors(fake_wrapper, monkeypatch, tmp_path):
+    """Ошибка skopeo и таймаут передаются исключением"""
+    with pytest.raises(SkopeoCommandError) as error:
+        list(fake_wrapper.stream(["inspect", "--raw", "docker://example.com/missing:latest"]))
+    assert error.value.returncode == 1
+    assert "manifest unknown" in error.value.stderr
+
+    # Барьер на два процесса не пройдет: skopeo ждет, пока его не завершат
+    barrier = tmp_path / "barrier"
+    monkeypatch.setenv("FAKE_SKOPEO_BARRIER", f"{barrier}:2")
+    with pytest.raises(SkopeoCommandError) as error:
+        list(fake_wrapper.stream(["inspect", "--raw", "docker://example.com/alpine:latest"], timeout=0.2))
+    assert error.value.returncode is None
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(os.listdir(barrier)[0]), 0)
+
+    failures = fake_wrapper.metrics.operations_total.labels(operation="inspect", status="error")._value.get()
+    assert failures == 2
+
+
+@requires_posix
+def test_list_tags(fake_wrapper, monkeypatch):
+    """Теги репозитория отдаются по одному"""
+    monkeypatch.setenv("FAKE_SKOPEO_TAGS", "50000")
+    tags = fake_wrapper.list_tags("docker://example.com/app")
+
+    assert next(tags) == "v0"
+    assert sum(1 for _ in tags) == 49999
+    listed = fake_wrapper.metrics.operations_total.labels(operation="list_tags", status="success")._value.get()
+    assert listed == 1
+
+    with pytest.raises(SkopeoCommandError):
+        list(fake_wrapper.list_tags("docker://example.com/missing"))
+
+
+@requires_posix
+def test_list_tags_exit_status(tmp_path):
+    """Ненулевой код завершения после полного вывода передается исключением"""
+    skopeo = tmp_path / "skopeo"
+    skopeo.write_text('#!/bin/sh\necho \'{"Tags": ["a", "b"]}\'\nexit 1\n')
+    skopeo.chmod(0o755)
+    wrapper = SkopeoWrapper(skopeo_path=str(skopeo), metrics=SkopeoMetrics())
+
+    with pytest.raises(SkopeoCommandError) as error:
+        list(wrapper.list_tags("docker://example.com/app"))
+    assert error.value.returncode == 1
+    operations = wrapper.metrics.operations_total
+    assert operations.labels(operation="list_tags", status="error")._value.get() == 1
+    assert operations.labels(operation="list_tags", status="success")._value.get() == 0
+
+
+@requires_posix
+def test_cli_list_tags_json_lines():
+    """CLI list-tags выводит по одному JSON-объекту на строку"""
+    command = [sys.executable, "-m", "skopeo_wrapper.cli", "--skopeo-path", FAKE_SKOPEO,
+               "list-tags", "docker://example.com/app", "--json-lines"]
+    result = subprocess.run(command, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert lines == [{"repository": "docker://example.com/app", "tag": f"v{i}"} for i in range(5)]
+
+    command[-2] = "docker://example.com/missing"
+    result = subprocess.run(command, capture_output=True, text=True)
+    assert result.returncode == 1
+    assert "manifest unknown" in result.stderr